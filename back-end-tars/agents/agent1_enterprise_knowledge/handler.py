@@ -1,5 +1,7 @@
 from flask import Flask, request, jsonify
-from agents.agent1_enterprise_knowledge.logic import answer_question
+from agents.agent1_enterprise_knowledge.logic import (
+    answer_question, answer_questions, answer_cache_stats, set_knowledge_version
+)
 import logging
 
 # Silence Azure AI Foundry debug logs
@@ -14,17 +16,17 @@ def receive_task():
     caller  = request.headers.get("X-Caller-Agent", "Unknown")
     print(f"[Agent 1] Received from {caller}: {payload}")
 
-    # 2) Extract the question text
-    question = (
-        payload
-        .get("input", {})
-        .get("parts", [{}])[0]
-        .get("text", "")
-    )
+    # 2) Extract the question text; several text parts are separate questions
+    parts = payload.get("input", {}).get("parts", [{}])
+    questions = [p.get("text", "").strip() for p in parts if p.get("type", "text") == "text" and p.get("text", "").strip()]
+    question = questions[0] if questions else ""
 
     # 3) Run your core logic
     try:
-        response_text = answer_question(question, caller)
+        if len(questions) > 1:
+            response_text = answer_questions(questions, caller)
+        else:
+            response_text = answer_question(question, caller)
     except Exception as e:
         print(f"[Agent 1] Error processing question: {e}")
         return jsonify({"error": str(e)}), 500
@@ -43,6 +45,19 @@ def receive_task():
     # 5) Return JSON
     return jsonify(response), 200
 
+@app.route("/diagnostics/answer-cache", methods=["GET"])
+def serve_answer_cache_diagnostics():
+    # Cached answers, knowledge version and hits per caller
+    return jsonify(answer_cache_stats()), 200
+
+@app.route("/knowledge-version", methods=["POST"])
+def update_knowledge_version():
+    # Call after uploading documents; a new version drops the cached answers
+    version = str(request.get_json(force=True).get("version", "")).strip()
+    if not version:
+        return jsonify({"error": "version is required"}), 400
+    return jsonify({"knowledge_version": version, "cleared": set_knowledge_version(version)}), 200
+
 def run_handler(host="0.0.0.0", port=8001):
     print(f"🧠 Agent 1 A2A Server listening on {host}:{port}")
     # Enable debug mode
@@ -1,13 +1,18 @@
 import os
 import logging
 import time
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import List, Optional
 from azure.ai.projects import AIProjectClient
 from azure.ai.projects.models import RunStatus
 from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
 
+from shared.answer_cache import AnswerCache
+from shared.formulation import numbered_answers
+from shared.llm_cache import configure_llm_cache, get_llm_cache, instructions_version
+
 # ─── LOGGING CONFIG ───────────────────────────────────────────────────
 # 1) Configure root logger to only show INFO+ with your prefix
 logging.basicConfig(level=logging.INFO, format='[AGENT 1] %(message)s')
@@ -31,59 +36,115 @@ CONN_STR    = os.getenv("AZURE_CONN_STRING")
 AGENT_ID    = os.getenv("AGENT1_ID")
 MAX_RETRIES = 3
 TIMEOUT_S   = 25  # shorter timeout
+# Questions of one request answered side by side, each in its own run
+MAX_CONCURRENT_QUESTIONS = int(os.getenv("AGENT1_MAX_CONCURRENT_QUESTIONS", "4"))
+
+# Answers to questions asked before come from the shared completion cache
+if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"):
+    configure_llm_cache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+        path=os.getenv("LLM_CACHE_PATH", "data/llm_cache.db") or None,
+        default_ttl=float(os.getenv("LLM_CACHE_TTL", "1800"))
+    )
+
+# Answers by normalized question, warm-loaded at start-up; a new knowledge version drops them
+ANSWER_CACHE = AnswerCache(
+    path=os.getenv("AGENT1_ANSWER_CACHE_PATH", "data/agent1_answers.db") or None,
+    version=os.getenv("AGENT1_KNOWLEDGE_VERSION", "1"),
+    ttl=float(os.getenv("AGENT1_ANSWER_CACHE_TTL", "604800"))
+) if os.getenv("AGENT1_ANSWER_CACHE", "true").lower() in ("1", "true", "yes") else None
 
 class Agent1:
     def __init__(self):
-        self.lock = Lock()
         self.setup_client()
+        self.instructions_version = instructions_version(self.agent)
+        self.pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_QUESTIONS, thread_name_prefix="agent1")
 
     def setup_client(self):
         """Create fresh client connection"""
-        self.client = AIProjectClient.from_connection_string(
+        self.client, self.agent = self._connect()
+
+    def _connect(self):
+        client = AIProjectClient.from_connection_string(
             credential=DefaultAzureCredential(),
             conn_str=CONN_STR
         )
-        self.agent = self.client.agents.get_agent(AGENT_ID)
+        agent = client.agents.get_agent(AGENT_ID)
         logging.info("Created fresh client connection")
+        return client, agent
 
     def process_request(self, question: str, caller: str) -> str:
-        with self.lock:
-            thread = None
-            try:
-                self.setup_client()
-                thread = self.client.agents.create_thread()
-                logging.info(f"Created thread {thread.id}")
-                self.client.agents.create_message(thread.id, role="user", content=question)
-                run = self.client.agents.create_and_process_run(thread.id, agent_id=self.agent.id)
-
-                waited = 0
-                while waited < TIMEOUT_S:
-                    run = self.client.agents.get_run(thread_id=thread.id, run_id=run.id)
-                    logging.info(f"Status: {run.status}")
-                    if run.status == RunStatus.COMPLETED:
-                        msgs = list(self.client.agents.list_messages(thread.id).data)
-                        resp = self._extract_message(msgs)
-                        return resp or RuntimeError("Empty response")
-                    if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
-                        raise RuntimeError(f"Run failed: {run.status}")
-                    time.sleep(1)
-                    waited += 1
-
-                raise RuntimeError(f"Timeout after {TIMEOUT_S}s")
-
-            except Exception as e:
-                logging.error(f"Error processing request: {e}")
-                return f"Error: {e}"
-
-            finally:
-                if thread:
-                    try:
-                        self.client.agents.delete_thread(thread.id)
-                        logging.info(f"Cleaned up thread {thread.id}")
-                    except:
-                        pass
-                self.client = None
-                self.agent = None
+        # Every call gets its own connection, so questions can run concurrently
+        client = thread = None
+        try:
+            client, agent = self._connect()
+            thread = client.agents.create_thread()
+            logging.info(f"Created thread {thread.id}")
+            client.agents.create_message(thread.id, role="user", content=question)
+            run = client.agents.create_and_process_run(thread.id, agent_id=agent.id)
+
+            waited = 0
+            while waited < TIMEOUT_S:
+                run = client.agents.get_run(thread_id=thread.id, run_id=run.id)
+                logging.info(f"Status: {run.status}")
+                if run.status == RunStatus.COMPLETED:
+                    msgs = list(client.agents.list_messages(thread.id).data)
+                    resp = self._extract_message(msgs)
+                    if not resp:
+                        raise RuntimeError("Empty response")
+                    return resp
+                if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
+                    raise RuntimeError(f"Run failed: {run.status}")
+                time.sleep(1)
+                waited += 1
+
+            raise RuntimeError(f"Timeout after {TIMEOUT_S}s")
+
+        except Exception as e:
+            logging.error(f"Error processing request: {e}")
+            return f"Error: {e}"
+
+        finally:
+            if thread:
+                try:
+                    client.agents.delete_thread(thread.id)
+                    logging.info(f"Cleaned up thread {thread.id}")
+                except:
+                    pass
+
+    def _cached(self, question: str, caller: str):
+        # The answer cache, when on, replaces the completion cache so a knowledge version bump is final
+        if ANSWER_CACHE:
+            return ANSWER_CACHE.get(question, caller)
+        cache = get_llm_cache()
+        return cache.get("Agent1", AGENT_ID, self.instructions_version, question) if cache else None
+
+    def _remember(self, question: str, answer: str, caller: str, generation: Optional[int] = None):
+        if answer.startswith("Error"):
+            return
+        if ANSWER_CACHE:
+            ANSWER_CACHE.set(question, answer, caller, generation)
+        elif get_llm_cache():
+            get_llm_cache().set("Agent1", AGENT_ID, self.instructions_version, question, answer, "knowledge")
+
+    def answer_all(self, questions: List[str], caller: str) -> List[str]:
+        """Answers in question order; cached ones return at once, the rest run concurrently"""
+        answers = [None] * len(questions)
+        pending = {}
+        # Taken before asking: answers retrieved across a knowledge version bump are not cached
+        generation = ANSWER_CACHE.generation if ANSWER_CACHE else None
+        for i, question in enumerate(questions):
+            cached = self._cached(question, caller)
+            if cached is not None:
+                answers[i] = cached
+            else:
+                pending[i] = self.pool.submit(self.process_request, question, caller)
+        for i, future in pending.items():
+            answers[i] = future.result()
+            self._remember(questions[i], answers[i], caller, generation)
+        if len(questions) > 1:
+            logging.info(f"Answered {len(questions)} questions ({len(questions) - len(pending)} cached)")
+        return answers
 
     def _extract_message(self, messages: list) -> str:
         for msg in reversed(messages):
@@ -98,4 +159,20 @@ _agent = Agent1()
 
 def answer_question(question: str, caller: str = "Agent1") -> str:
     logging.info(f"📥 Received from {caller}: {question}")
-    return _agent.process_request(question, caller)
+    return _agent.answer_all([question], caller)[0]
+
+def set_knowledge_version(version: str) -> bool:
+    """Record a new knowledge version (e.g. after a document upload); drops the cached answers"""
+    return ANSWER_CACHE.set_version(version) if ANSWER_CACHE else False
+
+def answer_cache_stats() -> dict:
+    """Answer cache entries, knowledge version and hits per caller"""
+    return ANSWER_CACHE.stats() if ANSWER_CACHE else {}
+
+def answer_questions(questions: List[str], caller: str = "Agent1") -> str:
+    """Answer each question in its own concurrent run and merge the answers in order"""
+    logging.info(f"📥 Received {len(questions)} questions from {caller}")
+    start = time.time()
+    answers = _agent.answer_all(questions, caller)
+    logging.info(f"⏱️ {len(questions)} questions answered in {time.time() - start:.2f}s")
+    return numbered_answers(questions, answers)
@@ -1,6 +1,7 @@
 from flask import Flask, request, jsonify
 import logging
 from agents.agent2_global_intel.logic import handle_global_query
+from agents.agent2_global_intel.search import search_diagnostics
 
 # Silence noisy logs from HTTP libraries if desired
 logging.getLogger("urllib3").setLevel(logging.WARNING)
@@ -53,6 +54,11 @@ def serve_agent_card():
         print(f"[Agent 2] Error serving agent.json: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/diagnostics/search", methods=["GET"])
+def serve_search_diagnostics():
+    # Provider latency/yield stats and recent adaptive routing decisions
+    return jsonify(search_diagnostics()), 200
+
 def run_handler(host="0.0.0.0", port=8002):
     print(f"🧠 Agent 2 A2A Server listening on {host}:{port}")
     # Enable debug mode
@@ -6,12 +6,20 @@ import os
 from azure.ai.projects import AIProjectClient
 from azure.identity import DefaultAzureCredential
 from dotenv import load_dotenv
-from .search import run_search_tools
+import asyncio
+from .search import run_search_tools, search_tools, enrich_results, enrich_results_async
+from shared.result_packer import pack_results
+from shared.summarizer import summarize_results
 
 # Load Azure credentials
 load_dotenv()
 connection_string = os.getenv('AZURE_CONN_STRING')
 agent_id = os.getenv('AGENT2_ID')
+# "local" summarizes results with the extractive summarizer; "rich" asks the LLM
+SUMMARY_MODE = os.getenv('AGENT2_SUMMARY_MODE', 'local').lower()
+# Results are projected, ranked and trimmed to this many (estimated) tokens first
+PACK_TOKEN_BUDGET = int(os.getenv('AGENT2_PACK_TOKEN_BUDGET', '1500'))
+PACK_MAX_RESULTS = int(os.getenv('AGENT2_PACK_MAX_RESULTS', '8'))
 
 # Initialize client and agent
 project_client = AIProjectClient.from_connection_string(
@@ -39,18 +47,27 @@ def analyze_with_new_thread(prompt: str, timeout: int = 120) -> str:
             return ''.join(txt.text.value for txt in getattr(msg,'text_messages',[]))
     raise RuntimeError('No assistant message found')
 
-# Summarize search results JSON via Azure
-def filter_search_results(raw_json: dict) -> str:
-    if not raw_json.get('results'):
+# Summarize search results locally, or via Azure in "rich" mode
+def filter_search_results(raw_json: dict, query: str = '', mode: str = None) -> str:
+    packed = pack_results(raw_json.get('results'), query, PACK_TOKEN_BUDGET, PACK_MAX_RESULTS)
+    if not packed:
         return 'No results found'
+    if (mode or SUMMARY_MODE) != 'rich':
+        return summarize_results(packed, query)
     prompt = (
-        f"Analyze these search results and summarize each entry:\n{json.dumps(raw_json)}"
+        f"Analyze these search results and summarize each entry:\n{json.dumps({'results': packed})}"
     )
     return analyze_with_new_thread(prompt)
 
 # Main entrypoint
 def handle_global_query(query: str) -> str:
     # run_search_tools returns a list; wrap it so filter_search_results can .get('results')
-    raw_list = run_search_tools(query)
+    raw_list = enrich_results(run_search_tools(query))
     raw = { 'results': raw_list }
-    return filter_search_results(raw)
+    return filter_search_results(raw, query)
+
+# Async entrypoint for async A2A handlers: awaits the search path directly
+# instead of blocking a worker thread on the background loop
+async def handle_global_query_async(query: str) -> str:
+    raw = { 'results': await enrich_results_async(await search_tools(query)) }
+    return await asyncio.to_thread(filter_search_results, raw, query)
@@ -5,24 +5,50 @@ import re
 import json
 import requests
 import asyncio
+import atexit
 import warnings
-import random
 
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 from dotenv import load_dotenv
 
-# Disable TLS verification for local/dev; remove or adjust in production
-os.environ["NODE_TLS_REJECT_UNAUTHORIZED"] = "0"
+from shared.async_utils import BackgroundLoop
+from shared.dedupe import dedupe_results
+from shared.local_index import open_index
+from shared.mcp_search import MCPSearch
+from shared.page_fetch import PageFetcher
+from shared.result_packer import coerce_results
+from shared.rate_limit import build_limiters, parse_rate_limits
+from shared.search_cache import SearchCache, parse_ttls
+from shared.search_orchestrator import AdaptiveSelector, SearchOrchestrator
+
 warnings.filterwarnings("ignore", category=ResourceWarning)
 
 # Load environment variables (API keys, etc.)
 load_dotenv()
 # print("[DEBUG] FIRECRAWL_API_KEY =", os.getenv("FIRECRAWL_API_KEY"), flush=True)
 
-# Load MCP config for stdio-based servers
-with open("MCP.json", "r") as f:
-    mcp_config = json.load(f)
+# One background loop shared by every sync caller (Flask threads, CLI).
+# MCP sidecars are started on it once and reused across requests.
+background = BackgroundLoop('agent2-search')
+SYNC_TIMEOUT = float(os.getenv('SEARCH_SYNC_TIMEOUT', '60'))
+
+# Brave and Firecrawl MCP sidecars (config in MCP.json), started on the background loop on first use.
+# TLS verification is disabled inside the sidecars for local/dev; remove or adjust in production
+mcp_search = MCPSearch("MCP.json", env={"NODE_TLS_REJECT_UNAUTHORIZED": "0"}, background=background)
+
+def _shutdown():
+    async def close_all():
+        closers = [mcp_search.close()]
+        if page_fetcher:
+            closers.append(page_fetcher.close())
+        await asyncio.gather(*closers, return_exceptions=True)
+    if background.is_running:
+        try:
+            background.run(close_all(), timeout=5)
+        except Exception:
+            pass
+        background.stop()
+
+atexit.register(_shutdown)
 
 # Extract clean query from user message
 def extract_search_query(message: str) -> str:
@@ -30,9 +56,29 @@ def extract_search_query(message: str) -> str:
     q = m.group(2).strip() if m else message.strip()
     return re.sub(r'\s+', ' ', q)
 
-# 0) REST-based Search1API fallback
+# Process-wide keep-alive session so repeated Search1API calls reuse TLS connections
+_http = requests.Session()
+_http.mount('https://', requests.adapters.HTTPAdapter(
+    pool_connections=int(os.getenv('SEARCH_HTTP_POOLS', '4')),
+    pool_maxsize=int(os.getenv('SEARCH_HTTP_POOL_SIZE', '10')),
+))
+atexit.register(_http.close)
+
+def http_stats() -> dict:
+    """Connection reuse statistics for the shared requests session"""
+    manager = _http.get_adapter('https://').poolmanager
+    pools = [manager.pools[key] for key in manager.pools.keys()]
+    requests_sent = sum(p.num_requests for p in pools)
+    connections = sum(p.num_connections for p in pools)
+    return {
+        'requests': requests_sent,
+        'new_connections': connections,
+        'reused_connections': max(requests_sent - connections, 0),
+    }
+
+# 0) REST-based Search1API
 def run_search1api(query: str, max_results: int = 3) -> list:
-    print("🔎 [Agent 2] Invoking run_search1api() (fallback)", flush=True)
+    print("🔎 [Agent 2] Invoking run_search1api()", flush=True)
     api_key = os.getenv('SEARCH1API_KEY')
     if not api_key:
         raise RuntimeError('SEARCH1API_KEY not set')
@@ -40,203 +86,144 @@ def run_search1api(query: str, max_results: int = 3) -> list:
     headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
     payload = {'query': query, 'search_service': 'google', 'max_results': max_results}
     # disable verify in dev environment; set verify to True or specify CA bundle in prod
-    resp = requests.post(url, json=payload, headers=headers, timeout=30, verify=False)
+    resp = _http.post(url, json=payload, headers=headers, timeout=30, verify=False)
     resp.raise_for_status()
-    data = resp.json()
-    # assume results list in data['results'] or return full body
-    return data.get('results', data)
-
-# 1) BRAVESEARCH
-async def _brave_call(query: str, count: int) -> list[dict]:
-    cfg = mcp_config['mcpServers']['brave-search']
-    sp = StdioServerParameters(
-        command=cfg['command'],
-        args=cfg['args'],
-        env={**cfg.get('env', {}), **os.environ},
-    )
-
-    async with stdio_client(sp) as (r, w):
-        async with ClientSession(r, w) as session:
-            await session.initialize()
-            resp = await session.call_tool(
-                'brave_web_search',
-                arguments={'query': query, 'count': count}
-            )
-
-    # 1) Gather all text frames into one string
-    pieces = []
-    for frame in resp.content or []:
-        if hasattr(frame, 'text'):
-            pieces.append(getattr(frame.text, "value", frame.text))
-    raw   = "\n".join(pieces).strip()
-    if not raw:
-        return []
+    # Always hand back a list of result dicts, never the raw response body
+    return coerce_results(resp.json())
 
-    # 2) Split on blank lines to isolate each result
-    blocks = re.split(r"\n\s*\n", raw)
-    results = []
-    for block in blocks:
-        title = ""
-        desc  = ""
-        url   = ""
-        for line in block.splitlines():
-            if line.startswith("Title:"):
-                title = line[len("Title:"):].strip()
-            elif line.startswith("Description:"):
-                desc = line[len("Description:"):].strip()
-            elif line.startswith("URL:"):
-                url  = line[len("URL:"):].strip()
-        # only include if any field is non‐empty
-        if title or desc or url:
-            results.append({
-                "title": title,
-                "description": desc,
-                "url": url,
-            })
+async def search1api_search(query: str, max_results: int = 3) -> list:
+    """Async entry point for Search1API (the HTTP pool is thread-safe)"""
+    return await asyncio.to_thread(run_search1api, query, max_results)
 
-    return results
+# 1) BRAVESEARCH
+async def brave_search(query: str, count: int = 3) -> list[dict]:
+    """Async entry point for Brave; awaitable from any event loop"""
+    return await mcp_search.brave(query, count)
 
 def run_bravesearch(query: str) -> list[dict]:
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        out = loop.run_until_complete(_brave_call(query, count=3))
+        out = mcp_search.run_brave(query, count=3, timeout=SYNC_TIMEOUT)
         return out or []
     except Exception as e:
         print(f"❌ Error in run_bravesearch: {e}", flush=True)
         return []
-    finally:
-        loop.close()
-        asyncio.set_event_loop(None)
 
 # 2) FIRECRAWL
-async def _firecrawl_call(query: str, limit=3, lang='en', country='us') -> list[dict]:
-    cfg = mcp_config['mcpServers']['firecrawl-mcp']
-    sp  = StdioServerParameters(
-        command=cfg['command'],
-        args=cfg['args'],
-        env={**cfg.get('env', {}), **os.environ},
-    )
-
-    async with stdio_client(sp) as (r, w):
-        async with ClientSession(r, w) as session:
-            await session.initialize()
-            print("[DEBUG] spawning Firecrawl sidecar:", sp.command, sp.args, flush=True)
-            resp = await session.call_tool(
-                'firecrawl_search',
-                arguments={'query': query, 'limit': limit, 'lang': lang, 'country': country}
-            )
-            print("[DEBUG] Firecrawl raw frames:", resp.content, flush=True)
-
-    # 1) Gather all text frames
-    pieces = []
-    for frame in resp.content or []:
-        if hasattr(frame, 'text'):
-            pieces.append(getattr(frame.text, "value", frame.text))
-    raw = "\n".join(pieces).strip()
-    if not raw:
-        return []
-
-    # 2) Split into blocks
-    blocks = re.split(r"\n\s*\n", raw)
-    results = []
-
-    for block in blocks:
-        title = ""
-        snippet = ""
-        url = ""
-        for line in block.splitlines():
-            if line.startswith("Title:"):
-                title = line[len("Title:"):].strip()
-            elif line.startswith("Description:"):
-                snippet = line[len("Description:"):].strip()
-            elif line.startswith("URL:"):
-                url = line[len("URL:"):].strip()
-        # only include if we got anything
-        if title or snippet or url:
-            results.append({
-                "title": title,
-                "snippet": snippet,
-                "url": url,
-                # optional: pull a date field if Firecrawl gives one
-                "published_date": ""
-            })
-
-    return results
+async def firecrawl_search(query: str, limit: int = 3, lang: str = 'en', country: str = 'us') -> list[dict]:
+    """Async entry point for Firecrawl; awaitable from any event loop"""
+    return await mcp_search.firecrawl(query, limit, lang, country)
 
 def run_firecrawl(query: str, limit: int = 3, lang: str = 'en', country: str = 'us') -> list:
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        out = loop.run_until_complete(_firecrawl_call(query, limit, lang, country))
+        out = mcp_search.run_firecrawl(query, limit, lang, country, timeout=SYNC_TIMEOUT)
         return out or []
     except Exception as e:
         print(f"❌ Error in run_firecrawl: {e}", flush=True)
         return []
-    finally:
-        loop.close()
-        asyncio.set_event_loop(None)
-
-# # Dispatcher: sequential failover before REST fallback
-# def run_search_tools(user_query: str) -> list:
-#     q = extract_search_query(user_query)
-
-#     # primary providers
-#     providers = [
-#         ('brave', run_bravesearch),
-#         ('firecrawl', run_firecrawl),
-#     ]
-
-#     # pick one provider at random
-#     name, func = random.choice(providers)
-#     print(f"🔍 [Agent 2] randomly selected {name}…", flush=True)
-#     #debug
-#     print(f"[DEBUG] provider order: {[p[0] for p in providers]}, selected: {name}")
-
-#     # try it
-#     try:
-#         results = func(q)
-#         if results:
-#             print(f"✅ [Agent 2] {name} returned {len(results)} items", flush=True)
-#             return results
-#         else:
-#             print(f"⚠️ [Agent 2] {name} returned no results", flush=True)
-#     except Exception as e:
-#         print(f"❌ [Agent 2] {name} error: {e}", flush=True)
-
-#     # if that one failed or was empty, try the other once
-#     other_name, other_func = next(p for p in providers if p[0] != name)
-#     print(f"🔍 [Agent 2] trying fallback provider {other_name}…", flush=True)
-#     try:
-#         results = other_func(q)
-#         if results:
-#             print(f"✅ [Agent 2] {other_name} returned {len(results)} items", flush=True)
-#             return results
-#         else:
-#             print(f"⚠️ [Agent 2] {other_name} returned no results", flush=True)
-#     except Exception as e:
-#         print(f"❌ [Agent 2] {other_name} error: {e}", flush=True)
-
-#     # last resort
-#     print("🔍 [Agent 2] all primary providers failed, falling back to Search1API", flush=True)
-#     return run_search1api(q)
-
-# Dispatcher: firecrawl only for now
-def run_search_tools(user_query: str) -> list:
+
+# Dispatcher: concurrent fan-out across all providers
+# SEARCH_MODE=race returns the first non-empty result set,
+# SEARCH_MODE=merge waits up to SEARCH_DEADLINE seconds and dedupes by URL,
+# SEARCH_MODE=adaptive tries the provider with the best recent latency/yield first
+PROVIDERS = {
+    'brave':      lambda q: brave_search(q, count=3),
+    'firecrawl':  lambda q: firecrawl_search(q),
+    'search1api': lambda q: search1api_search(q),
+}
+
+# Offline BM25 provider over a local document directory (LOCAL_INDEX_PATH);
+# add "local" to SEARCH_PROVIDERS to use it
+local_index = open_index(os.getenv('LOCAL_INDEX_PATH'), os.getenv('LOCAL_INDEX_DOCS_DIR') or None) \
+    if os.getenv('LOCAL_INDEX_PATH') else None
+if local_index:
+    PROVIDERS['local'] = lambda q: local_index.search_async(q, k=3)
+_enabled = [p.strip() for p in os.getenv('SEARCH_PROVIDERS', 'brave,firecrawl,search1api').split(',') if p.strip()]
+
+orchestrator = SearchOrchestrator(
+    {name: PROVIDERS[name] for name in _enabled if name in PROVIDERS},
+    mode=os.getenv('SEARCH_MODE', 'race'),
+    deadline=float(os.getenv('SEARCH_DEADLINE', '20')),
+    # Process-wide token buckets ("name=requests_per_second/burst"); callers queue
+    # briefly for a slot and skip a provider whose slot would miss the deadline
+    limiters=build_limiters(
+        parse_rate_limits(os.getenv('SEARCH_RATE_LIMITS', 'brave=1/1,firecrawl=2/2,search1api=5/5')),
+        max_queue=int(os.getenv('SEARCH_RATE_MAX_QUEUE', '20')),
+        max_wait=float(os.getenv('SEARCH_RATE_MAX_WAIT', '5')),
+    ),
+    selector=AdaptiveSelector(
+        epsilon=float(os.getenv('SEARCH_ADAPTIVE_EPSILON', '0.1')),
+        max_failure_rate=float(os.getenv('SEARCH_ADAPTIVE_MAX_FAILURE_RATE', '0.5')),
+    ),
+)
+
+# Persistent result cache keyed on the normalized query; set SEARCH_CACHE_PATH= to disable
+_cache_path = os.getenv('SEARCH_CACHE_PATH', 'data/search_cache.db')
+search_cache = SearchCache(
+    _cache_path,
+    default_ttl=float(os.getenv('SEARCH_CACHE_TTL', '3600')),
+    provider_ttls=parse_ttls(os.getenv('SEARCH_CACHE_TTLS', '')),
+    max_entries=int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '5000')),
+) if _cache_path else None
+
+# Collapse syndicated copies whose SimHash differs by at most this many bits; -1 disables
+DEDUPE_DISTANCE = int(os.getenv('SEARCH_DEDUPE_DISTANCE', '6'))
+
+async def search_tools(user_query: str, mode: str = None, read_cache: bool = True) -> list:
+    """
+    Async dispatcher: cache lookup, then concurrent fan-out. ``read_cache=False``
+    skips the lookup (benchmarks time the providers) but still stores the results.
+    """
     q = extract_search_query(user_query)
-    
-    print("🔍 [Agent 2] forcing Firecrawl…", flush=True)
-    # Directly call Firecrawl
-    try:
-        results = run_firecrawl(q)
-        print(f"✅ [Agent 2] firecrawl returned {len(results)} items", flush=True)
-        if results:
-            return results
-        else:
-            print("⚠️ [Agent 2] firecrawl returned no results", flush=True)
-    except Exception as e:
-        print(f"❌ [Agent 2] firecrawl error: {e}", flush=True)
-    
-    # Fallback to Search1API
-    print("🔍 [Agent 2] falling back to Search1API", flush=True)
-    return run_search1api(q)
+    mode = mode or orchestrator.mode
+
+    if search_cache and read_cache:
+        cached = search_cache.get(q, mode)
+        if cached is not None:
+            print(f"💾 [Agent 2] cache hit, {len(cached)} items", flush=True)
+            return cached
+
+    print(f"🔍 [Agent 2] fanning out to {', '.join(orchestrator.providers)}…", flush=True)
+    results = await orchestrator.search(q, mode=mode)
+    print(f"✅ [Agent 2] search returned {len(results)} items", flush=True)
+    if DEDUPE_DISTANCE >= 0 and results:
+        deduped = dedupe_results(results, max_distance=DEDUPE_DISTANCE)
+        if len(deduped) < len(results):
+            print(f"🧹 [Agent 2] collapsed {len(results) - len(deduped)} near-duplicate items", flush=True)
+        results = deduped
+    if search_cache:
+        search_cache.set(q, results, mode)
+    return results
+
+def search_diagnostics() -> dict:
+    """Provider statistics and recent adaptive routing decisions"""
+    return {
+        'mode': orchestrator.mode,
+        'providers': orchestrator.stats(),
+        'decisions': orchestrator.decisions(),
+        'cache': search_cache.stats() if search_cache else {},
+        'http': http_stats(),
+        'enrich': page_fetcher.stats() if page_fetcher else {},
+        'local_index': local_index.stats() if local_index else {},
+    }
+
+def run_search_tools(user_query: str, mode: str = None, read_cache: bool = True) -> list:
+    """Sync wrapper; all callers share the background loop and its MCP sessions"""
+    return background.run(search_tools(user_query, mode, read_cache), timeout=SYNC_TIMEOUT)
+
+# Optional enrichment: fetch the top result pages and extract their text (SEARCH_ENRICH=1)
+page_fetcher = PageFetcher(
+    top_n=int(os.getenv('SEARCH_ENRICH_TOP_N', '3')),
+    max_bytes=int(os.getenv('SEARCH_ENRICH_MAX_BYTES', '500000')),
+    per_host=int(os.getenv('SEARCH_ENRICH_PER_HOST', '2')),
+    deadline=float(os.getenv('SEARCH_ENRICH_DEADLINE', '4')),
+) if os.getenv('SEARCH_ENRICH', '0') == '1' else None
+
+async def enrich_results_async(results: list) -> list:
+    if not page_fetcher or not results:
+        return results
+    return await background.wrap(page_fetcher.enrich(results))
+
+def enrich_results(results: list) -> list:
+    if not page_fetcher or not results:
+        return results
+    return background.run(page_fetcher.enrich(results), timeout=SYNC_TIMEOUT)
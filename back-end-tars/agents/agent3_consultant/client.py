@@ -10,14 +10,17 @@ AGENT4_BASE_URL = "http://localhost:8004"
 
 
 # --- AGENT 1 REQUESTS (Internal Docs) ---
-def request_internal_docs(question: str, caller: str = "Agent3") -> str:
+def request_internal_docs(question, caller: str = "Agent3") -> str:
     """
     Ask Agent 1’s /tasks/send for internal-doc QA.
     The X-Caller-Agent header tells Agent 1 who’s asking.
+    A list of questions is sent as one text part each; Agent 1 answers them
+    concurrently and returns the answers merged in order.
     """
+    questions = question if isinstance(question, list) else [question]
     payload = {
         "task_type": "enterprise.doc.qa",
-        "input": {"parts": [{"type": "text", "text": question}]}
+        "input": {"parts": [{"type": "text", "text": q} for q in questions]}
     }
     headers = {"X-Caller-Agent": caller}
     url = f"{AGENT1_BASE_URL}/a2a/v1/tasks/send"
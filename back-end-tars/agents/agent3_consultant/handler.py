@@ -46,7 +46,7 @@ def handle_task():
         # Call the core logic function with exception handling
         try:
             logger.info("[Agent 3 HANDLER] Calling ask_agent logic function...")
-            summary = ask_agent(text_input)
+            summary = ask_agent(text_input, session_id=task.get("session_id"))
             logger.info(f"[Agent 3 HANDLER] ask_agent returned summary of length: {len(summary)}")
             
             # Check if the logic returned an error message
@@ -1,8 +1,12 @@
+import uuid
+
 from agents.agent3_consultant.logic import ask_agent
 
 def chat_loop():
     print("💬 Welcome to Strategic Consultant Agent (Agent 3)")
     print("Type your question (or 'exit' to quit):\n")
+    # Follow-ups in this chat can reuse the context gathered for earlier questions
+    session_id = uuid.uuid4().hex
 
     while True:
         user_input = input("🧑‍💼 You: ").strip()
@@ -15,7 +19,7 @@ def chat_loop():
             continue
 
         print("🧠 Thinking...")
-        response = ask_agent(user_input)
+        response = ask_agent(user_input, session_id=session_id)
         print("\n🤖 Agent 3:\n")
         print(response)
         print("\n---\n")
\ No newline at end of file
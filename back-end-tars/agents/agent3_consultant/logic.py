@@ -5,8 +5,16 @@ import re
 import logging
 import traceback
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
 from agents.agent3_consultant.client import request_internal_docs, request_global_intel, request_outcome_predictions
 from shared.utils import extract_latest_assistant_message, formulate_from_template
+from shared.context_classifier import ContextClassifier
+from shared.context_compressor import compress_contexts, describe
+from shared.formulation import numbered, parse_formulation
+from shared.keyphrases import SearchQueryBuilder
+from shared.llm_cache import configure_llm_cache
+from shared.prompts import load_prompts, render_prompt
+from shared.session_context import SessionContextStore
 
 from dotenv import load_dotenv
 
@@ -20,6 +28,70 @@ logger.info("[Agent 3 LOGIC] Initializing...")
 # Load environment variables
 load_dotenv()
 
+# Read and validate the prompt templates once; a broken template stops start-up here
+load_prompts()
+
+# Identical template prompts are answered from the shared completion cache
+# (LLM_CACHE_ENABLED=false disables it; an empty LLM_CACHE_PATH keeps it in memory)
+if os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"):
+    configure_llm_cache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+        path=os.getenv("LLM_CACHE_PATH", "data/llm_cache.db") or None,
+        default_ttl=float(os.getenv("LLM_CACHE_TTL", "1800"))
+    )
+
+# Shared deadline for the whole context stage: the combined formulation plus the
+# concurrent internal (Agent 1) and external (Agent 2) chains
+CONTEXT_DEADLINE = float(os.getenv("AGENT3_CONTEXT_DEADLINE", "90"))
+_context_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agent3-context")
+# Formulate Agent 1 questions and the Agent 2 search query in one structured run
+COMBINED_FORMULATION = os.getenv("AGENT3_COMBINED_FORMULATION", "true").lower() in ("1", "true", "yes")
+# Token budget for the internal + external context in the final prompt (0 disables compression)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("AGENT3_CONTEXT_TOKEN_BUDGET", "1500"))
+
+# Local rules deciding the context need; the initial-answer and evaluation runs
+# only happen when they are not confident (AGENT3_CONTEXT_CLASSIFIER=false disables)
+context_classifier = None
+if os.getenv("AGENT3_CONTEXT_CLASSIFIER", "true").lower() in ("1", "true", "yes"):
+    try:
+        context_classifier = ContextClassifier(
+            os.getenv("AGENT3_CONTEXT_RULES", "shared/context_rules.json"),
+            log_path=os.getenv("AGENT3_CONTEXT_DECISION_LOG", "data/context_decisions.jsonl") or None
+        )
+    except (OSError, ValueError) as e:
+        logger.warning(f"[Agent 3 LOGIC] Context rules unavailable, always using the LLM evaluation: {e}")
+
+# Keyphrase search queries; the LLM formulates only when they are not confident
+# (AGENT3_LOCAL_SEARCH_QUERY=false disables)
+query_builder = None
+if os.getenv("AGENT3_LOCAL_SEARCH_QUERY", "true").lower() in ("1", "true", "yes"):
+    query_builder = SearchQueryBuilder(
+        min_confidence=float(os.getenv("AGENT3_LOCAL_QUERY_MIN_CONFIDENCE", "0.5"))
+    )
+
+# Contexts gathered per chat session, reused by follow-ups on the same topic
+# (AGENT3_CONTEXT_REUSE=false disables)
+session_contexts = None
+if os.getenv("AGENT3_CONTEXT_REUSE", "true").lower() in ("1", "true", "yes"):
+    session_contexts = SessionContextStore(
+        max_sessions=int(os.getenv("AGENT3_CONTEXT_REUSE_SESSIONS", "256")),
+        ttl=float(os.getenv("AGENT3_CONTEXT_REUSE_TTL", "1800")),
+        min_similarity=float(os.getenv("AGENT3_CONTEXT_REUSE_MIN_SIMILARITY", "0.35"))
+    )
+
+# What the chains return when they have nothing to offer; never kept for reuse
+EMPTY_CONTEXTS = {"No relevant internal documents found.", "No relevant external information found.",
+                  "No results found"}
+# Agent 1 answers a question it failed on with "Error: ..." (one line of a numbered list)
+_AGENT1_ERROR = re.compile(r"^Error: ", re.MULTILINE)
+
+
+def context_succeeded(context: str) -> bool:
+    """Whether a chain produced real context rather than an error marker or a placeholder"""
+    text = (context or "").strip()
+    return bool(text) and not text.startswith("[Error") and text not in EMPTY_CONTEXTS \
+        and not _AGENT1_ERROR.search(text)
+
 # Azure AI Foundry setup - Handle initialization failures gracefully
 project_client = None
 agent = None
@@ -78,14 +150,8 @@ def evaluate_context_need(question: str, initial_answer: str) -> str:
         logger.info("[Agent 3 LOGIC] Evaluating if additional context is needed...")
         thread = project_client.agents.create_thread()
         
-        # Load the evaluation prompt
-        try:
-            with open("prompts/evaluation.txt", "r", encoding="utf-8") as f:
-                eval_prompt = f.read().format(question=question, initial_answer=initial_answer)
-        except Exception as f_err:
-            logger.error(f"[Agent 3 LOGIC] Failed to load evaluation prompt: {f_err}")
-            return "needs both internal and external context"  # Conservative default
-            
+        eval_prompt = render_prompt("evaluation", question=question, initial_answer=initial_answer)
+
         project_client.agents.create_message(thread_id=thread.id, role="user", content=eval_prompt)
         run = project_client.agents.create_and_process_run(thread_id=thread.id, agent_id=agent.id)
         
@@ -156,15 +222,7 @@ def formulate_search_questions(original_question: str) -> str:
         logger.info("[Agent 3 LOGIC] Generating external search query...")
         thread = project_client.agents.create_thread()
         
-        # Load the search formulation prompt
-        try:
-            with open("prompts/formulate_search.txt", "r", encoding="utf-8") as f:
-                prompt_template = f.read()
-        except Exception as f_err:
-            logger.error(f"[Agent 3 LOGIC] Failed to load search prompt: {f_err}")
-            return f"Current 2025 information about {original_question}"  # Basic fallback
-            
-        prompt = prompt_template.format(original_question=original_question)
+        prompt = render_prompt("formulate_search", original_question=original_question)
         project_client.agents.create_message(thread_id=thread.id, role="user", content=prompt)
         run = project_client.agents.create_and_process_run(thread_id=thread.id, agent_id=agent.id)
         
@@ -195,8 +253,182 @@ def formulate_search_questions(original_question: str) -> str:
         return f"Current 2025 information about {original_question}"  # Basic fallback
 
 
-def ask_agent(question: str) -> str:
-    """Main function to process a query and generate a response."""
+def formulate_combined(original_question: str):
+    """
+    Formulate internal questions and search queries in one run.
+    Returns the validated dict, or None so callers fall back to the separate prompts.
+    """
+    if not project_client or not agent:
+        return None
+    try:
+        reply = formulate_from_template(
+            project_client,
+            agent.id,
+            "formulate_combined",
+            original_question=original_question
+        )
+        formulated = parse_formulation(reply)
+        if formulated is None:
+            logger.warning(f"[Agent 3 LOGIC] Unusable combined formulation, formulating separately: {reply[:200]}")
+        else:
+            logger.info(f"[Agent 3 LOGIC] Generated internal questions {formulated['internal_questions']} "
+                        f"and search queries {formulated['search_queries']} in one run")
+        return formulated
+    except Exception as e:
+        logger.error(f"[Agent 3 LOGIC] Error in combined formulation, formulating separately: {e}")
+        return None
+
+
+def gather_internal_context(question: str, questions: str = None) -> str:
+    """Formulate internal questions (unless given) and ask Agent 1."""
+    try:
+        internal_q1 = questions or formulate_internal_questions(question)
+        if "error:" in internal_q1.lower():
+            logger.warning(f"[Agent 3 LOGIC] Error formulating internal questions: {internal_q1}")
+            internal_q1 = f"What internal documents contain information relevant to: {question}"
+            
+        logger.info(f"[Agent 3 LOGIC] Requesting internal docs from Agent 1: {internal_q1}")
+        internal_context = request_internal_docs(internal_q1)
+        
+        if "[Error Agent 1:" in internal_context:
+            logger.warning(f"[Agent 3 LOGIC] Error from Agent 1: {internal_context}")
+        elif not internal_context:
+            logger.warning("[Agent 3 LOGIC] Empty response from Agent 1")
+            internal_context = "No relevant internal documents found."
+        else:
+            logger.info(f"[Agent 3 LOGIC] Received internal context from Agent 1 ({len(internal_context)} chars)")
+        return internal_context
+        
+    except Exception as e:
+        logger.error(f"[Agent 3 LOGIC] Error when requesting internal docs: {e}")
+        return f"[Error requesting internal documents: {str(e)}]"
+
+
+def gather_global_context(question: str, search_query: str = None) -> str:
+    """Formulate a search query (unless given) and ask Agent 2."""
+    try:
+        global_q1 = search_query or formulate_search_questions(question)
+        if "error:" in global_q1.lower():
+            logger.warning(f"[Agent 3 LOGIC] Error formulating search query: {global_q1}")
+            global_q1 = f"Current 2025 information about {question}"
+            
+        logger.info(f"[Agent 3 LOGIC] Requesting global intel from Agent 2: {global_q1}")
+        global_context = request_global_intel(global_q1)
+        
+        if "[Error Agent 2:" in global_context:
+            logger.warning(f"[Agent 3 LOGIC] Error from Agent 2: {global_context}")
+        elif not global_context:
+            logger.warning("[Agent 3 LOGIC] Empty response from Agent 2")
+            global_context = "No relevant external information found."
+        else:
+            logger.info(f"[Agent 3 LOGIC] Received global context from Agent 2 ({len(global_context)} chars)")
+        return global_context
+    
+    except Exception as e:
+        logger.error(f"[Agent 3 LOGIC] Error when requesting global intel: {e}")
+        return f"[Error requesting external information: {str(e)}]"
+
+
+def gather_contexts(question: str, internal: bool = True, external: bool = True) -> tuple:
+    """
+    Run the internal and external chains concurrently under one deadline,
+    which also covers the combined formulation before them. Returns
+    (internal_context, global_context); a chain that is not needed yields ""
+    and one that misses the deadline yields an error marker.
+    """
+    start_time = time.time()
+    # A confident keyphrase query lets the external chain start without any LLM run
+    search_query = None
+    if external and query_builder:
+        built = query_builder.build(question)
+        if built["confident"]:
+            search_query = built["query"]
+            logger.info(f"[Agent 3 LOGIC] Search query from keyphrases: \"{search_query}\" "
+                        f"(confidence {built['confidence']}, {built['elapsed_us']}µs)")
+        else:
+            logger.info(f"[Agent 3 LOGIC] Keyphrase query not confident ({built['confidence']}) - formulating with the LLM")
+        stats = query_builder.stats()
+        logger.info(f"[Agent 3 LOGIC] Search query paths so far: {stats['local']} local, {stats['llm']} LLM")
+
+    # When both chains still need formulating, one combined run formulates for both
+    formulated = None
+    if internal and external and not search_query and COMBINED_FORMULATION:
+        formulation = _context_pool.submit(formulate_combined, question)
+        try:
+            formulated = formulation.result(timeout=CONTEXT_DEADLINE)
+        except FuturesTimeout:
+            logger.warning(f"[Agent 3 LOGIC] Combined formulation not ready within {CONTEXT_DEADLINE}s")
+    questions = numbered(formulated["internal_questions"]) if formulated else None
+    if formulated:
+        search_query = formulated["search_queries"][0]
+
+    futures = {}
+    if internal:
+        futures["internal"] = _context_pool.submit(gather_internal_context, question, questions)
+    if external:
+        futures["external"] = _context_pool.submit(gather_global_context, question, search_query)
+    if not futures:
+        return "", ""
+
+    # The chains get what the formulation left of the deadline
+    wait(futures.values(), timeout=max(0.0, CONTEXT_DEADLINE - (time.time() - start_time)))
+    contexts = {}
+    for name, future in futures.items():
+        if future.done():
+            contexts[name] = future.result()
+        else:
+            # The worker keeps running in the background; its result is simply ignored
+            logger.warning(f"[Agent 3 LOGIC] {name} context not ready within {CONTEXT_DEADLINE}s")
+            contexts[name] = f"[Error requesting {name} context: timed out after {CONTEXT_DEADLINE}s]"
+            
+    logger.info(f"[Agent 3 LOGIC] Context gathering took {time.time() - start_time:.2f}s")
+    return contexts.get("internal", ""), contexts.get("external", "")
+
+
+def generate_initial_answer(question: str) -> str:
+    """Answer the question without any additional context."""
+    logger.info("[Agent 3 LOGIC] Attempting initial response...")
+    thread = project_client.agents.create_thread()
+    prompt_initial = f"You are a strategic consultant. Answer clearly and directly:\n\n{question}"
+    project_client.agents.create_message(thread_id=thread.id, role="user", content=prompt_initial)
+    
+    logger.info("[Agent 3 LOGIC] Creating initial run...")
+    run = project_client.agents.create_and_process_run(thread_id=thread.id, agent_id=agent.id)
+    
+    # Poll for completion with timeout
+    start_time = time.time()
+    timeout = 60  # 60 seconds timeout
+    while run.status.name not in ('COMPLETED', 'FAILED', 'CANCELLED', 'EXPIRED'):
+        if time.time() - start_time > timeout:
+            logger.warning("[Agent 3 LOGIC] Initial response timed out")
+            raise TimeoutError("Initial response generation timed out after 60 seconds")
+            
+        time.sleep(2)
+        run = project_client.agents.get_run(thread_id=thread.id, run_id=run.id)
+        logger.debug(f"[Agent 3 LOGIC] Initial run status: {run.status.name}")
+        
+    if run.status.name != 'COMPLETED':
+        logger.warning(f"[Agent 3 LOGIC] Initial run failed with status: {run.status.name}")
+        raise RuntimeError(f"Initial response generation failed with status: {run.status.name}")
+        
+    messages = list(project_client.agents.list_messages(thread_id=thread.id).data)
+    answer = extract_latest_assistant_message(messages)
+    if not answer:
+        logger.warning("[Agent 3 LOGIC] No response received from initial query")
+        answer = "No initial response could be generated."
+
+    print("\n[Agent 3 LOGIC] INITIAL RESPONSE:")
+    print("-"*30)
+    print(answer)
+    print("-"*30 + "\n")
+    return answer
+
+
+def ask_agent(question: str, session_id: str = None) -> str:
+    """
+    Main function to process a query and generate a response.
+    With a session id, follow-ups on the same topic reuse that session's gathered context.
+    """
     # Add debug log to confirm function is entered
     logger.info(f"[Agent 3 LOGIC] Entering ask_agent with question: '{question}'")
     
@@ -211,121 +443,90 @@ def ask_agent(question: str) -> str:
         return error_message
 
     try:
-        # Initial response attempt
-        logger.info("[Agent 3 LOGIC] Attempting initial response...")
-        thread = project_client.agents.create_thread()
-        prompt_initial = f"You are a strategic consultant. Answer clearly and directly:\n\n{question}"
-        project_client.agents.create_message(thread_id=thread.id, role="user", content=prompt_initial)
-        
-        logger.info("[Agent 3 LOGIC] Creating initial run...")
-        run = project_client.agents.create_and_process_run(thread_id=thread.id, agent_id=agent.id)
-        
-        # Poll for completion with timeout
-        start_time = time.time()
-        timeout = 60  # 60 seconds timeout
-        while run.status.name not in ('COMPLETED', 'FAILED', 'CANCELLED', 'EXPIRED'):
-            if time.time() - start_time > timeout:
-                logger.warning("[Agent 3 LOGIC] Initial response timed out")
-                raise TimeoutError("Initial response generation timed out after 60 seconds")
-                
-            time.sleep(2)
-            run = project_client.agents.get_run(thread_id=thread.id, run_id=run.id)
-            logger.debug(f"[Agent 3 LOGIC] Initial run status: {run.status.name}")
-            
-        if run.status.name != 'COMPLETED':
-            logger.warning(f"[Agent 3 LOGIC] Initial run failed with status: {run.status.name}")
-            raise RuntimeError(f"Initial response generation failed with status: {run.status.name}")
+        # A follow-up in the same session can reuse the context gathered for an earlier question
+        reused = session_contexts.find(session_id, question) if session_contexts else None
+        if reused:
+            logger.info(f"[Agent 3 LOGIC] Reusing session context from \"{reused['query'][:80]}\" "
+                        f"(similarity {reused['similarity']}, coverage {reused['coverage']}) "
+                        f"- skipping evaluation and the chains with a stored context")
+            answer = ""
+            context_need = "needs both internal and external context (reused from session)"
+        else:
+            # The local rules decide the context need when they are confident. The enhanced
+            # response is written from the contexts, so the initial answer is only needed
+            # when no context will be fetched or the LLM has to evaluate it.
+            decision = context_classifier.classify(question) if context_classifier else None
+            if decision and decision["confident"] and decision["label"] != "none":
+                logger.info(f"[Agent 3 LOGIC] Context need from rules: {decision['label']} "
+                            f"(confidence {decision['confidence']}) - skipping initial answer and evaluation")
+                answer = ""
+            else:
+                answer = generate_initial_answer(question)
+
+            # Evaluate if context is needed
+            if decision and decision["confident"]:
+                context_need = decision["evaluation"].lower()
+                context_classifier.record(question, decision)
+            else:
+                context_need = evaluate_context_need(question, answer)
             
-        messages = list(project_client.agents.list_messages(thread_id=thread.id).data)
-        answer = extract_latest_assistant_message(messages)
-        if not answer:
-            logger.warning("[Agent 3 LOGIC] No response received from initial query")
-            answer = "No initial response could be generated."
-
-        print("\n[Agent 3 LOGIC] INITIAL RESPONSE:")
-        print("-"*30)
-        print(answer)
-        print("-"*30 + "\n")
-
-        # Evaluate if context is needed
-        context_need = evaluate_context_need(question, answer)
-        
-        # Default to requiring both contexts if we got an error string
-        if "error:" in context_need.lower():
-            logger.warning(f"[Agent 3 LOGIC] Context evaluation returned error: {context_need}")
-            context_need = "needs both internal and external context"
+                # Default to requiring both contexts if we got an error string
+                if "error:" in context_need.lower():
+                    logger.warning(f"[Agent 3 LOGIC] Context evaluation returned error: {context_need}")
+                    context_need = "needs both internal and external context"
+                elif decision:
+                    context_classifier.record(question, decision, llm_evaluation=context_need)
 
         internal_context = ""
         global_context = ""
 
         # If sufficient, we can skip context gathering - but Agent 4 still needs to be called
-        if "sufficient" in context_need:
+        if "sufficient" in context_need or "no additional context" in context_need:
             logger.info("[Agent 3 LOGIC] Initial answer sufficient - no additional context needed")
             enhanced_answer = answer  # Use initial answer directly
         else:
             # Need to gather context
             logger.info(f"[Agent 3 LOGIC] Additional context required ({context_need}) - querying relevant agents...")
 
-            # Get internal context if needed
-            if "internal" in context_need:
-                try:
-                    internal_q1 = formulate_internal_questions(question)
-                    if "error:" in internal_q1.lower():
-                        logger.warning(f"[Agent 3 LOGIC] Error formulating internal questions: {internal_q1}")
-                        internal_q1 = f"What internal documents contain information relevant to: {question}"
-                        
-                    logger.info(f"[Agent 3 LOGIC] Requesting internal docs from Agent 1: {internal_q1}")
-                    internal_context = request_internal_docs(internal_q1)
-                    
-                    if "[Error Agent 1:" in internal_context:
-                        logger.warning(f"[Agent 3 LOGIC] Error from Agent 1: {internal_context}")
-                    elif not internal_context:
-                        logger.warning("[Agent 3 LOGIC] Empty response from Agent 1")
-                        internal_context = "No relevant internal documents found."
-                    else:
-                        logger.info(f"[Agent 3 LOGIC] Received internal context from Agent 1 ({len(internal_context)} chars)")
-                    
-                except Exception as e:
-                    logger.error(f"[Agent 3 LOGIC] Error when requesting internal docs: {e}")
-                    internal_context = f"[Error requesting internal documents: {str(e)}]"
-
-            # Get external context if needed
-            if "external" in context_need:
-                try:
-                    global_q1 = formulate_search_questions(question)
-                    if "error:" in global_q1.lower():
-                        logger.warning(f"[Agent 3 LOGIC] Error formulating search query: {global_q1}")
-                        global_q1 = f"Current 2025 information about {question}"
-                        
-                    logger.info(f"[Agent 3 LOGIC] Requesting global intel from Agent 2: {global_q1}")
-                    global_context = request_global_intel(global_q1)
-                    
-                    if "[Error Agent 2:" in global_context:
-                        logger.warning(f"[Agent 3 LOGIC] Error from Agent 2: {global_context}")
-                    elif not global_context:
-                        logger.warning("[Agent 3 LOGIC] Empty response from Agent 2")
-                        global_context = "No relevant external information found."
-                    else:
-                        logger.info(f"[Agent 3 LOGIC] Received global context from Agent 2 ({len(global_context)} chars)")
-                
-                except Exception as e:
-                    logger.error(f"[Agent 3 LOGIC] Error when requesting global intel: {e}")
-                    global_context = f"[Error requesting external information: {str(e)}]"
+            if reused:
+                # Only the chains without a stored context run again
+                internal_context, global_context = gather_contexts(
+                    question,
+                    internal=not reused["internal_context"],
+                    external=not reused["external_context"]
+                )
+                internal_context = reused["internal_context"] or internal_context
+                global_context = reused["external_context"] or global_context
+            else:
+                # Internal and external chains are independent; run them side by side
+                internal_context, global_context = gather_contexts(
+                    question,
+                    internal="internal" in context_need,
+                    external="external" in context_need
+                )
+            if session_contexts:
+                # Each chain's context is kept only if that chain succeeded
+                session_contexts.put(session_id, question,
+                                     internal_context if context_succeeded(internal_context) else None,
+                                     global_context if context_succeeded(global_context) else None)
 
             # Now generate enhanced response with contexts
             try:
                 logger.info("[Agent 3 LOGIC] Generating enhanced response with contexts...")
                 
-                # Load the final response template
-                try:
-                    with open("prompts/combiNASHUN.txt", "r", encoding="utf-8") as f:
-                        prompt_template = f.read()
-                except Exception as f_err:
-                    logger.error(f"[Agent 3 LOGIC] Failed to load combiNASHUN.txt: {f_err}")
-                    raise
-                    
+                if CONTEXT_TOKEN_BUDGET > 0:
+                    # Keep only the passages most relevant to the question within the budget
+                    compressed, report = compress_contexts(
+                        {"internal": internal_context, "external": global_context},
+                        question,
+                        token_budget=CONTEXT_TOKEN_BUDGET
+                    )
+                    internal_context, global_context = compressed["internal"], compressed["external"]
+                    logger.info(f"[Agent 3 LOGIC] Context compressed {describe(report)}")
+
                 # Fill in the template
-                enhanced_prompt = prompt_template.format(
+                enhanced_prompt = render_prompt(
+                    "combiNASHUN",
                     question=question,
                     internal_context=internal_context or "No internal context available.",
                     global_context=global_context or "No external context available.",
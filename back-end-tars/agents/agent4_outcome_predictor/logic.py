@@ -74,18 +74,13 @@ def fetch_internal_facts(subqs: list[str]) -> str:
         print("[Agent 4] ⚠️ No valid questions to send to Agent1")
         return "Error: No valid questions generated"
         
-    # Clean up formatting
-    cleaned = []
-    for i, q in enumerate(subqs, 1):
-        # Remove any existing numbering
-        q = re.sub(r'^\d+\.?\s*', '', q.strip())
-        cleaned.append(f"{i}. {q}")
-        
-    joined = "\n".join(cleaned)
-    print(f"[Agent 4] 📝 Fetching internal facts for:\n{joined}")
+    # Remove any existing numbering; Agent 1 numbers the merged answers itself
+    cleaned = [re.sub(r'^\d+\.?\s*', '', q.strip()) for q in subqs]
+    print(f"[Agent 4] 📝 Fetching internal facts for:\n" + "\n".join(cleaned))
     
     try:
-        facts = request_internal_docs(joined, caller="Agent4")
+        # One part per question: Agent 1 answers them concurrently instead of in one long run
+        facts = request_internal_docs(cleaned, caller="Agent4")
         if facts and not facts.startswith("Error"):
             print(f"[Agent 4] ✅ Received facts from Agent1")
             print(facts) 
@@ -6,8 +6,10 @@ from dotenv import load_dotenv
 from azure.ai.projects import AIProjectClient
 from azure.identity import DefaultAzureCredential
 from agents.agent5_task_dispatcher.client import GraphClient
+from shared.prompts import load_prompts, render_prompt
 
 load_dotenv()
+load_prompts()
 
 # === Azure AI Foundry setup ===
 print("🔌 [Agent5] Initializing Azure Foundry client…")
@@ -58,11 +60,7 @@ def parse_input(raw_input: str) -> dict:
         pass
 
     # else ask the agent
-    prompt_t = open(
-        "prompts/agent5_parse_input.txt",
-        encoding="utf-8"
-    ).read()
-    prompt = prompt_t.replace("{raw_input}", raw_input)
+    prompt = render_prompt("agent5_parse_input", raw_input=raw_input)
     print("🔍 [Agent5] Asking agent to normalize input…")
     tid = project_client.agents.create_thread().id
     project_client.agents.create_message(thread_id=tid, role="user", content=prompt)
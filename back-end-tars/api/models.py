@@ -4,6 +4,7 @@ from pydantic import BaseModel, Field
 # Request Models
 class OptimizationRequest(BaseModel):
     query: str = Field(..., description="User input message describing the business process or optimization request")
+    session_id: Optional[str] = Field(None, description="Conversation id; follow-ups with the same id can reuse gathered context")
 
 # Response Models - Node
 class NodePosition(BaseModel):
@@ -45,7 +45,7 @@ async def optimize_process(request: OptimizationRequest) -> Dict[str, Any]:
             )
             
         # Process the query through the agent system
-        result = await agent_manager.process_query(request.query)
+        result = await agent_manager.process_query(request.query, session_id=request.session_id)
         
         return result
         
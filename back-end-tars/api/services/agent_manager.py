@@ -152,12 +152,13 @@ class AgentManager:
         
         return self.agent_statuses
     
-    async def process_query(self, query: str) -> Dict[str, Any]:
+    async def process_query(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a query through the AI agent system.
         
         Args:
             query: The user's query string
+            session_id: Optional conversation id, passed on so Agent 3 can reuse gathered context
             
         Returns:
             Processed response data as a dictionary
@@ -187,6 +188,8 @@ class AgentManager:
                     ]
                 }
             }
+            if session_id:
+                payload["session_id"] = session_id
             
             async with httpx.AsyncClient(timeout=60.0) as client:
                 # Send request to Agent 3
@@ -1,4 +1,4 @@
-from typing import Dict, Any
+from typing import Dict, Any, List
 from azure.ai.projects import AIProjectClient
 from azure.ai.projects.models import RunStatus
 from azure.identity import DefaultAzureCredential
@@ -6,11 +6,16 @@ import os
 import time
 from datetime import datetime
 import asyncio
+import json
 import re
 
 from app.agents.base import Agent
 from app.utils.config import settings
 from app.utils.logging import get_logger
+from shared.answer_cache import AnswerCache
+from shared.formulation import numbered, numbered_answers
+from shared.micro_batch import MicroBatcher
+from shared.prompts import render_prompt
 
 class EnterpriseKnowledgeAgent(Agent):
     """Agent 1: Retrieves information from internal company documents"""
@@ -20,11 +25,30 @@ class EnterpriseKnowledgeAgent(Agent):
         self.logger = get_logger("agent1")
         self.client = None
         self.agent = None
+        # Opt-in: questions arriving within one window share a structured multi-question run
+        self.batcher = MicroBatcher(
+            self._process_batch,
+            window=settings.AGENT1_BATCH_WINDOW_MS / 1000,
+            max_batch=settings.AGENT1_BATCH_MAX_SIZE
+        ) if settings.AGENT1_MICRO_BATCH else None
+        # Answers by normalized question, warm-loaded from disk and dropped when the knowledge version changes
+        self.answers = AnswerCache(
+            path=settings.AGENT1_ANSWER_CACHE_PATH or None,
+            version=settings.AGENT1_KNOWLEDGE_VERSION,
+            ttl=settings.AGENT1_ANSWER_CACHE_TTL
+        ) if settings.AGENT1_ANSWER_CACHE else None
         
     @property
     def name(self) -> str:
         return "Enterprise Knowledge Agent"
     
+    def diagnostics(self) -> Dict[str, Any]:
+        """Micro-batching window, batch sizes and per-caller wait; answer cache hits per caller"""
+        return {
+            "micro_batch": self.batcher.stats() if self.batcher else {},
+            "answer_cache": self.answers.stats() if self.answers else {}
+        }
+    
     async def setup_client(self):
         """Create client connection (async-friendly wrapper)"""
         if self.client is None or self.agent is None:
@@ -42,8 +66,17 @@ class EnterpriseKnowledgeAgent(Agent):
         self.logger.info("Created fresh client connection")
     
     async def process(self, input_data: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
-        """Process a question using the enterprise knowledge base"""
-        question = input_data.get("question", "")
+        """
+        Process a question using the enterprise knowledge base.
+        
+        ``input_data["questions"]`` (a list) is answered as one concurrent run
+        per question, each through the completion cache, and the answers are
+        merged in order; otherwise ``input_data["question"]`` is answered in a
+        single run. With ``context["agent1_memo"]`` (set by the process manager
+        for the request) each question is answered through that memo.
+        """
+        questions = [q.strip() for q in input_data.get("questions") or [] if q and q.strip()]
+        question = input_data.get("question", "") or numbered(questions)
         caller = input_data.get("caller", "Agent3")
         
         self.logger.info(f"📥 Received from {caller}: {question}")
@@ -51,23 +84,127 @@ class EnterpriseKnowledgeAgent(Agent):
         # Setup client if needed
         await self.setup_client()
         
-        # Process request with timeout handling
-        result = await self._handle_timeout(
-            self._process_request(question),
-            timeout_seconds=settings.AGENT1_TIMEOUT,
-            fallback_data={"response": f"Unable to retrieve information about '{question}' within time limit"}
-        )
+        memo = (context or {}).get("agent1_memo")
+        if questions:
+            results = await self._answer_each(questions, caller, memo)
+            answers = [r.get("response", "No response generated") for r in results]
+            response = numbered_answers(questions, answers)
+        else:
+            results = [await self._answer_memoized(question, caller, memo)]
+            response = results[0].get("response", "No response generated")
         
         # Prepare return data
         response_data = {
             "question": question,
-            "response": result.get("response", "No response generated"),
+            "response": response,
             "timestamp": datetime.now().isoformat(),
-            "caller": caller
+            "caller": caller,
+            # Canned fallback or timed-out answers are in the response; callers should not keep it
+            "is_fallback": any(r.get("fallback") or "error" in r for r in results)
         }
+        if questions:
+            response_data["answers"] = answers
         
         return response_data
     
+    async def _answer(self, question: str, caller: str = "") -> Dict[str, Any]:
+        """One question, from the answer cache, the micro-batcher or a run, with timeout handling"""
+        if self.answers:
+            cached = self.answers.get(question, caller)
+            if cached is not None:
+                self.logger.info(f"💾 Answer cache hit for {caller}: {question[:80]}")
+                return {"response": cached}
+        
+        if self.batcher:
+            complete = lambda: self.batcher.submit(question, caller)
+        else:
+            complete = lambda: self._process_request(question)
+        if self.answers:
+            # The answer cache replaces the completion cache here: it is keyed more loosely,
+            # and a completion cached under an older knowledge version would outlive the bump
+            work = self._remember_answer(question, caller, complete)
+        else:
+            work = self._cached_completion("knowledge", question, complete)
+        return await self._handle_timeout(
+            work,
+            timeout_seconds=settings.AGENT1_TIMEOUT,
+            fallback_data={"response": f"Unable to retrieve information about '{question}' within time limit",
+                           "fallback": True}
+        )
+    
+    async def _remember_answer(self, question: str, caller: str, complete) -> Dict[str, Any]:
+        # Taken before asking: an answer retrieved across a version bump must not be cached
+        generation = self.answers.generation
+        result = await complete()
+        if "error" not in result and not result.get("fallback"):
+            self.answers.set(question, result.get("response", ""), caller, generation)
+        return result
+    
+    def set_knowledge_version(self, version: str) -> bool:
+        """Record a new knowledge version (e.g. after a document upload); drops the cached answers"""
+        if not self.answers:
+            return False
+        return self.answers.set_version(version)
+    
+    async def _answer_memoized(self, question: str, caller: str = "", memo=None) -> Dict[str, Any]:
+        """``_answer``, through the request's memo when there is one"""
+        if memo is None:
+            return await self._answer(question, caller)
+        return await memo.answer(question, lambda: self._answer(question, caller))
+    
+    async def _answer_each(self, questions: List[str], caller: str = "", memo=None) -> List[Dict[str, Any]]:
+        """Answer the questions as concurrent runs; takes as long as the slowest uncached one"""
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._answer_memoized(q, caller, memo) for q in questions))
+        self.logger.info(f"📚 Answered {len(questions)} questions concurrently in {time.perf_counter() - start:.2f}s")
+        return list(results)
+    
+    async def _process_batch(self, questions: List[str]) -> List[Dict[str, Any]]:
+        """
+        Answer a micro-batch in one structured run (prompts/agent1_batch.txt).
+        Identical questions are asked once; if the reply cannot be split into
+        one answer per question, each question gets its own run instead.
+        """
+        unique = list(dict.fromkeys(questions))
+        if len(unique) == 1:
+            result = await self._process_request(unique[0])
+            return [result] * len(questions)
+        
+        self.logger.info(f"📦 Answering {len(unique)} batched questions in one run")
+        result = await self._process_request(render_prompt("agent1_batch", questions=numbered(unique)))
+        answers = None if result.get("fallback") else self._split_batch_answers(result.get("response", ""), len(unique))
+        if answers is None:
+            self.logger.warning("⚠️ Batched reply unusable, answering the questions separately")
+            results = await asyncio.gather(*(self._process_request(q) for q in unique))
+        else:
+            results = [{"response": answer} for answer in answers]
+        by_question = dict(zip(unique, results))
+        return [by_question[q] for q in questions]
+    
+    def _split_batch_answers(self, reply: str, count: int):
+        """The answers of a batched reply in question order, or None if any is missing"""
+        text = re.sub(r"^```(?:json)?\s*|\s*```$", "", (reply or "").strip())
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end <= start:
+            return None
+        try:
+            entries = json.loads(text[start:end + 1]).get("answers")
+        except (ValueError, AttributeError):
+            return None
+        if not isinstance(entries, list):
+            return None
+        answers = {}
+        for position, entry in enumerate(entries, 1):
+            if not isinstance(entry, dict) or not isinstance(entry.get("answer"), str):
+                return None
+            try:
+                answers[int(entry.get("id", position))] = entry["answer"].strip()
+            except (TypeError, ValueError):
+                return None
+        if any(not answers.get(i) for i in range(1, count + 1)):
+            return None
+        return [answers[i] for i in range(1, count + 1)]
+    
     async def _process_request(self, question: str) -> Dict[str, Any]:
         """Core processing logic as async coroutine"""
         loop = asyncio.get_event_loop()
@@ -119,23 +256,23 @@ class EnterpriseKnowledgeAgent(Agent):
                     # If no response was found or it's empty, provide a fallback
                     if not response or len(response.strip()) < 10:
                         self.logger.warning("Received empty or very short response, using fallback")
-                        return self._generate_fallback_response(question)
+                        return {**self._generate_fallback_response(question), "fallback": True}
                     
                     return {"response": response or "Empty response from knowledge base"}
                 
                 if run_status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
                     self.logger.error(f"Run failed with status: {run_status}")
-                    return self._generate_fallback_response(question)
+                    return {**self._generate_fallback_response(question), "fallback": True}
                 
                 await asyncio.sleep(1)
                 waited += 1
             
             self.logger.warning(f"Timeout waiting for completion after {waited}s, status: {run_status}")
-            return self._generate_fallback_response(question)
+            return {**self._generate_fallback_response(question), "fallback": True}
             
         except Exception as e:
             self.logger.error(f"Error processing request: {e}")
-            return self._generate_fallback_response(question)
+            return {**self._generate_fallback_response(question), "fallback": True}
             
         finally:
             # Cleanup
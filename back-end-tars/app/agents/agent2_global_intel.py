@@ -11,6 +11,14 @@ from datetime import datetime
 from app.agents.base import Agent
 from app.utils.config import settings
 from app.utils.logging import get_logger
+from shared.dedupe import dedupe_results
+from shared.local_index import open_index
+from shared.mcp_search import MCPSearch
+from shared.page_fetch import PageFetcher
+from shared.result_packer import coerce_results, pack_results
+from shared.rate_limit import build_limiters, parse_rate_limits
+from shared.search_cache import SearchCache
+from shared.search_orchestrator import AdaptiveSelector, SearchOrchestrator
 
 class GlobalIntelligenceAgent(Agent):
     """Agent 2: Searches for external information using search services"""
@@ -18,6 +26,52 @@ class GlobalIntelligenceAgent(Agent):
     def __init__(self):
         super().__init__()
         self.logger = get_logger("agent2")
+        self.local_index = self._open_local_index()
+        # Brave and Firecrawl run as MCP sidecars, spawned on first use; only
+        # available when the mcp package and MCP_CONFIG_PATH are present
+        self.mcp = MCPSearch(
+            settings.MCP_CONFIG_PATH,
+            env={"NODE_TLS_REJECT_UNAUTHORIZED": "0"} if settings.MCP_SIDECAR_INSECURE_TLS else None
+        )
+        self.orchestrator = SearchOrchestrator(
+            self._build_providers(),
+            mode=settings.SEARCH_MODE,
+            deadline=settings.SEARCH_DEADLINE,
+            limiters=build_limiters(
+                parse_rate_limits(settings.SEARCH_RATE_LIMITS),
+                max_queue=settings.SEARCH_RATE_MAX_QUEUE,
+                max_wait=settings.SEARCH_RATE_MAX_WAIT
+            ),
+            selector=AdaptiveSelector(
+                epsilon=settings.SEARCH_ADAPTIVE_EPSILON,
+                max_failure_rate=settings.SEARCH_ADAPTIVE_MAX_FAILURE_RATE
+            )
+        )
+        self.search_cache = SearchCache(
+            settings.SEARCH_CACHE_PATH,
+            default_ttl=settings.SEARCH_CACHE_TTL,
+            provider_ttls=settings.SEARCH_CACHE_PROVIDER_TTLS,
+            max_entries=settings.SEARCH_CACHE_MAX_ENTRIES
+        ) if settings.SEARCH_CACHE_PATH else None
+        
+        # Optional page fetch + text extraction for the top results
+        self.page_fetcher = PageFetcher(
+            top_n=settings.AGENT2_ENRICH_TOP_N,
+            max_bytes=settings.AGENT2_ENRICH_MAX_BYTES,
+            per_host=settings.AGENT2_ENRICH_PER_HOST_LIMIT,
+            deadline=settings.AGENT2_ENRICH_DEADLINE
+        ) if settings.AGENT2_ENRICH_ENABLED else None
+        
+        # Agent-lifetime HTTP session, created lazily on the serving event loop
+        self._session = None
+        self._session_loop = None
+        self._http_stats = {
+            "requests": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0
+        }
         
     @property
     def name(self) -> str:
@@ -35,14 +89,22 @@ class GlobalIntelligenceAgent(Agent):
         search_results = await self._handle_timeout(
             self._search(clean_query),
             timeout_seconds=settings.AGENT2_TIMEOUT,
-            fallback_data={"results": []}
+            fallback_data={"results": [], "fallback": True}
         )
         
+        # Fetch and extract the top result pages (bounded by its own deadline)
+        if self.page_fetcher and search_results.get("results"):
+            search_results["results"] = await self._handle_timeout(
+                self.page_fetcher.enrich(search_results["results"]),
+                timeout_seconds=settings.AGENT2_ENRICH_DEADLINE + 1,
+                fallback_data=search_results["results"]
+            )
+        
         # Filter and summarize results
         summary = await self._handle_timeout(
             self._summarize_results(search_results, clean_query),
             timeout_seconds=settings.AGENT2_SUMMARY_TIMEOUT,
-            fallback_data={"summary": f"Unable to find relevant information about '{clean_query}'"}
+            fallback_data={"summary": f"Unable to find relevant information about '{clean_query}'", "fallback": True}
         )
         
         return {
@@ -50,40 +112,177 @@ class GlobalIntelligenceAgent(Agent):
             "clean_query": clean_query,
             "results": search_results.get("results", []),
             "summary": summary.get("summary", "No summary available"),
+            # Fallback or empty search results, or no summary: nothing worth reusing
+            "is_fallback": bool(search_results.get("fallback") or not search_results.get("results")
+                                or summary.get("fallback")),
+            "provider_stats": self.orchestrator.stats(),
+            "cache_stats": self.search_cache.stats() if self.search_cache else {},
+            "http_stats": self.http_stats(),
+            "enrich_stats": self.page_fetcher.stats() if self.page_fetcher else {},
             "timestamp": datetime.now().isoformat()
         }
     
+    def diagnostics(self) -> Dict[str, Any]:
+        """Provider statistics, recent routing decisions and cache/pool counters"""
+        return {
+            "mode": self.orchestrator.mode,
+            "providers": self.orchestrator.stats(),
+            "decisions": self.orchestrator.decisions(),
+            "cache": self.search_cache.stats() if self.search_cache else {},
+            "http": self.http_stats(),
+            "enrich": self.page_fetcher.stats() if self.page_fetcher else {},
+            "local_index": self.local_index.stats() if self.local_index else {},
+        }
+    
     def _extract_search_query(self, message: str) -> str:
         """Extract clean query from user message"""
         m = re.match(r'^(search(?: for)?\s+)(.*)$', message, re.IGNORECASE)
         q = m.group(2).strip() if m else message.strip()
         return re.sub(r'\s+', ' ', q)
     
+    def _open_local_index(self):
+        """Open the offline BM25 index if one is configured"""
+        if not settings.LOCAL_INDEX_PATH:
+            return None
+        try:
+            index = open_index(settings.LOCAL_INDEX_PATH, settings.LOCAL_INDEX_DOCS_DIR or None)
+            self.logger.info(f"📚 Local search index ready: {index.stats()}")
+            return index
+        except Exception as e:
+            self.logger.error(f"❌ Could not open local search index: {e}")
+            return None
+    
+    def _build_providers(self) -> Dict[str, Any]:
+        """Map each enabled and configured provider name to an async search callable"""
+        available = {
+            "search1api": self._search1api if settings.SEARCH1API_KEY else None,
+            "brave": (lambda q: self.mcp.brave(q, count=5)) if self.mcp.available() else None,
+            "firecrawl": (lambda q: self.mcp.firecrawl(q, limit=5)) if self.mcp.available() else None,
+            "local": (lambda q: self.local_index.search_async(q, k=5)) if self.local_index else None,
+        }
+        providers = {}
+        for name in settings.SEARCH_PROVIDERS:
+            if available.get(name):
+                providers[name] = available[name]
+            else:
+                self.logger.warning(f"⚠️ Search provider '{name}' is not available, skipping")
+        return providers
+    
+    def _dedupe(self, results: list) -> list:
+        """Collapse syndicated near-duplicate results before they are cached and summarized"""
+        if settings.SEARCH_DEDUPE_DISTANCE < 0:
+            return results
+        deduped = dedupe_results(results, max_distance=settings.SEARCH_DEDUPE_DISTANCE)
+        if len(deduped) < len(results):
+            self.logger.info(f"🧹 Collapsed {len(results) - len(deduped)} near-duplicate results")
+        return deduped
+    
     async def _search(self, query: str) -> Dict[str, Any]:
-        """Perform search using available providers"""
+        """Perform search using all available providers concurrently"""
         self.logger.info(f"🔍 Searching for: {query}")
         
-        # Try primary search provider (using Search1API for simplicity)
+        if self.search_cache:
+            cached = self.search_cache.get(query, self.orchestrator.mode)
+            if cached is not None:
+                return {"results": cached, "cached": True}
+        
         try:
-            results = await self._search1api(query)
+            results = await self.orchestrator.search(query)
             if results:
                 self.logger.info(f"✅ Search returned {len(results)} results")
+                results = self._dedupe(results)
+                if self.search_cache:
+                    self.search_cache.set(query, results, self.orchestrator.mode)
                 return {"results": results}
         except Exception as e:
-            self.logger.error(f"❌ Primary search error: {e}")
+            self.logger.error(f"❌ Search error: {e}")
         
         # Fallback search as needed
-        self.logger.warning("⚠️ Primary search failed, trying fallback")
+        self.logger.warning("⚠️ All search providers failed, trying fallback")
         try:
             results = await self._fallback_search(query)
             if results:
                 self.logger.info(f"✅ Fallback search returned {len(results)} results")
-                return {"results": results}
+                return {"results": results, "fallback": True}
         except Exception as e:
             self.logger.error(f"❌ Fallback search error: {e}")
         
         # Return empty results if all searches fail
-        return {"results": []}
+        return {"results": [], "fallback": True}
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it on first use"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            if self._session is not None and self._session_loop is not loop:
+                await self._retire_session(self._session, self._session_loop)
+            connector = aiohttp.TCPConnector(
+                limit=settings.AGENT2_HTTP_POOL_SIZE,
+                limit_per_host=settings.AGENT2_HTTP_PER_HOST_LIMIT,
+                ttl_dns_cache=settings.AGENT2_HTTP_DNS_TTL,
+                keepalive_timeout=settings.AGENT2_HTTP_KEEPALIVE
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=settings.AGENT2_TIMEOUT),
+                trace_configs=[self._trace_config()]
+            )
+            self._session_loop = loop
+            self.logger.info("Created pooled HTTP session")
+        return self._session
+    
+    async def _retire_session(self, session: aiohttp.ClientSession, loop: asyncio.AbstractEventLoop):
+        """Close a session left behind on another event loop, on that loop"""
+        if session.closed:
+            return
+        try:
+            if loop.is_running():
+                # Still serving in another thread: close it there
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+            elif not loop.is_closed():
+                await asyncio.to_thread(loop.run_until_complete, session.close())
+            else:
+                # Its loop is closed and its transports with it; nothing is left to await
+                session.detach()
+            self.logger.info("Closed HTTP session of a previous event loop")
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not close HTTP session of a previous event loop: {e}")
+            session.detach()
+    
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Count new vs. reused connections and DNS cache hits"""
+        stats = self._http_stats
+        
+        def counter(key):
+            async def _on_event(session, ctx, params):
+                stats[key] += 1
+            return _on_event
+        
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(counter("requests"))
+        trace.on_connection_create_end.append(counter("new_connections"))
+        trace.on_connection_reuseconn.append(counter("reused_connections"))
+        trace.on_dns_cache_hit.append(counter("dns_cache_hits"))
+        trace.on_dns_cache_miss.append(counter("dns_cache_misses"))
+        return trace
+    
+    def http_stats(self) -> Dict[str, Any]:
+        """Connection reuse statistics for the pooled session"""
+        stats = dict(self._http_stats)
+        connections = stats["new_connections"] + stats["reused_connections"]
+        stats["reuse_rate"] = round(stats["reused_connections"] / connections, 3) if connections else 0.0
+        return stats
+    
+    async def close(self):
+        """Close the pooled HTTP session, the page fetcher and the MCP sidecars"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            self.logger.info("Closed pooled HTTP session")
+        self._session = None
+        if self.page_fetcher:
+            await self.page_fetcher.close()
+        await self.mcp.aclose()
+        self.mcp.background.stop()
     
     async def _search1api(self, query: str, max_results: int = 5) -> list:
         """Search using Search1API"""
@@ -95,19 +294,23 @@ class GlobalIntelligenceAgent(Agent):
         headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
         payload = {'query': query, 'search_service': 'google', 'max_results': max_results}
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload, headers=headers, ssl=False) as response:
-                if response.status != 200:
-                    text = await response.text()
-                    raise Exception(f"Search API returned status {response.status}: {text}")
-                
-                data = await response.json()
-                return data.get('results', [])
+        session = await self._get_session()
+        async with session.post(url, json=payload, headers=headers, ssl=False) as response:
+            if response.status != 200:
+                text = await response.text()
+                raise Exception(f"Search API returned status {response.status}: {text}")
+            
+            return coerce_results(await response.json())
     
     async def _fallback_search(self, query: str) -> list:
         """Fallback search implementation"""
-        # In a production system, this would be a different search provider
-        # For this example, we'll return mock results
+        # The offline index answers when every online provider is down
+        if self.local_index:
+            results = await self.local_index.search_async(query, k=5)
+            if results:
+                return [{**r, "provider": "local"} for r in results]
+        
+        # Without one, return mock results
         return [
             {
                 "title": f"Mock result for '{query}'",
@@ -128,15 +331,17 @@ class GlobalIntelligenceAgent(Agent):
         if not results:
             return {"summary": f"No information found about '{query}'"}
         
+        # Keep only the fields the summary needs, most relevant first, within the
+        # token budget (extracted page text is preferred over provider snippets)
+        packed = pack_results(results, query, settings.AGENT2_PACK_TOKEN_BUDGET,
+                              settings.AGENT2_PACK_MAX_RESULTS)
+        
         # In a production system, this would use a summarization model
         # For this example, we'll create a basic summary
-        titles = [r.get("title", "") for r in results if r.get("title")]
-        descriptions = [r.get("description", "") for r in results if r.get("description")]
-        
         summary = f"Found {len(results)} results about '{query}'.\n\n"
         summary += "Key points:\n"
         
-        for i, (title, desc) in enumerate(zip(titles[:3], descriptions[:3]), 1):
-            summary += f"{i}. {title}: {desc[:100]}...\n"
+        for i, r in enumerate(packed, 1):
+            summary += f"{i}. {r['title']}: {r['description']}\n"
         
-        return {"summary": summary} 
\ No newline at end of file
+        return {"summary": summary}
\ No newline at end of file
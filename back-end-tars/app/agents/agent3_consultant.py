@@ -1,6 +1,9 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set, Tuple
 import asyncio
+import contextlib
+import contextvars
 import logging
+import time
 from datetime import datetime
 from azure.ai.projects import AIProjectClient
 from azure.ai.projects.models import RunStatus
@@ -8,8 +11,32 @@ from azure.identity import DefaultAzureCredential
 
 from app.agents.base import Agent
 from app.utils.config import settings
-from app.utils.azure_helpers import extract_message
+from app.utils.azure_helpers import extract_run_message
 from app.utils.logging import get_logger
+from shared.context_classifier import ContextClassifier
+from shared.keyphrases import SearchQueryBuilder
+from shared.context_compressor import compress_contexts, describe
+from shared.formulation import numbered, parse_formulation
+from shared.prompts import render_prompt
+from shared.session_context import SessionContextStore
+
+# Stands in for the initial answer in prompts sent on a session thread, where it is an earlier turn
+SESSION_PREVIOUS_ANSWER = "(See your previous answer in this conversation.)"
+
+
+class _Session:
+    """The Azure thread shared by one request's steps in session mode"""
+    
+    def __init__(self):
+        self.thread_id: Optional[str] = None
+        self.threads: List[str] = []
+        self.turns = 0
+        self.lock = asyncio.Lock()
+
+
+# Set for the duration of a request when AGENT3_SESSION_MODE is on; inherited by the request's tasks
+_session: contextvars.ContextVar = contextvars.ContextVar("agent3_session", default=None)
+
 
 class ConsultantAgent(Agent):
     """Agent 3: Central coordinator that coordinates analysis and formulates responses"""
@@ -20,11 +47,40 @@ class ConsultantAgent(Agent):
         self.agent_manager = agent_manager  # Reference to agent manager for calling other agents
         self.client = None
         self.agent = None
+        self.thread_stats = {"created": 0, "deleted": 0, "runs": 0}
+        # Contexts gathered per conversation, reused by follow-up questions on the same topic
+        self.session_contexts = SessionContextStore(
+            max_sessions=settings.AGENT3_CONTEXT_REUSE_SESSIONS,
+            ttl=settings.AGENT3_CONTEXT_REUSE_TTL,
+            min_similarity=settings.AGENT3_CONTEXT_REUSE_MIN_SIMILARITY
+        ) if settings.AGENT3_CONTEXT_REUSE else None
+        self.context_classifier = None
+        if settings.AGENT3_CONTEXT_CLASSIFIER:
+            try:
+                self.context_classifier = ContextClassifier(
+                    settings.AGENT3_CONTEXT_RULES,
+                    log_path=settings.AGENT3_CONTEXT_DECISION_LOG or None
+                )
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"⚠️ Context rules unavailable, always using the LLM evaluation: {e}")
+        # Keyphrase search queries; the LLM formulates only when they are not confident
+        self.query_builder = SearchQueryBuilder(
+            min_confidence=settings.AGENT3_LOCAL_QUERY_MIN_CONFIDENCE
+        ) if settings.AGENT3_LOCAL_SEARCH_QUERY else None
     
     @property
     def name(self) -> str:
         return "Consultant Agent"
     
+    def diagnostics(self) -> Dict[str, Any]:
+        """How often the local fast paths replaced LLM runs, and thread usage"""
+        return {
+            "context_classifier": self.context_classifier.stats() if self.context_classifier else {},
+            "search_queries": self.query_builder.stats() if self.query_builder else {},
+            "session_contexts": self.session_contexts.stats() if self.session_contexts else {},
+            "threads": dict(self.thread_stats),
+        }
+    
     async def setup_client(self):
         """Create client connection (async-friendly wrapper)"""
         if self.client is None or self.agent is None:
@@ -49,61 +105,110 @@ class ConsultantAgent(Agent):
         # Setup Azure client
         await self.setup_client()
         
-        # Step 1: Generate initial response
-        initial_response = await self._handle_timeout(
-            self._generate_initial_response(query),
-            timeout_seconds=settings.AGENT3_INITIAL_TIMEOUT,
-            fallback_data={"answer": f"I'm analyzing your query about '{query}'..."}
-        )
-        
-        # Step 2: Evaluate if additional context is needed
-        context_evaluation = await self._handle_timeout(
-            self._evaluate_context_need(query, initial_response.get("answer", "")),
-            timeout_seconds=settings.AGENT3_EVAL_TIMEOUT,
-            fallback_data={"evaluation": "Needs both internal and external context"}
-        )
-        
-        evaluation = context_evaluation.get("evaluation", "").lower()
-        self.logger.info(f"🔍 Context evaluation: \"{evaluation}\"")
-        
-        # Step 3: Get internal company documents if needed
-        internal_context = ""
-        if "internal" in evaluation or "both" in evaluation:
-            # Formulate questions for internal knowledge
-            internal_questions = await self._handle_timeout(
-                self._formulate_internal_questions(query),
-                timeout_seconds=settings.AGENT3_FORMULATE_TIMEOUT,
-                fallback_data={"questions": query}
-            )
-            
-            # Request information from Agent 1
-            internal_result = await self.agent_manager.call_agent(
-                "agent1",
-                {"question": internal_questions.get("questions", query), "caller": "Agent3"}
-            )
-            
-            internal_context = internal_result.get("response", "")
-            self.logger.info(f"📄 Received internal context ({len(internal_context)} chars)")
+        async with self._request_session():
+            return await self._answer(query, input_data.get("session_id"))
+    
+    @contextlib.asynccontextmanager
+    async def _request_session(self):
+        """Run the enclosed steps on one shared thread when AGENT3_SESSION_MODE is on"""
+        if not settings.AGENT3_SESSION_MODE:
+            yield None
+            return
+        session = _Session()
+        token = _session.set(session)
+        start = time.perf_counter()
+        try:
+            yield session
+        finally:
+            _session.reset(token)
+            for thread_id in session.threads:
+                await self._delete_thread(thread_id)
+            self.logger.info(f"🧵 Session: {session.turns} turns on {len(session.threads)} thread(s) "
+                             f"in {time.perf_counter() - start:.2f}s")
+    
+    def _reusable_context(self, session_id: Optional[str], query: str) -> Optional[Dict[str, Any]]:
+        """Context gathered earlier in this session that also fits ``query``, if any"""
+        if not self.session_contexts or not session_id:
+            return None
+        reused = self.session_contexts.find(session_id, query)
+        if reused:
+            kept = [name for name in ("internal", "external") if reused[f"{name}_context"]]
+            self.logger.info(f"♻️ Reusing session context from \"{reused['query'][:80]}\" "
+                             f"(similarity {reused['similarity']}, coverage {reused['coverage']}) "
+                             f"- {' and '.join(kept)} context reused")
+        return reused
+    
+    async def _reuse_contexts(self, query: str, reused: Dict[str, Any]) -> Tuple[str, str, Set[str]]:
+        """The reused entry's contexts, gathering again only the chains it has no context for"""
+        internal_context = external_context = ""
+        succeeded = set()
+        missing_internal, missing_external = not reused["internal_context"], not reused["external_context"]
+        if missing_internal or missing_external:
+            internal_context, external_context, succeeded = await self._gather_contexts(
+                query, internal=missing_internal, external=missing_external)
+        if reused["internal_context"]:
+            internal_context = reused["internal_context"]
+            succeeded.add("internal")
+        if reused["external_context"]:
+            external_context = reused["external_context"]
+            succeeded.add("external")
+        return internal_context, external_context, succeeded
+    
+    def _remember_contexts(self, session_id: Optional[str], query: str, internal_context: str,
+                           external_context: str, succeeded: Set[str], answer: str = ""):
+        """Keep the contexts of the chains that succeeded for follow-ups in this session"""
+        if self.session_contexts:
+            self.session_contexts.put(session_id, query,
+                                      internal_context if "internal" in succeeded else None,
+                                      external_context if "external" in succeeded else None,
+                                      answer)
+    
+    async def _answer(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Steps 1-5 of process: context need, contexts and the enhanced answer"""
+        reused = self._reusable_context(session_id, query)
+        if reused:
+            # A follow-up on the same topic: skip the context decision and the chains with a stored context
+            initial_response = {"answer": ""}
+            evaluation = "reused session context"
+            context_source = "session"
+            internal_context, external_context, succeeded = await self._reuse_contexts(query, reused)
+        else:
+            # Steps 1 and 2: the local rules decide the context need when they are confident;
+            # otherwise generate an initial response and let the LLM evaluate it
+            decision = self.context_classifier.classify(query) if self.context_classifier else None
+            context_source = "llm"
+            if decision and decision["confident"] and decision["label"] != "none":
+                # The enhanced response is written from the contexts, so the initial answer is skipped too
+                self.logger.info(f"🧭 Context need from rules: {decision['label']} (confidence {decision['confidence']}, "
+                                 f"{decision['elapsed_us']}µs) - skipping initial answer and evaluation runs")
+                initial_response = {"answer": ""}
+            else:
+                initial_response = await self._handle_timeout(
+                    self._generate_initial_response(query),
+                    timeout_seconds=settings.AGENT3_INITIAL_TIMEOUT,
+                    fallback_data={"answer": f"I'm analyzing your query about '{query}'..."}
+                )
         
-        # Step 4: Get external search results if needed - ALWAYS get external context
-        external_context = ""
-        # Modified to always get external context regardless of evaluation
-        # if "external" in evaluation or "both" in evaluation:
-        # Formulate search query
-        search_query = await self._handle_timeout(
-            self._formulate_search_questions(query),
-            timeout_seconds=settings.AGENT3_FORMULATE_TIMEOUT,
-            fallback_data={"search_query": query}
-        )
+            if decision and decision["confident"]:
+                evaluation = decision["evaluation"].lower()
+                context_source = "rules"
+                self.context_classifier.record(query, decision)
+            else:
+                context_evaluation = await self._handle_timeout(
+                    self._evaluate_context_need(query, initial_response.get("answer", "")),
+                    timeout_seconds=settings.AGENT3_EVAL_TIMEOUT,
+                    fallback_data={"evaluation": "Needs both internal and external context"}
+                )
+                evaluation = context_evaluation.get("evaluation", "").lower()
+                if decision:
+                    self.context_classifier.record(query, decision, llm_evaluation=evaluation)
         
-        # Request information from Agent 2
-        external_result = await self.agent_manager.call_agent(
-            "agent2",
-            {"query": search_query.get("search_query", query)}
-        )
+            self.logger.info(f"🔍 Context evaluation ({context_source}): \"{evaluation}\"")
         
-        external_context = external_result.get("summary", "")
-        self.logger.info(f"🌐 Received external context ({len(external_context)} chars)")
+            # Steps 3 and 4: Get internal documents (if needed) and external search results
+            # concurrently - external context is ALWAYS gathered regardless of evaluation
+            needs_internal = "internal" in evaluation or "both" in evaluation
+            internal_context, external_context, succeeded = await self._gather_contexts(query, internal=needs_internal)
         
         # Step 5: Generate final enhanced response
         enhanced_response = await self._handle_timeout(
@@ -111,370 +216,257 @@ class ConsultantAgent(Agent):
             timeout_seconds=settings.AGENT3_ENHANCE_TIMEOUT,
             fallback_data={"enhanced_answer": initial_response.get("answer", "")}
         )
+        self._remember_contexts(session_id, query, internal_context, external_context, succeeded,
+                                enhanced_response.get("enhanced_answer", ""))
         
         return {
             "query": query,
             "initial_answer": initial_response.get("answer", ""),
             "context_evaluation": evaluation,
+            "context_source": context_source,
+            "reused_context": bool(reused),
             "internal_context": internal_context,
             "external_context": external_context,
             "enhanced_answer": enhanced_response.get("enhanced_answer", ""),
             "timestamp": datetime.now().isoformat()
         }
     
-    async def _generate_initial_response(self, query: str) -> Dict[str, str]:
-        """Generate initial response without additional context"""
+    async def _run_prompt(self, prompt: str, max_wait: int, kind: str = "answer") -> Dict[str, str]:
+        """
+        Send ``prompt`` as a user message, run the agent and return its reply
+        as {"text": ...}, or {"error": ...}.
+        
+        Outside a session every call gets its own thread, deleted afterwards,
+        and replies go through the shared completion cache under ``kind``.
+        Inside one (AGENT3_SESSION_MODE) the request's steps take turns on a
+        single thread, so the model sees the earlier turns and only one thread
+        is created and deleted per request; those replies depend on the
+        thread's history and are not cached.
+        """
+        session = _session.get()
+        if session is None:
+            return await self._cached_completion(kind, prompt, lambda: self._run_on_new_thread(prompt, max_wait))
+        
+        loop = asyncio.get_event_loop()
+        # A thread accepts one run at a time, so concurrent steps queue for it
+        async with session.lock:
+            if session.thread_id is None:
+                thread = await loop.run_in_executor(None, lambda: self.client.agents.create_thread())
+                self.thread_stats["created"] += 1
+                session.thread_id = thread.id
+                session.threads.append(thread.id)
+            session.turns += 1
+            try:
+                result = await self._complete(session.thread_id, prompt, max_wait)
+            except BaseException:
+                # A cancelled or failed run may still be active; later turns start a fresh thread
+                session.thread_id = None
+                raise
+            if "error" in result:
+                session.thread_id = None
+            return result
+    
+    async def _run_on_new_thread(self, prompt: str, max_wait: int) -> Dict[str, str]:
+        """One run on a thread of its own, deleted afterwards"""
         loop = asyncio.get_event_loop()
         thread = None
-        
         try:
-            # Create thread
-            thread = await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_thread()
-            )
-            
-            # Create message with the query
-            prompt_initial = f"You are a strategic consultant. Answer clearly and directly:\n\n{query}"
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_message(thread.id, role="user", content=prompt_initial)
-            )
-            
-            # Create and process run
+            thread = await loop.run_in_executor(None, lambda: self.client.agents.create_thread())
+            self.thread_stats["created"] += 1
+            return await self._complete(thread.id, prompt, max_wait)
+        finally:
+            if thread:
+                await self._delete_thread(thread.id)
+    
+    async def _complete(self, thread_id: str, prompt: str, max_wait: int) -> Dict[str, str]:
+        """Post one user message on a thread and wait for the agent's reply"""
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(
+            None,
+            lambda: self.client.agents.create_message(thread_id, role="user", content=prompt)
+        )
+        
+        run = await loop.run_in_executor(
+            None,
+            lambda: self.client.agents.create_and_process_run(thread_id, agent_id=self.agent.id)
+        )
+        self.thread_stats["runs"] += 1
+        
+        waited = 0
+        while waited < max_wait:
             run = await loop.run_in_executor(
                 None,
-                lambda: self.client.agents.create_and_process_run(thread.id, agent_id=self.agent.id)
+                lambda: self.client.agents.get_run(thread_id=thread_id, run_id=run.id)
             )
             
-            # Wait for completion
-            max_wait = settings.AGENT3_INITIAL_TIMEOUT - 1
-            waited = 0
-            
-            while waited < max_wait:
-                run = await loop.run_in_executor(
+            if run.status == RunStatus.COMPLETED:
+                messages = await loop.run_in_executor(
                     None,
-                    lambda: self.client.agents.get_run(thread_id=thread.id, run_id=run.id)
+                    lambda: list(self.client.agents.list_messages(thread_id).data)
                 )
-                
-                if run.status == RunStatus.COMPLETED:
-                    messages = await loop.run_in_executor(
-                        None,
-                        lambda: list(self.client.agents.list_messages(thread.id).data)
-                    )
-                    answer = extract_message(messages)
-                    return {"answer": answer}
-                
-                if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
-                    return {"error": f"Run failed: {run.status}"}
-                
-                await asyncio.sleep(1)
-                waited += 1
+                return {"text": extract_run_message(messages, run.id)}
             
-            return {"error": "Timeout waiting for completion"}
+            if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
+                return {"error": f"Run failed: {run.status}"}
+            
+            await asyncio.sleep(1)
+            waited += 1
+        
+        return {"error": "Timeout waiting for completion"}
+    
+    async def _delete_thread(self, thread_id: str):
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, lambda: self.client.agents.delete_thread(thread_id))
+            self.thread_stats["deleted"] += 1
+        except Exception as e:
+            self.logger.error(f"Error cleaning up thread: {e}")
+    
+    async def _generate_initial_response(self, query: str) -> Dict[str, str]:
+        """Generate initial response without additional context"""
+        try:
+            prompt_initial = f"You are a strategic consultant. Answer clearly and directly:\n\n{query}"
+            reply = await self._run_prompt(prompt_initial, settings.AGENT3_INITIAL_TIMEOUT - 1)
+            if "error" in reply:
+                return reply
+            return {"answer": reply["text"]}
             
         except Exception as e:
             self.logger.error(f"Error generating initial response: {e}")
             return {"error": str(e)}
-            
-        finally:
-            # Cleanup
-            if thread:
-                try:
-                    await loop.run_in_executor(
-                        None,
-                        lambda: self.client.agents.delete_thread(thread.id)
-                    )
-                except Exception as e:
-                    self.logger.error(f"Error cleaning up thread: {e}")
     
     async def _evaluate_context_need(self, question: str, initial_answer: str) -> Dict[str, str]:
         """Evaluate if additional context is needed"""
-        loop = asyncio.get_event_loop()
-        thread = None
-        
         try:
-            thread = await loop.run_in_executor(None, lambda: self.client.agents.create_thread())
-            
-            with open("prompts/evaluation.txt", "r", encoding="utf-8") as f:
-                eval_prompt = f.read().format(question=question, initial_answer=initial_answer)
-                
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_message(thread.id, role="user", content=eval_prompt)
-            )
-            
-            run = await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_and_process_run(thread.id, agent_id=self.agent.id)
-            )
-            
-            # Wait for completion
-            max_wait = settings.AGENT3_EVAL_TIMEOUT - 1
-            waited = 0
-            
-            while waited < max_wait:
-                run = await loop.run_in_executor(
-                    None,
-                    lambda: self.client.agents.get_run(thread_id=thread.id, run_id=run.id)
-                )
-                
-                if run.status == RunStatus.COMPLETED:
-                    messages = await loop.run_in_executor(
-                        None,
-                        lambda: list(self.client.agents.list_messages(thread.id).data)
-                    )
-                    evaluation = extract_message(messages).lower().strip()
-                    return {"evaluation": evaluation}
-                
-                if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
-                    return {"error": f"Run failed: {run.status}"}
-                
-                await asyncio.sleep(1)
-                waited += 1
-            
-            return {"error": "Timeout waiting for completion"}
+            if _session.get() is not None and initial_answer:
+                # The initial answer is already an earlier turn of this thread
+                initial_answer = SESSION_PREVIOUS_ANSWER
+            eval_prompt = render_prompt("evaluation", question=question, initial_answer=initial_answer)
+            reply = await self._run_prompt(eval_prompt, settings.AGENT3_EVAL_TIMEOUT - 1, kind="evaluation")
+            if "error" in reply:
+                return reply
+            return {"evaluation": reply["text"].lower().strip()}
             
         except Exception as e:
             self.logger.error(f"Error evaluating context need: {e}")
             return {"error": str(e)}
-            
-        finally:
-            # Cleanup
-            if thread:
-                try:
-                    await loop.run_in_executor(
-                        None,
-                        lambda: self.client.agents.delete_thread(thread.id)
-                    )
-                except Exception as e:
-                    self.logger.error(f"Error cleaning up thread: {e}")
     
     async def _formulate_internal_questions(self, original_question: str) -> Dict[str, str]:
         """Formulate questions for internal documents"""
-        loop = asyncio.get_event_loop()
-        thread = None
-        
         try:
-            thread = await loop.run_in_executor(None, lambda: self.client.agents.create_thread())
-            
-            with open("prompts/formulate_internal.txt", "r", encoding="utf-8") as f:
-                prompt = f.read().format(original_question=original_question)
-                
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_message(thread.id, role="user", content=prompt)
-            )
-            
-            run = await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_and_process_run(thread.id, agent_id=self.agent.id)
-            )
-            
-            # Wait for completion
-            max_wait = settings.AGENT3_FORMULATE_TIMEOUT - 1
-            waited = 0
-            
-            while waited < max_wait:
-                run = await loop.run_in_executor(
-                    None,
-                    lambda: self.client.agents.get_run(thread_id=thread.id, run_id=run.id)
-                )
-                
-                if run.status == RunStatus.COMPLETED:
-                    messages = await loop.run_in_executor(
-                        None,
-                        lambda: list(self.client.agents.list_messages(thread.id).data)
-                    )
-                    questions = extract_message(messages)
-                    self.logger.info(f"🔍 Generated internal questions: {questions}")
-                    return {"questions": questions}
-                
-                if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
-                    return {"error": f"Run failed: {run.status}"}
-                
-                await asyncio.sleep(1)
-                waited += 1
-            
-            return {"error": "Timeout waiting for completion"}
+            prompt = render_prompt("formulate_internal", original_question=original_question)
+            reply = await self._run_prompt(prompt, settings.AGENT3_FORMULATE_TIMEOUT - 1, kind="formulation")
+            if "error" in reply:
+                return reply
+            questions = reply["text"]
+            self.logger.info(f"🔍 Generated internal questions: {questions}")
+            return {"questions": questions}
             
         except Exception as e:
             self.logger.error(f"Error formulating internal questions: {e}")
             return {"error": str(e)}
-            
-        finally:
-            # Cleanup
-            if thread:
-                try:
-                    await loop.run_in_executor(
-                        None,
-                        lambda: self.client.agents.delete_thread(thread.id)
-                    )
-                except Exception as e:
-                    self.logger.error(f"Error cleaning up thread: {e}")
     
     async def _formulate_search_questions(self, original_question: str) -> Dict[str, str]:
         """Formulate search query for external information"""
-        loop = asyncio.get_event_loop()
-        thread = None
-        
         try:
-            thread = await loop.run_in_executor(None, lambda: self.client.agents.create_thread())
-            
-            with open("prompts/formulate_search.txt", "r", encoding="utf-8") as f:
-                prompt = f.read().format(original_question=original_question)
-                
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_message(thread.id, role="user", content=prompt)
-            )
-            
-            run = await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_and_process_run(thread.id, agent_id=self.agent.id)
-            )
-            
-            # Wait for completion
-            max_wait = settings.AGENT3_FORMULATE_TIMEOUT - 1
-            waited = 0
-            
-            while waited < max_wait:
-                run = await loop.run_in_executor(
-                    None,
-                    lambda: self.client.agents.get_run(thread_id=thread.id, run_id=run.id)
-                )
-                
-                if run.status == RunStatus.COMPLETED:
-                    messages = await loop.run_in_executor(
-                        None,
-                        lambda: list(self.client.agents.list_messages(thread.id).data)
-                    )
-                    search_query = extract_message(messages)
-                    self.logger.info(f"🔍 Generated search query: {search_query}")
-                    return {"search_query": search_query}
-                
-                if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
-                    return {"error": f"Run failed: {run.status}"}
-                
-                await asyncio.sleep(1)
-                waited += 1
-            
-            return {"error": "Timeout waiting for completion"}
+            prompt = render_prompt("formulate_search", original_question=original_question)
+            reply = await self._run_prompt(prompt, settings.AGENT3_FORMULATE_TIMEOUT - 1, kind="formulation")
+            if "error" in reply:
+                return reply
+            search_query = reply["text"]
+            self.logger.info(f"🔍 Generated search query: {search_query}")
+            return {"search_query": search_query}
             
         except Exception as e:
             self.logger.error(f"Error formulating search query: {e}")
             return {"error": str(e)}
+    
+    async def _formulate_combined(self, original_question: str) -> Dict[str, Any]:
+        """Formulate internal questions and search queries in one run (prompts/formulate_combined.txt)"""
+        try:
+            prompt = render_prompt("formulate_combined", original_question=original_question)
+            reply = await self._run_prompt(prompt, settings.AGENT3_FORMULATE_TIMEOUT - 1, kind="formulation")
+            if "error" in reply:
+                return reply
+            formulated = parse_formulation(reply["text"])
+            if formulated is None:
+                return {"error": f"Unusable combined formulation: {reply['text'][:200]}"}
+            self.logger.info(f"🔍 Generated internal questions {formulated['internal_questions']} "
+                             f"and search queries {formulated['search_queries']} in one run")
+            return formulated
             
-        finally:
-            # Cleanup
-            if thread:
-                try:
-                    await loop.run_in_executor(
-                        None,
-                        lambda: self.client.agents.delete_thread(thread.id)
-                    )
-                except Exception as e:
-                    self.logger.error(f"Error cleaning up thread: {e}")
+        except Exception as e:
+            self.logger.error(f"Error formulating questions: {e}")
+            return {"error": str(e)}
     
     async def _generate_enhanced_response(self, question: str, initial_answer: str, 
                                          internal_context: str, external_context: str) -> Dict[str, str]:
         """Generate enhanced response with additional context"""
-        loop = asyncio.get_event_loop()
-        thread = None
-        
         try:
-            thread = await loop.run_in_executor(None, lambda: self.client.agents.create_thread())
-            
-            with open("prompts/combiNASHUN.txt", "r", encoding="utf-8") as f:
-                prompt = f.read().format(
-                    question=question,
-                    internal_context=internal_context,
-                    global_context=external_context,
-                    initial_answer=initial_answer
+            if settings.AGENT3_CONTEXT_TOKEN_BUDGET > 0:
+                # Keep only the passages most relevant to the question within the budget
+                compressed, report = compress_contexts(
+                    {"internal": internal_context, "external": external_context},
+                    question,
+                    token_budget=settings.AGENT3_CONTEXT_TOKEN_BUDGET
                 )
-                
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_message(thread.id, role="user", content=prompt)
+                internal_context, external_context = compressed["internal"], compressed["external"]
+                self.logger.info(f"🗜️ Context compressed {describe(report)}")
+            
+            if _session.get() is not None and initial_answer:
+                initial_answer = SESSION_PREVIOUS_ANSWER
+            prompt = render_prompt(
+                "combiNASHUN",
+                question=question,
+                internal_context=internal_context,
+                global_context=external_context,
+                initial_answer=initial_answer
             )
-            
-            run = await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_and_process_run(thread.id, agent_id=self.agent.id)
-            )
-            
-            # Wait for completion
-            max_wait = settings.AGENT3_ENHANCE_TIMEOUT - 1
-            waited = 0
-            
-            while waited < max_wait:
-                run = await loop.run_in_executor(
-                    None,
-                    lambda: self.client.agents.get_run(thread_id=thread.id, run_id=run.id)
-                )
-                
-                if run.status == RunStatus.COMPLETED:
-                    messages = await loop.run_in_executor(
-                        None,
-                        lambda: list(self.client.agents.list_messages(thread.id).data)
-                    )
-                    enhanced_answer = extract_message(messages)
-                    return {"enhanced_answer": enhanced_answer}
-                
-                if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
-                    return {"error": f"Run failed: {run.status}"}
-                
-                await asyncio.sleep(1)
-                waited += 1
-            
-            return {"error": "Timeout waiting for completion"}
+            reply = await self._run_prompt(prompt, settings.AGENT3_ENHANCE_TIMEOUT - 1)
+            if "error" in reply:
+                return reply
+            return {"enhanced_answer": reply["text"]}
             
         except Exception as e:
             self.logger.error(f"Error generating enhanced response: {e}")
             return {"error": str(e)}
-            
-        finally:
-            # Cleanup
-            if thread:
-                try:
-                    await loop.run_in_executor(
-                        None,
-                        lambda: self.client.agents.delete_thread(thread.id)
-                    )
-                except Exception as e:
-                    self.logger.error(f"Error cleaning up thread: {e}")
     
-    async def optimize(self, query: str) -> Dict[str, Any]:
+    async def optimize(self, query: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Main optimization function that processes the user query.
+        With a session id, follow-ups on the same topic reuse the session's gathered context.
         """
         self.logger.info(f"📥 Processing query: {query}")
         
         try:
-            # Always gather internal context
-            internal_context = await self._gather_internal_context(query)
-            
-            # Always gather external context
-            # Removed evaluation logic - we'll always ask for external context now
-            self.logger.info("🔍 Context evaluation: needs both internal and external context")
-            external_context = await self._gather_external_context(query)
-            
-            # If either context is empty, use a default
-            if not internal_context or len(internal_context) < 50:
-                self.logger.warning("Internal context is empty or too short, using default")
-                internal_context = "Company has a customer service department with 50 employees. Current challenges include long wait times, inconsistent service quality, and manual processes. Previous initiatives have shown positive results from automation."
-            
-            if not external_context or len(external_context) < 50:
-                self.logger.warning("External context is empty or too short, using default")
-                external_context = "Industry best practices suggest implementing AI chatbots, enhancing self-service options, and using analytics for workforce optimization. Recent technology innovations include predictive analytics and omnichannel integration."
-            
-            # Generate strategy based on both contexts
-            strategy = await self._generate_strategy(query, internal_context, external_context)
+            async with self._request_session():
+                reused = self._reusable_context(session_id, query)
+                if reused:
+                    internal_context, external_context, succeeded = await self._reuse_contexts(query, reused)
+                else:
+                    # Always gather both contexts; the two chains are independent, so run them concurrently
+                    # Removed evaluation logic - we'll always ask for external context now
+                    self.logger.info("🔍 Context evaluation: needs both internal and external context")
+                    internal_context, external_context, succeeded = await self._gather_contexts(query)
+                self._remember_contexts(session_id, query, internal_context, external_context, succeeded)
+                
+                # If either context is empty, use a default
+                if not internal_context or len(internal_context) < 50:
+                    self.logger.warning("Internal context is empty or too short, using default")
+                    internal_context = "Company has a customer service department with 50 employees. Current challenges include long wait times, inconsistent service quality, and manual processes. Previous initiatives have shown positive results from automation."
+                
+                if not external_context or len(external_context) < 50:
+                    self.logger.warning("External context is empty or too short, using default")
+                    external_context = "Industry best practices suggest implementing AI chatbots, enhancing self-service options, and using analytics for workforce optimization. Recent technology innovations include predictive analytics and omnichannel integration."
+                
+                # Generate strategy based on both contexts
+                strategy = await self._generate_strategy(query, internal_context, external_context)
             
             # Format final response
             result = {
                 "query": query,
                 "strategy": strategy,
+                "reused_context": bool(reused),
                 "internal_context": internal_context,
                 "external_context": external_context
             }
@@ -501,15 +493,102 @@ class ConsultantAgent(Agent):
                 "external_context": "Industry best practices suggest implementing AI chatbots, enhancing self-service options, and using analytics for workforce optimization. Recent technology innovations include predictive analytics and omnichannel integration."
             }
 
-    async def _gather_internal_context(self, query: str) -> str:
-        """Gather internal context from Agent 1"""
+    async def _gather_contexts(self, query: str, internal: bool = True,
+                               external: bool = True) -> Tuple[str, str, Set[str]]:
+        """
+        Run the internal (Agent 1) and external (Agent 2) chains concurrently.
+        Returns both contexts and the names of the chains that succeeded.
+        
+        Both share AGENT3_CONTEXT_DEADLINE, so the stage takes as long as the
+        slower chain instead of the sum of both. The deadline also covers the
+        combined formulation that runs before the chains. A chain that misses the
+        deadline or fails is dropped on its own and yields an empty context;
+        the other chain's result is kept.
+        """
+        start = time.perf_counter()
+        deadline = settings.AGENT3_CONTEXT_DEADLINE
+        
+        # A confident keyphrase query lets the external chain start without any LLM run
+        questions = search_query = None
+        if external and self.query_builder:
+            built = self.query_builder.build(query)
+            if built["confident"]:
+                search_query = built["query"]
+                self.logger.info(f"🔎 Search query from keyphrases: \"{search_query}\" "
+                                 f"(confidence {built['confidence']}, {built['elapsed_us']}µs)")
+            else:
+                self.logger.info(f"🔎 Keyphrase query not confident ({built['confidence']}) - formulating with the LLM")
+        
+        # When both chains still need formulating, one combined run formulates for both;
+        # if its output is unusable each chain formulates its own as before
+        if internal and external and not search_query and settings.AGENT3_COMBINED_FORMULATION:
+            formulated = await self._handle_timeout(
+                self._formulate_combined(query),
+                timeout_seconds=min(settings.AGENT3_FORMULATE_TIMEOUT, deadline),
+                fallback_data={"error": "Combined formulation timed out"}
+            )
+            if "error" in formulated:
+                self.logger.warning(f"⚠️ {formulated['error']} - formulating separately")
+            else:
+                questions = numbered(formulated["internal_questions"])
+                search_query = formulated["search_queries"][0]
+        
+        timings = {}
+        
+        async def timed(name, coro):
+            start = time.perf_counter()
+            try:
+                return await coro
+            finally:
+                timings[name] = time.perf_counter() - start
+        
+        tasks = {}
+        if internal:
+            tasks["internal"] = asyncio.ensure_future(timed("internal", self._gather_internal_context(query, questions)))
+        if external:
+            tasks["external"] = asyncio.ensure_future(timed("external", self._gather_external_context(query, search_query)))
+        if not tasks:
+            return "", "", set()
+        
+        # The chains get what the formulation left of the deadline
+        remaining = max(0.0, deadline - (time.perf_counter() - start))
+        done, pending = await asyncio.wait(tasks.values(), timeout=remaining)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        contexts, succeeded = {}, set()
+        for name, task in tasks.items():
+            if task in done and task.exception() is None:
+                contexts[name], ok = task.result()
+                if ok:
+                    succeeded.add(name)
+            else:
+                reason = "timed out" if task in pending else f"failed: {task.exception()}"
+                self.logger.warning(f"⚠️ {name.capitalize()} context {reason}, continuing without it")
+                contexts[name] = ""
+        
+        elapsed = time.perf_counter() - start
+        detail = ", ".join(f"{name} {t:.2f}s" for name, t in timings.items())
+        self.logger.info(f"⏱️ Context gathering took {elapsed:.2f}s ({detail})")
+        return contexts.get("internal", ""), contexts.get("external", ""), succeeded
+
+    async def _gather_internal_context(self, query: str, questions: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Gather internal context from Agent 1, formulating the questions unless
+        given. Returns the context and whether Agent 1 actually answered.
+        """
         try:
             # Formulate questions for internal knowledge
-            internal_questions = await self._handle_timeout(
-                self._formulate_internal_questions(query),
-                timeout_seconds=settings.AGENT3_FORMULATE_TIMEOUT,
-                fallback_data={"questions": query}
-            )
+            if questions:
+                internal_questions = {"questions": questions}
+            else:
+                internal_questions = await self._handle_timeout(
+                    self._formulate_internal_questions(query),
+                    timeout_seconds=settings.AGENT3_FORMULATE_TIMEOUT,
+                    fallback_data={"questions": query}
+                )
             
             # Request information from Agent 1
             if self.agent_manager:
@@ -518,25 +597,33 @@ class ConsultantAgent(Agent):
                     {"question": internal_questions.get("questions", query), "caller": "Agent3"}
                 )
                 internal_context = internal_result.get("response", "")
+                ok = bool(internal_context) and "error" not in internal_result and not internal_result.get("is_fallback")
             else:
                 self.logger.error("Agent manager is not available")
                 internal_context = "Company has a customer service department with 50 employees. Current challenges include long wait times, inconsistent service quality, and manual processes. Previous initiatives have shown positive results from automation."
+                ok = False
             
             self.logger.info(f"📄 Received internal context ({len(internal_context)} chars)")
-            return internal_context
+            return internal_context, ok
         except Exception as e:
             self.logger.error(f"Error gathering internal context: {e}")
-            return "Company has a customer service department with 50 employees. Current challenges include long wait times, inconsistent service quality, and manual processes. Previous initiatives have shown positive results from automation."
+            return "Company has a customer service department with 50 employees. Current challenges include long wait times, inconsistent service quality, and manual processes. Previous initiatives have shown positive results from automation.", False
 
-    async def _gather_external_context(self, query: str) -> str:
-        """Gather external context from Agent 2"""
+    async def _gather_external_context(self, query: str, search_query: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Gather external context from Agent 2, formulating the search query
+        unless given. Returns the context and whether Agent 2 actually found some.
+        """
         try:
             # Formulate search query
-            search_query = await self._handle_timeout(
-                self._formulate_search_questions(query),
-                timeout_seconds=settings.AGENT3_FORMULATE_TIMEOUT,
-                fallback_data={"search_query": query}
-            )
+            if search_query:
+                search_query = {"search_query": search_query}
+            else:
+                search_query = await self._handle_timeout(
+                    self._formulate_search_questions(query),
+                    timeout_seconds=settings.AGENT3_FORMULATE_TIMEOUT,
+                    fallback_data={"search_query": query}
+                )
             
             # Request information from Agent 2
             if self.agent_manager:
@@ -545,15 +632,17 @@ class ConsultantAgent(Agent):
                     {"query": search_query.get("search_query", query)}
                 )
                 external_context = external_result.get("summary", "")
+                ok = bool(external_context) and "error" not in external_result and not external_result.get("is_fallback")
             else:
                 self.logger.error("Agent manager is not available")
                 external_context = "Industry best practices suggest implementing AI chatbots, enhancing self-service options, and using analytics for workforce optimization. Recent technology innovations include predictive analytics and omnichannel integration."
+                ok = False
             
             self.logger.info(f"🌐 Received external context ({len(external_context)} chars)")
-            return external_context
+            return external_context, ok
         except Exception as e:
             self.logger.error(f"Error gathering external context: {e}")
-            return "Industry best practices suggest implementing AI chatbots, enhancing self-service options, and using analytics for workforce optimization. Recent technology innovations include predictive analytics and omnichannel integration."
+            return "Industry best practices suggest implementing AI chatbots, enhancing self-service options, and using analytics for workforce optimization. Recent technology innovations include predictive analytics and omnichannel integration.", False
 
     async def _generate_strategy(self, query: str, internal_context: str, external_context: str) -> str:
         """Generate a comprehensive strategy based on both contexts"""
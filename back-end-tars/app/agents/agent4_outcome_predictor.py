@@ -12,6 +12,7 @@ from app.agents.base import Agent
 from app.utils.config import settings
 from app.utils.azure_helpers import extract_message
 from app.utils.logging import get_logger
+from shared.prompts import render_prompt
 
 class OutcomePredictorAgent(Agent):
     """Agent 4: Predicts outcomes and generates strategic branches"""
@@ -61,10 +62,10 @@ class OutcomePredictorAgent(Agent):
         # Step 2: Get internal context from Agent 1
         internal_context = ""
         if internal_questions.get("questions"):
-            questions_str = "\n".join(internal_questions.get("questions", []))
+            # Agent 1 answers each question in its own concurrent run
             internal_result = await self.agent_manager.call_agent(
                 "agent1",
-                {"question": questions_str, "caller": "Agent4"}
+                {"questions": internal_questions["questions"], "caller": "Agent4"}
             )
             internal_context = internal_result.get("response", "")
             self.logger.info(f"📄 Received internal context ({len(internal_context)} chars)")
@@ -94,90 +95,62 @@ class OutcomePredictorAgent(Agent):
     
     async def _generate_internal_questions(self, strategy: str) -> Dict[str, list]:
         """Generate questions for internal documents based on strategy"""
-        loop = asyncio.get_event_loop()
-        thread = None
-        
         try:
-            thread = await loop.run_in_executor(None, lambda: self.client.agents.create_thread())
-            
-            with open("prompts/agent4_doc_inventory.txt", "r", encoding="utf-8") as f:
-                prompt = f.read().format(action=strategy[:1000])  # Limit to prevent token overflows
-                
-            await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_message(thread.id, role="user", content=prompt)
+            prompt = render_prompt("agent4_doc_inventory", action=strategy[:1000])  # Limit to prevent token overflows
+            reply = await self._cached_completion(
+                "questions", prompt,
+                lambda: self._run_prompt(prompt, settings.AGENT4_QUESTIONS_TIMEOUT - 1)
             )
+            if "error" in reply:
+                return reply
             
-            run = await loop.run_in_executor(
-                None,
-                lambda: self.client.agents.create_and_process_run(thread.id, agent_id=self.agent.id)
-            )
+            # Parse the questions
+            questions = []
+            for line in reply["text"].splitlines():
+                line = line.strip()
+                if re.match(r'^\d+\.', line):  # Numbered line
+                    question = re.sub(r'^\d+\.\s*', '', line)
+                    questions.append(question)
             
-            # Wait for completion
-            max_wait = settings.AGENT4_QUESTIONS_TIMEOUT - 1
-            waited = 0
-            
-            while waited < max_wait:
-                run = await loop.run_in_executor(
-                    None,
-                    lambda: self.client.agents.get_run(thread_id=thread.id, run_id=run.id)
-                )
-                
-                if run.status == RunStatus.COMPLETED:
-                    messages = await loop.run_in_executor(
-                        None,
-                        lambda: list(self.client.agents.list_messages(thread.id).data)
-                    )
-                    response = extract_message(messages)
-                    
-                    # Parse the questions
-                    questions = []
-                    for line in response.splitlines():
-                        line = line.strip()
-                        if re.match(r'^\d+\.', line):  # Numbered line
-                            question = re.sub(r'^\d+\.\s*', '', line)
-                            questions.append(question)
-                    
-                    self.logger.info(f"🔍 Generated {len(questions)} internal questions")
-                    return {"questions": questions}
-                
-                if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
-                    return {"error": f"Run failed: {run.status}"}
-                
-                await asyncio.sleep(1)
-                waited += 1
-            
-            return {"error": "Timeout waiting for completion"}
+            self.logger.info(f"🔍 Generated {len(questions)} internal questions")
+            return {"questions": questions}
             
         except Exception as e:
             self.logger.error(f"Error generating internal questions: {e}")
             return {"error": str(e)}
-            
-        finally:
-            # Cleanup
-            if thread:
-                try:
-                    await loop.run_in_executor(
-                        None,
-                        lambda: self.client.agents.delete_thread(thread.id)
-                    )
-                except Exception as e:
-                    self.logger.error(f"Error cleaning up thread: {e}")
     
     async def _generate_branches(self, strategy: str, internal_context: str) -> Dict[str, dict]:
         """Generate strategic branches based on analysis and context"""
+        try:
+            prompt = render_prompt(
+                "agent4_branches",
+                brief=strategy[:2000],  # Limit to prevent token overflows
+                facts=internal_context[:1000]  # Limit to prevent token overflows
+            )
+            reply = await self._cached_completion(
+                "branches", prompt,
+                lambda: self._run_prompt(prompt, settings.AGENT4_BRANCHES_TIMEOUT - 1)
+            )
+            if "error" in reply:
+                return reply
+            
+            # Parse the branches
+            branches = self._extract_branches(reply["text"])
+            self.logger.info(f"🔍 Generated {len(branches)} branches")
+            return {"branches": branches}
+            
+        except Exception as e:
+            self.logger.error(f"Error generating branches: {e}")
+            return {"error": str(e)}
+    
+    async def _run_prompt(self, prompt: str, max_wait: int) -> Dict[str, str]:
+        """Run ``prompt`` on a thread of its own and return {"text": ...} or {"error": ...}"""
         loop = asyncio.get_event_loop()
         thread = None
         
         try:
             thread = await loop.run_in_executor(None, lambda: self.client.agents.create_thread())
             
-            with open("prompts/agent4_branches.txt", "r", encoding="utf-8") as f:
-                prompt = f.read().format(
-                    brief=strategy[:2000],  # Limit to prevent token overflows
-                    facts=internal_context[:1000]  # Limit to prevent token overflows
-                )
-                
             await loop.run_in_executor(
                 None,
                 lambda: self.client.agents.create_message(thread.id, role="user", content=prompt)
@@ -189,9 +162,7 @@ class OutcomePredictorAgent(Agent):
             )
             
             # Wait for completion
-            max_wait = settings.AGENT4_BRANCHES_TIMEOUT - 1
             waited = 0
-            
             while waited < max_wait:
                 run = await loop.run_in_executor(
                     None,
@@ -203,12 +174,7 @@ class OutcomePredictorAgent(Agent):
                         None,
                         lambda: list(self.client.agents.list_messages(thread.id).data)
                     )
-                    response = extract_message(messages)
-                    
-                    # Parse the branches
-                    branches = self._extract_branches(response)
-                    self.logger.info(f"🔍 Generated {len(branches)} branches")
-                    return {"branches": branches}
+                    return {"text": extract_message(messages)}
                 
                 if run.status in (RunStatus.FAILED, RunStatus.CANCELLED, RunStatus.EXPIRED):
                     return {"error": f"Run failed: {run.status}"}
@@ -218,10 +184,6 @@ class OutcomePredictorAgent(Agent):
             
             return {"error": "Timeout waiting for completion"}
             
-        except Exception as e:
-            self.logger.error(f"Error generating branches: {e}")
-            return {"error": str(e)}
-            
         finally:
             # Cleanup
             if thread:
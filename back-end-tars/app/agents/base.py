@@ -4,6 +4,8 @@ import logging
 import asyncio
 from datetime import datetime
 
+from shared.llm_cache import get_llm_cache, instructions_version
+
 class Agent(ABC):
     """Base interface for all TARS agents"""
     
@@ -30,6 +32,31 @@ class Agent(ABC):
         """Return the agent's name"""
         pass
     
+    async def close(self):
+        """Release long-lived resources (sessions, pools) on shutdown"""
+        pass
+    
+    async def _cached_completion(self, kind: str, prompt: str, complete) -> Dict[str, Any]:
+        """
+        Run ``complete()`` (an Azure run for ``prompt``) through the shared LLM
+        completion cache. The same prompt sent to the same agent configuration
+        is answered from the cache; results carrying "error" or "fallback" are
+        never stored.
+        """
+        cache = get_llm_cache()
+        agent = getattr(self, "agent", None)
+        if cache is None or agent is None:
+            return await complete()
+        version = instructions_version(agent)
+        cached = cache.get(self.name, agent.id, version, prompt)
+        if cached is not None:
+            self.logger.info(f"💾 Completion cache hit ({kind}, {len(prompt)} chars prompt)")
+            return cached
+        result = await complete()
+        if isinstance(result, dict) and "error" not in result and not result.get("fallback"):
+            cache.set(self.name, agent.id, version, prompt, result, kind)
+        return result
+    
     async def _handle_timeout(self, coro, timeout_seconds, fallback_data=None):
         """Helper method to handle timeouts with fallback"""
         try:
@@ -5,6 +5,7 @@ import re
 from datetime import datetime
 
 from app.utils.logging import get_logger
+from shared.dedupe import dedupe_texts
 
 logger = get_logger("formatter")
 
@@ -251,12 +252,13 @@ def create_news_impact(agent3_data: Dict[str, Any]) -> Dict[str, Any]:
     impact_items = []
     
     # Extract news items from external context
-    news_sections = re.split(r'\n\d+\.', external_context)
+    news_sections = re.split(r'\n\d+\.', external_context)[1:]  # Skip the part before any numbers
+    news_sections = [s for s in news_sections if s.strip()]
     
-    for i, section in enumerate(news_sections[1:], 1):  # Skip the first split which is before any numbers
-        if not section.strip():
-            continue
-            
+    # Syndicated copies of one story should not fill several news slots
+    news_sections = [news_sections[k] for k in dedupe_texts(news_sections)]
+    
+    for i, section in enumerate(news_sections, 1):
         # Extract title and description
         lines = section.strip().split("\n")
         title = lines[0].strip() if lines else f"Industry Update {i}"
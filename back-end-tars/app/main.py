@@ -15,6 +15,8 @@ from app.agents.agent2_global_intel import GlobalIntelligenceAgent
 from app.agents.agent3_consultant import ConsultantAgent
 from app.agents.agent4_outcome_predictor import OutcomePredictorAgent
 from app.agents.agent5_task_dispatcher import TaskDispatcherAgent
+from shared.llm_cache import configure_llm_cache, get_llm_cache
+from shared.prompts import load_prompts
 
 # Configure root logger
 logging.basicConfig(
@@ -46,12 +48,28 @@ app.add_middleware(
 # Request bodies
 class OptimizationRequest(BaseModel):
     query: str
+    # Follow-up queries with the same session id can reuse the context gathered earlier
+    session_id: Optional[str] = None
+
+class KnowledgeVersionRequest(BaseModel):
+    version: str
 
 # Initialize agents and process manager
 def initialize_process_manager():
     """Initialize agents and process manager"""
     logger.info("Initializing agents and process manager")
     
+    # Read and validate the prompt templates once; a broken template stops start-up here
+    load_prompts()
+    
+    if settings.LLM_CACHE_ENABLED:
+        configure_llm_cache(
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            path=settings.LLM_CACHE_PATH or None,
+            ttls=settings.LLM_CACHE_KIND_TTLS,
+            default_ttl=settings.LLM_CACHE_TTL
+        )
+    
     # Create a temporary manager to allow agent3 and agent4 to be initialized with it
     temp_manager = {}
     
@@ -82,6 +100,13 @@ def initialize_process_manager():
 # Initialize process manager on startup
 process_manager = initialize_process_manager()
 
+# Close pooled sessions and other agent resources on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release agent resources"""
+    logger.info("Shutting down agents")
+    await process_manager.close()
+
 # Middleware for request timing
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
@@ -120,7 +145,7 @@ async def optimize(request: OptimizationRequest):
         logger.info(f"Received optimization request: {query[:100]}...")
         
         # Process the request through the agent pipeline
-        result = await process_manager.process_request(query)
+        result = await process_manager.process_request(query, session_id=request.session_id)
         
         return result
         
@@ -128,6 +153,54 @@ async def optimize(request: OptimizationRequest):
         logger.error(f"Error processing optimization request: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to process optimization request: {str(e)}")
 
+# Search diagnostics endpoint
+@app.get("/api/diagnostics/search")
+async def search_diagnostics():
+    """Per-provider latency/yield statistics and recent routing decisions of Agent 2"""
+    agent2 = process_manager.agents.get("agent2")
+    if agent2 is None:
+        raise HTTPException(status_code=404, detail="Agent 2 is not initialized")
+    return agent2.diagnostics()
+
+# Agent 3 diagnostics endpoint
+@app.get("/api/diagnostics/agent3")
+async def agent3_diagnostics():
+    """Local fast-path usage (context rules, keyphrase search queries, session reuse) of Agent 3"""
+    agent3 = process_manager.agents.get("agent3")
+    if agent3 is None:
+        raise HTTPException(status_code=404, detail="Agent 3 is not initialized")
+    return agent3.diagnostics()
+
+# Agent 1 diagnostics endpoint
+@app.get("/api/diagnostics/agent1")
+async def agent1_diagnostics():
+    """Micro-batching and answer cache statistics of Agent 1 (batch sizes, per-caller wait and hits)"""
+    agent1 = process_manager.agents.get("agent1")
+    if agent1 is None:
+        raise HTTPException(status_code=404, detail="Agent 1 is not initialized")
+    return agent1.diagnostics()
+
+# Knowledge version endpoint: call after uploading documents so stale Agent 1 answers are dropped
+@app.post("/api/agent1/knowledge-version")
+async def set_knowledge_version(request: KnowledgeVersionRequest):
+    """Set Agent 1's knowledge version; a new version clears its answer cache"""
+    agent1 = process_manager.agents.get("agent1")
+    if agent1 is None:
+        raise HTTPException(status_code=404, detail="Agent 1 is not initialized")
+    if agent1.answers is None:
+        raise HTTPException(status_code=404, detail="Agent 1 answer cache is disabled")
+    changed = agent1.set_knowledge_version(request.version)
+    return {"knowledge_version": request.version, "cleared": changed}
+
+# LLM completion cache diagnostics endpoint
+@app.get("/api/diagnostics/llm-cache")
+async def llm_cache_diagnostics():
+    """Per-agent hit/miss statistics of the shared LLM completion cache"""
+    cache = get_llm_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="LLM completion cache is disabled")
+    return cache.stats()
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
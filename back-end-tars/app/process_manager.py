@@ -1,5 +1,6 @@
 from typing import Dict, Any, Optional, List
 import asyncio
+import contextvars
 import logging
 import time
 from datetime import datetime, timedelta
@@ -11,6 +12,86 @@ from app.agents.base import Agent
 from app.utils.config import settings
 from app.utils.logging import get_logger
 from app.formatter import format_response
+from shared.text_utils import cache_key, normalize_query, qualifiers
+from shared.tfidf import TfidfVectorizer
+
+# "1. " / "2) " list markers; Agent 3 numbers its questions, Agent 4 does not
+_LIST_MARKER = re.compile(r"^\s*\d+[.)]\s*", re.MULTILINE)
+
+
+class _Agent1Memo:
+    """
+    Agent 1 answers given earlier in the same request.
+    
+    Agent 3 and Agent 4 formulate their internal questions independently and
+    often ask about the same documents. Agent 1 puts each question through
+    ``answer`` on its own (see ``call_agent``). A question with the same lossless key
+    (``cache_key``, list markers removed) as an earlier one, or TF-IDF-similar
+    to it above ``min_similarity`` and asking with the same ``qualifiers``
+    (not, before, why, ...), is served that earlier answer; a question still
+    in flight is awaited rather than asked twice. A question with an empty
+    key never matches.
+    """
+    
+    def __init__(self, min_similarity: float):
+        self.min_similarity = min_similarity
+        self.entries: List[tuple] = []  # (key, ranking terms, qualifiers, task)
+        self.runs = 0
+        self.avoided = 0
+    
+    @staticmethod
+    def _describe(question: str) -> tuple:
+        question = _LIST_MARKER.sub("", question or "")
+        return cache_key(question), normalize_query(question), qualifiers(question)
+    
+    @staticmethod
+    def _usable(task: asyncio.Future) -> bool:
+        """Whether a finished answer may be served again: not failed, not a timeout or canned fallback"""
+        if task.cancelled() or task.exception() is not None:
+            return False
+        result = task.result()
+        return "error" not in result and not result.get("fallback") and not result.get("is_fallback")
+    
+    def _find(self, key: str, terms: str, asks: frozenset) -> Optional[asyncio.Future]:
+        if not key:
+            return None
+        usable = []
+        for entry in self.entries:
+            task = entry[3]
+            if task.done() and not self._usable(task):
+                continue
+            if entry[0] == key:
+                return task
+            # "revenue before Q3" and "revenue after Q3" score far above any threshold
+            if entry[2] == asks:
+                usable.append(entry)
+        if not usable:
+            return None
+        matrix = TfidfVectorizer().fit_transform([entry[1] for entry in usable] + [terms])
+        similarities = (matrix[:-1] @ matrix[-1]).tolist()
+        best = max(range(len(usable)), key=lambda i: similarities[i])
+        return usable[best][3] if similarities[best] >= self.min_similarity else None
+    
+    async def answer(self, question: str, run) -> Dict[str, Any]:
+        key, terms, asks = self._describe(question)
+        task = self._find(key, terms, asks)
+        if task is None:
+            task = asyncio.ensure_future(run())
+            if key:
+                self.entries.append((key, terms, asks, task))
+            self.runs += 1
+        else:
+            self.avoided += 1
+        # Shielded so one caller timing out does not cancel the answer another caller awaits
+        return dict(await asyncio.shield(task))
+    
+    def stats(self) -> Dict[str, int]:
+        return {"runs": self.runs, "avoided": self.avoided}
+
+
+# The Agent 1 memo of the request being processed (None outside process_request)
+_agent1_memo: contextvars.ContextVar = contextvars.ContextVar("agent1_memo", default=None)
+
 
 class ProcessManager:
     """Orchestrates the flow between agents"""
@@ -19,10 +100,25 @@ class ProcessManager:
         self.agents = agents
         self.logger = get_logger("process_manager")
     
-    async def process_request(self, query: str, branch_select: str = None) -> Dict[str, Any]:
+    async def process_request(self, query: str, branch_select: str = None, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a user query through the multi-agent system.
+        Agent 1 answers are memoized for the duration of the request.
         """
+        memo = _Agent1Memo(settings.AGENT1_MEMO_MIN_SIMILARITY) if settings.AGENT1_REQUEST_MEMO else None
+        token = _agent1_memo.set(memo)
+        try:
+            response = await self._process_request(query, branch_select, session_id)
+        finally:
+            _agent1_memo.reset(token)
+        if memo is not None:
+            self.logger.info(f"🧠 Agent 1 memo: {memo.runs} runs, {memo.avoided} avoided")
+            if isinstance(response.get("system_info"), dict):
+                response["system_info"]["agent1_memo"] = memo.stats()
+        return response
+    
+    async def _process_request(self, query: str, branch_select: str = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """The agent pipeline behind process_request"""
         start_time = time.time()
         self.logger.info(f"🚀 Processing request: {query[:100]}...")
         
@@ -40,7 +136,7 @@ class ProcessManager:
             self.logger.info("📋 Step 1: Consulting with Agent 3 (Consultant)")
             try:
                 agent3 = self.agents.get("agent3")
-                consultant_result = await agent3.optimize(query)
+                consultant_result = await agent3.optimize(query, session_id=session_id)
                 if "strategy" not in consultant_result or not consultant_result["strategy"]:
                     self.logger.warning("Agent 3 did not return a strategy, using fallback")
                     fallback_info["agent3_fallback"] = True
@@ -550,6 +646,14 @@ class ProcessManager:
             "is_fallback": True  # Mark as fallback data
         }
     
+    async def close(self):
+        """Release resources held by all agents"""
+        for agent_id, agent in self.agents.items():
+            try:
+                await agent.close()
+            except Exception as e:
+                self.logger.error(f"❌ Error closing agent {agent_id}: {str(e)}")
+
     async def call_agent(self, agent_id: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Public method to call a specific agent directly"""
         try:
@@ -560,6 +664,12 @@ class ProcessManager:
             # Empty context for direct calls
             context = {"direct_call": True}
             
+            # Within a request, repeated Agent 1 questions are answered once;
+            # Agent 1 puts each question of a list through the memo separately
+            memo = _agent1_memo.get()
+            if agent_id == "agent1" and memo is not None:
+                context["agent1_memo"] = memo
+            
             # Call the agent
             result = await agent.process(input_data, context)
             return result
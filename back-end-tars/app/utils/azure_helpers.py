@@ -5,4 +5,15 @@ def extract_message(messages: list) -> str:
             content = msg.get("content", [])
             if content and isinstance(content, list):
                 return content[0].get("text", {}).get("value", "").strip()
-    return "" 
\ No newline at end of file
+    return "" 
+
+def extract_run_message(messages: list, run_id: str) -> str:
+    """Extract the assistant message written by a given run, for threads with several turns"""
+    replies = [m for m in messages if m.get("role") == "assistant" and m.get("run_id") == run_id]
+    if not replies:
+        return extract_message(messages)
+    latest = max(replies, key=lambda m: m.get("created_at") or 0)
+    content = latest.get("content", [])
+    if content and isinstance(content, list):
+        return content[0].get("text", {}).get("value", "").strip()
+    return ""
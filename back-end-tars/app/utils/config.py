@@ -25,6 +25,64 @@ class Settings(BaseSettings):
     # Search API keys
     SEARCH1API_KEY: Optional[str] = os.getenv("SEARCH1API_KEY", "")
     
+    # Search fan-out: "race" returns the first non-empty provider,
+    # "merge" waits up to SEARCH_DEADLINE seconds and dedupes by URL,
+    # "adaptive" calls the provider with the best recent latency/yield first
+    SEARCH_PROVIDERS: list = ["search1api", "brave", "firecrawl"]
+    # Brave and Firecrawl MCP sidecars; TLS verification is disabled inside them
+    # (never in this process) for local/dev - turn off in production
+    MCP_CONFIG_PATH: str = "MCP.json"
+    MCP_SIDECAR_INSECURE_TLS: bool = True
+    SEARCH_MODE: str = "race"
+    SEARCH_DEADLINE: float = 20.0
+    # Adaptive mode: share of queries routed to a non-preferred provider, and the
+    # recent empty/error rate above which a provider is only used as a last resort
+    SEARCH_ADAPTIVE_EPSILON: float = 0.1
+    SEARCH_ADAPTIVE_MAX_FAILURE_RATE: float = 0.5
+    # Max SimHash bit distance for collapsing syndicated copies (negative disables)
+    SEARCH_DEDUPE_DISTANCE: int = 6
+    # Per-provider token buckets shared across the process: "name=requests_per_second/burst"
+    SEARCH_RATE_LIMITS: str = "brave=1/1,firecrawl=2/2,search1api=5/5"
+    SEARCH_RATE_MAX_QUEUE: int = 20
+    SEARCH_RATE_MAX_WAIT: float = 5.0
+    
+    # Offline BM25 index; when set, "local" can be listed in SEARCH_PROVIDERS and
+    # replaces the mock fallback results. LOCAL_INDEX_DOCS_DIR is re-indexed on startup.
+    LOCAL_INDEX_PATH: str = ""
+    LOCAL_INDEX_DOCS_DIR: str = ""
+    
+    # Persistent search result cache (empty path disables it)
+    SEARCH_CACHE_PATH: str = "data/search_cache.db"
+    SEARCH_CACHE_TTL: int = 3600
+    SEARCH_CACHE_PROVIDER_TTLS: Dict[str, int] = {"brave": 1800, "firecrawl": 3600, "search1api": 3600}
+    SEARCH_CACHE_MAX_ENTRIES: int = 5000
+    
+    # Shared LLM completion cache keyed by (agent, instructions version, prompt);
+    # an empty path keeps it in memory only. TTLs are seconds per prompt kind.
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "data/llm_cache.db"
+    LLM_CACHE_MAX_ENTRIES: int = 1000
+    LLM_CACHE_TTL: int = 1800
+    LLM_CACHE_KIND_TTLS: Dict[str, int] = {"formulation": 21600, "evaluation": 21600, "knowledge": 3600,
+                                           "questions": 3600, "branches": 3600, "answer": 1800}
+    
+    # Agent 2 pooled HTTP session
+    AGENT2_HTTP_POOL_SIZE: int = 50
+    AGENT2_HTTP_PER_HOST_LIMIT: int = 10
+    AGENT2_HTTP_DNS_TTL: int = 300
+    AGENT2_HTTP_KEEPALIVE: int = 60
+    
+    # Agent 2 page fetch / text extraction of the top results
+    AGENT2_ENRICH_ENABLED: bool = False
+    AGENT2_ENRICH_TOP_N: int = 3
+    AGENT2_ENRICH_DEADLINE: float = 4.0
+    AGENT2_ENRICH_MAX_BYTES: int = 500_000
+    AGENT2_ENRICH_PER_HOST_LIMIT: int = 2
+    
+    # Agent 2 result packing before summarization (tokens estimated at ~4 chars each)
+    AGENT2_PACK_TOKEN_BUDGET: int = 800
+    AGENT2_PACK_MAX_RESULTS: int = 5
+    
     # Timeout settings
     AGENT1_TIMEOUT: int = 30
     AGENT2_TIMEOUT: int = 30
@@ -38,6 +96,40 @@ class Settings(BaseSettings):
     AGENT3_EVAL_TIMEOUT: int = 30
     AGENT3_FORMULATE_TIMEOUT: int = 30
     AGENT3_ENHANCE_TIMEOUT: int = 60
+    # Shared deadline for the concurrent internal (Agent 1) and external (Agent 2) context chains
+    AGENT3_CONTEXT_DEADLINE: int = 90
+    # Local rules deciding Agent 3's context need; the initial-answer and evaluation
+    # LLM runs only happen when the rules are not confident. Decisions go to the JSONL log.
+    AGENT3_CONTEXT_CLASSIFIER: bool = True
+    AGENT3_CONTEXT_RULES: str = "shared/context_rules.json"
+    AGENT3_CONTEXT_DECISION_LOG: str = "data/context_decisions.jsonl"
+    # Token budget for the internal + external context in the final prompt (0 disables compression)
+    AGENT3_CONTEXT_TOKEN_BUDGET: int = 1500
+    # Run all of a request's Agent 3 steps as turns on one Azure thread instead of a thread per step
+    AGENT3_SESSION_MODE: bool = False
+    # Formulate Agent 1 questions and the Agent 2 search query in one structured run
+    AGENT3_COMBINED_FORMULATION: bool = True
+    # Build Agent 2's search query from keyphrases; the LLM formulates it below this confidence
+    AGENT3_LOCAL_SEARCH_QUERY: bool = True
+    AGENT3_LOCAL_QUERY_MIN_CONFIDENCE: float = 0.5
+    # Opt-in: collect Agent 1 questions from concurrent requests for a short window
+    # and answer them in one structured multi-question run
+    AGENT1_MICRO_BATCH: bool = False
+    AGENT1_BATCH_WINDOW_MS: int = 100
+    AGENT1_BATCH_MAX_SIZE: int = 8
+    # Persistent Agent 1 answers by normalized question; bump the version after uploading documents
+    AGENT1_ANSWER_CACHE: bool = True
+    AGENT1_ANSWER_CACHE_PATH: str = "data/agent1_answers.db"
+    AGENT1_ANSWER_CACHE_TTL: int = 604800
+    AGENT1_KNOWLEDGE_VERSION: str = "1"
+    # Serve repeated (or near-identical) Agent 1 questions within one request from a memo
+    AGENT1_REQUEST_MEMO: bool = True
+    AGENT1_MEMO_MIN_SIMILARITY: float = 0.85
+    # Reuse a session's gathered context for follow-ups on the same topic (needs a session_id)
+    AGENT3_CONTEXT_REUSE: bool = True
+    AGENT3_CONTEXT_REUSE_SESSIONS: int = 256
+    AGENT3_CONTEXT_REUSE_TTL: int = 1800
+    AGENT3_CONTEXT_REUSE_MIN_SIMILARITY: float = 0.35
     AGENT4_QUESTIONS_TIMEOUT: int = 30
     AGENT4_BRANCHES_TIMEOUT: int = 60
     AGENT4_PREDICTION_TIMEOUT: int = 45
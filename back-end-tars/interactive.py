@@ -1,20 +1,35 @@
+import argparse
+import importlib
 import json
+import os
 import sys
-from agents.agent2_global_intel.search import (
-    run_bravesearch,
-    run_firecrawl,
-    run_search1api,
-    run_search_tools
-)
 
+# Search functions are resolved lazily so fixture replays run without MCP.json or network
 PROVIDERS = {
-    'a': ('BraveSearch', run_bravesearch),
-    'b': ('Firecrawl',   run_firecrawl),
-    'd': ('Search1API',  run_search1api),
-    'e': ('Sequential',  run_search_tools),
+    'a': ('BraveSearch', 'run_bravesearch'),
+    'b': ('Firecrawl',   'run_firecrawl'),
+    'd': ('Search1API',  'run_search1api'),
+    'e': ('Fan-out',     'run_search_tools'),
+    'l': ('Local',       None),
 }
 
-def main():
+def load_provider(key, bench=False):
+    name, attr = PROVIDERS[key]
+    if attr is None:
+        # Offline BM25 index stand-in (LOCAL_INDEX_PATH, optionally LOCAL_INDEX_DOCS_DIR)
+        from shared.local_index import open_index
+        path = os.getenv('LOCAL_INDEX_PATH')
+        if not path:
+            raise RuntimeError('LOCAL_INDEX_PATH not set')
+        index = open_index(path, os.getenv('LOCAL_INDEX_DOCS_DIR') or None)
+        return lambda q: index.search(q, k=5)
+    search = importlib.import_module('agents.agent2_global_intel.search')
+    if bench and key == 'e':
+        # Time the providers, not SearchCache hits (those get their own row with --cache-row)
+        return lambda q: search.run_search_tools(q, read_cache=False)
+    return getattr(search, attr)
+
+def interactive():
     print("🔍 Agent 2 Interactive CLI")
     print("Select provider:")
     for key, (name, _) in PROVIDERS.items():
@@ -22,15 +37,15 @@ def main():
     print("Type 'exit' to quit.\n")
 
     while True:
-        choice = input("Provider [a/b/c/d/e]> ").strip().lower()
+        choice = input("Provider [a/b/d/e/l]> ").strip().lower()
         if choice == 'exit':
             print("👋 Goodbye!")
             break
         if choice not in PROVIDERS:
-            print("⚠️ Invalid choice. Enter a, b, c, d, e or 'exit'.\n")
+            print("⚠️ Invalid choice. Enter a, b, d, e, l or 'exit'.\n")
             continue
 
-        provider_name, func = PROVIDERS[choice]
+        provider_name, _ = PROVIDERS[choice]
         print(f"\n--- Testing {provider_name} ---")
         query = input("Query> ").strip()
         if query.lower() == 'exit':
@@ -38,7 +53,7 @@ def main():
             break
 
         try:
-            results = func(query)
+            results = load_provider(choice)(query)
             if not results:
                 print("⚠️ No results returned.\n")
             else:
@@ -48,5 +63,65 @@ def main():
             print(f"❌ Error running {provider_name}: {e}", file=sys.stderr)
             print()
 
+def benchmark(args):
+    from shared.search_bench import FixtureStore, format_report, load_queries, run_benchmark
+
+    queries = load_queries(args.bench)
+    keys = [k.strip() for k in args.providers.split(',') if k.strip()]
+    unknown = [k for k in keys if k not in PROVIDERS]
+    if unknown:
+        sys.exit(f"⚠️ Unknown provider keys: {', '.join(unknown)}")
+
+    store = FixtureStore(args.fixtures) if args.fixtures else None
+    providers = {}
+    for key in keys:
+        name = PROVIDERS[key][0]
+        if store and not args.record:
+            if name not in store.providers():
+                print(f"⚠️ No recorded responses for {name} in {args.fixtures}, skipping")
+                continue
+            providers[name] = store.replayer(name, simulate_latency=args.simulate_latency)
+        else:
+            func = load_provider(key, bench=True)
+            providers[name] = store.recorder(name, func) if store else func
+            if key == 'e' and args.cache_row:
+                # Runs after the uncached fan-out has filled the cache for every query
+                providers[f"{name} cache"] = load_provider(key)
+
+    mode = 'replaying fixtures' if store and not args.record else 'live'
+    print(f"⏱️ Benchmarking {', '.join(providers)} on {len(queries)} queries x{args.repeat}, "
+          f"concurrency {args.concurrency} ({mode})\n")
+    report = run_benchmark(providers, queries, concurrency=args.concurrency, repeat=args.repeat,
+                           cold_start=not args.no_cold, progress=lambda msg: print(f"  {msg}", flush=True))
+    print()
+    print(format_report(report))
+
+    if store and args.record:
+        store.save()
+        print(f"\n💾 Recorded responses to {args.fixtures}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.json}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent 2 search CLI and provider benchmark")
+    parser.add_argument('--bench', metavar='QUERY_FILE', help="Replay queries (one per line) and report latency")
+    parser.add_argument('--providers', default='a,b,d,e', help="Provider keys to benchmark, e.g. a,d,e")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=1, help="Replay the query file this many times")
+    parser.add_argument('--cache-row', action='store_true', help="Also time Fan-out answered from the search cache")
+    parser.add_argument('--no-cold', action='store_true', help="Don't time the first call separately")
+    parser.add_argument('--fixtures', metavar='PATH', help="Replay recorded responses from this JSON file")
+    parser.add_argument('--record', action='store_true', help="Call live providers and record responses to --fixtures")
+    parser.add_argument('--simulate-latency', action='store_true', help="Sleep for the recorded latency when replaying")
+    parser.add_argument('--json', metavar='PATH', help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    if args.bench:
+        benchmark(args)
+    else:
+        interactive()
+
 if __name__ == "__main__":
     main()
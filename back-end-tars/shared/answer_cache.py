@@ -0,0 +1,217 @@
+"""
+Persistent cache of Agent 1's knowledge-base answers.
+
+Enterprise documents change rarely, yet every Agent 1 question used to run
+retrieval against the Azure knowledge base again. ``AnswerCache`` keeps the
+answers keyed by the question in lossless canonical form (``cache_key``, list
+markers removed), so "1. What is our refund policy?" and "what is our refund
+policy" share an entry while "... not covered" and "... covered", or "C++"
+and "C#", do not:
+
+    memory   live answers, warm-loaded from disk at start-up
+    sqlite   ``shared.sqlite_cache`` table that survives restarts and is
+             shared by every worker using the same file
+
+Answers are only as fresh as the documents behind them. Every cache carries
+a knowledge-version stamp (``AGENT1_KNOWLEDGE_VERSION``); when it differs
+from the stamp stored on disk, at start-up or through ``set_version`` after
+a document upload, all answers are dropped. Each drop writes a new stamp to
+disk; other workers read it every ``sync_interval`` seconds on lookup, and
+always before storing, and drop their in-memory answers too. Callers take
+``generation`` before asking the knowledge base and pass it to ``set``, so
+an answer that was in flight across a drop is not stored. Hits and misses
+are counted per caller (Agent3, Agent4, ...).
+"""
+import logging
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from shared.sqlite_cache import SqliteCache
+from shared.text_utils import cache_key
+
+logger = logging.getLogger("tars.answer_cache")
+
+_VERSION_KEY = "__knowledge_version__"
+# Part of the stored stamp; bump it when answer_key changes so entries under old keys are dropped
+_KEY_SCHEME = "lossless-2"
+_LIST_MARKER = re.compile(r"^\s*\d+[.)]\s*", re.MULTILINE)
+
+
+def answer_key(question: str) -> str:
+    """Cache key of a question: list markers, case, punctuation and extra whitespace removed"""
+    return cache_key(_LIST_MARKER.sub("", question or ""))
+
+
+class AnswerCache:
+    """Normalized-question answers with a knowledge-version stamp and per-caller counters"""
+
+    def __init__(self, path: Optional[str] = None, version: str = "", ttl: float = 7 * 86400,
+                 max_entries: int = 5000, sync_interval: float = 2.0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = version
+        self.sync_interval = sync_interval
+        self._memory: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._callers: Dict[str, Dict[str, int]] = {}
+        self._token = ""
+        self._synced_at = 0.0
+        self.invalidations = 0
+        self.warm_loaded = 0
+
+        self.store = SqliteCache(path, max_entries=max_entries, table="agent1_answers") if path else None
+        if self.store is not None:
+            stamp = self.store.peek(_VERSION_KEY)
+            if self._stamp_matches(stamp, version):
+                self._token = stamp["token"]
+                self._synced_at = time.time()
+                self.warm_load()
+            else:
+                # Documents were updated since these answers were stored, or the key scheme changed
+                self._reset_store()
+
+    @staticmethod
+    def _stamp_matches(stamp: Any, version: str) -> bool:
+        return (isinstance(stamp, dict) and stamp.get("scheme") == _KEY_SCHEME
+                and stamp.get("version") == version and bool(stamp.get("token")))
+
+    def _reset_store(self):
+        """Empty the disk tier under a new stamp, which tells the other workers to drop theirs"""
+        self._token = uuid.uuid4().hex
+        self.store.clear()
+        self.store.set(_VERSION_KEY, {"scheme": _KEY_SCHEME, "version": self.version, "token": self._token},
+                       ttl=10 * 365 * 86400)
+        self._synced_at = time.time()
+
+    def _sync(self, force: bool = False):
+        """Drop the in-memory answers if another worker dropped the disk tier since; holds ``_lock``"""
+        if self.store is None or (not force and time.time() - self._synced_at < self.sync_interval):
+            return
+        stamp = self.store.peek(_VERSION_KEY)
+        self._synced_at = time.time()
+        if isinstance(stamp, dict) and stamp.get("token") == self._token:
+            return
+        dropped = len(self._memory)
+        self._memory.clear()
+        self.invalidations += 1
+        if isinstance(stamp, dict) and stamp.get("scheme") == _KEY_SCHEME and stamp.get("token"):
+            self.version, self._token = stamp.get("version", ""), stamp["token"]
+            reason = f"knowledge version '{self.version}' set by another worker"
+        else:
+            # Stamp missing or written under another key scheme: start the disk tier over
+            self._reset_store()
+            reason = "stamp missing or from another key scheme"
+        logger.info(f"🧹 Agent 1 answer cache cleared ({reason}; {dropped} answers)")
+
+    @property
+    def generation(self) -> int:
+        """Changes whenever the answers are dropped; take it before asking, pass it to ``set``"""
+        with self._lock:
+            self._sync()
+            return self.invalidations
+
+    def warm_load(self) -> int:
+        """Load every live answer from disk into memory; returns how many were loaded"""
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for key, entry in self.store.items():
+                if key == _VERSION_KEY or not isinstance(entry, dict) or entry.get("expires_at", 0) < now:
+                    continue
+                self._memory[key] = (entry["expires_at"], entry["answer"])
+                loaded += 1
+            self.warm_loaded = loaded
+        logger.info(f"🔥 Warm-loaded {loaded} Agent 1 answers (knowledge version '{self.version}')")
+        return loaded
+
+    def set_version(self, version: str) -> bool:
+        """Switch to a new knowledge version, dropping every answer; returns whether it changed"""
+        with self._lock:
+            self._sync(force=True)
+            if version == self.version:
+                return False
+            self.version = version
+        self.invalidate(f"knowledge version '{version}'")
+        return True
+
+    def invalidate(self, reason: str = "requested"):
+        """Drop every cached answer, in memory and on disk (and so in every other worker)"""
+        with self._lock:
+            dropped = len(self._memory)
+            self._memory.clear()
+            self.invalidations += 1
+            if self.store is not None:
+                self._reset_store()
+        logger.info(f"🧹 Agent 1 answer cache cleared ({reason}; {dropped} answers)")
+
+    def _keep(self, key: str, entry: tuple):
+        """Put an entry in memory as the newest; holds ``_lock``"""
+        self._memory.pop(key, None)
+        self._memory[key] = entry
+        while len(self._memory) > self.max_entries:
+            # Oldest stored first, as the disk tier would evict them
+            del self._memory[next(iter(self._memory))]
+
+    def _count(self, caller: str, outcome: str):
+        counts = self._callers.setdefault(caller or "unknown", {"hits": 0, "misses": 0, "stored": 0})
+        counts[outcome] += 1
+
+    def get(self, question: str, caller: str = "") -> Optional[str]:
+        """The cached answer to ``question``, or None"""
+        key = answer_key(question)
+        if not key:
+            return None
+        with self._lock:
+            self._sync()
+            entry = self._memory.get(key)
+            if entry is None and self.store is not None:
+                # Stored by another worker since start-up
+                stored = self.store.peek(key)
+                if isinstance(stored, dict) and "answer" in stored:
+                    entry = (stored["expires_at"], stored["answer"])
+                    self._keep(key, entry)
+            if entry is not None and entry[0] < time.time():
+                del self._memory[key]
+                entry = None
+            self._count(caller, "misses" if entry is None else "hits")
+        return entry[1] if entry is not None else None
+
+    def set(self, question: str, answer: str, caller: str = "", generation: Optional[int] = None):
+        """
+        Remember the answer to ``question`` for ``ttl`` seconds. With
+        ``generation`` (taken before the question was asked) the answer is
+        skipped if the cache was invalidated since, here or in another worker.
+        """
+        key = answer_key(question)
+        if not key or not answer:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._sync(force=True)
+            if generation is not None and generation != self.invalidations:
+                logger.info(f"⏭️ Not caching an answer from before the last invalidation: {question[:80]}")
+                return
+            self._keep(key, (expires_at, answer))
+            self._count(caller, "stored")
+            # Under the lock so an invalidation cannot clear the disk between the check and the write
+            if self.store is not None:
+                self.store.set(key, {"question": question, "answer": answer, "expires_at": expires_at}, self.ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            callers = {name: dict(counts) for name, counts in self._callers.items()}
+            entries = len(self._memory)
+        for counts in callers.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = round(counts["hits"] / lookups, 3) if lookups else 0.0
+        return {
+            "entries": entries,
+            "knowledge_version": self.version,
+            "warm_loaded": self.warm_loaded,
+            "invalidations": self.invalidations,
+            "callers": callers,
+            "persistent": self.store.stats() if self.store is not None else {},
+        }
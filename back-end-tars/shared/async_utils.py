@@ -0,0 +1,75 @@
+"""
+Helpers for calling async code from the synchronous Flask handlers.
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Optional
+
+
+class BackgroundLoop:
+    """
+    A single event loop running in a daemon thread.
+
+    Sync callers submit coroutines with ``run``; async callers living on a
+    different loop bridge over with ``wrap``. Everything scheduled here shares
+    the same loop, so long-lived async resources (MCP sessions, HTTP pools)
+    can be reused across requests instead of being rebuilt per call.
+    """
+
+    def __init__(self, name: str = "tars-background-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True)
+                self._thread.start()
+            return self._loop
+
+    @property
+    def is_running(self) -> bool:
+        """True once the loop has been started (by ``loop``, ``run`` or ``wrap``) and until ``stop``"""
+        with self._lock:
+            return self._loop is not None and not self._loop.is_closed()
+
+    def is_current(self) -> bool:
+        """True when called from a coroutine already running on this loop"""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the background loop and block for its result"""
+        if self.is_current():
+            raise RuntimeError("BackgroundLoop.run() called from its own loop; await the coroutine instead")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    async def wrap(self, coro: Awaitable) -> Any:
+        """Await a coroutine on the background loop from any other loop"""
+        if self.is_current():
+            return await coro
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the loop and join its thread"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        if not loop.is_running():
+            loop.close()
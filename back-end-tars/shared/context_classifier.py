@@ -0,0 +1,282 @@
+"""
+Local classifier for Agent 3's context-need decision.
+
+Before fetching context Agent 3 used to spend two LLM runs: an initial answer,
+then ``prompts/evaluation.txt`` to decide whether internal documents, external
+search or neither would improve it. Most questions give that away in their
+wording ("our branches", "competitors", "latest tariffs"), so the rules in
+``shared/context_rules.json`` score the question for each kind of context:
+
+    internal / external   weighted keywords and regex patterns, plus
+                          department names from ``shared/departments.json``
+                          for the internal side; a logistic over
+                          ``score - bias`` gives the probability it is needed
+    none                  patterns for questions that need no context at all
+
+Confidence is how far the less certain of the two probabilities sits from
+0.5. Callers use the decision when it clears ``min_confidence`` and fall back
+to the LLM evaluation otherwise. Every decision can be appended to a JSONL
+log, together with the LLM's answer on fallbacks, so the weights can be tuned
+against what the model actually decided.
+"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.text_utils import tokenize
+
+logger = logging.getLogger("tars.context")
+
+DEFAULT_RULES_PATH = "shared/context_rules.json"
+DEPARTMENTS_PATH = "shared/departments.json"
+
+# The exact phrases prompts/evaluation.txt asks the LLM to answer with
+EVALUATIONS = {
+    "internal": "Needs internal context",
+    "external": "Needs external context",
+    "both": "Needs both internal and external context",
+    "none": "No additional context needed",
+}
+
+
+def label_from_evaluation(evaluation: str) -> str:
+    """Map a free-text LLM evaluation back to a classifier label"""
+    text = (evaluation or "").lower()
+    if "both" in text or ("internal" in text and "external" in text):
+        return "both"
+    if "internal" in text:
+        return "internal"
+    if "external" in text:
+        return "external"
+    if "no additional" in text or "sufficient" in text:
+        return "none"
+    return "unknown"
+
+
+def _compile_side(side: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "bias": float(side.get("bias", 1.0)),
+        "keywords": {k.lower(): float(w) for k, w in side.get("keywords", {}).items()},
+        "patterns": [(p, re.compile(p, re.IGNORECASE), float(w)) for p, w in side.get("patterns", {}).items()],
+        "phrases": [],
+    }
+
+
+def _department_phrases(weight: float) -> List[Tuple[str, re.Pattern, float]]:
+    """Department names as internal signals; short acronyms like "IT" only match in capitals"""
+    try:
+        with open(DEPARTMENTS_PATH, "r", encoding="utf-8") as f:
+            departments = json.load(f)
+    except (OSError, ValueError):
+        return []
+    phrases = []
+    for department in departments:
+        name = str(department.get("department", "")).strip()
+        if not name:
+            continue
+        flags = 0 if len(name) <= 3 else re.IGNORECASE
+        phrases.append((f"dept:{name}", re.compile(rf"\b{re.escape(name)}\b", flags), weight))
+    return phrases
+
+
+class ContextClassifier:
+    """Keyword and pattern rules deciding whether a question needs internal and/or external context"""
+
+    def __init__(self, rules_path: str = DEFAULT_RULES_PATH, min_confidence: Optional[float] = None,
+                 log_path: Optional[str] = None):
+        self.rules_path = rules_path
+        self.log_path = log_path
+        self._min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._rules: Dict[str, Any] = {}
+        self._counts = {"decisions": 0, "fast_path": 0, "fallbacks": 0, "agreed": 0, "disagreed": 0}
+        self._load()
+
+    # -- rules -------------------------------------------------------------
+
+    def _load(self):
+        mtime = os.path.getmtime(self.rules_path)
+        with open(self.rules_path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        internal = _compile_side(raw.get("internal", {}))
+        if raw.get("internal", {}).get("departments"):
+            internal["phrases"] = _department_phrases(float(raw["internal"]["departments"]))
+        self._rules = {
+            "version": raw.get("version", 0),
+            "min_confidence": float(raw.get("min_confidence", 0.5)),
+            "none_threshold": float(raw.get("none_threshold", 2.0)),
+            "internal": internal,
+            "external": _compile_side(raw.get("external", {})),
+            "none": _compile_side(raw.get("none", {})),
+        }
+        self._mtime = mtime
+        logger.info(f"🧭 Loaded context rules v{self._rules['version']} from {self.rules_path}")
+
+    def _maybe_reload(self):
+        """Pick up edits to the rules file without a restart"""
+        try:
+            if os.path.getmtime(self.rules_path) != self._mtime:
+                with self._lock:
+                    self._load()
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Could not reload context rules, keeping the previous set: {e}")
+
+    @property
+    def min_confidence(self) -> float:
+        if self._min_confidence is not None:
+            return self._min_confidence
+        return self._rules["min_confidence"]
+
+    # -- classification ----------------------------------------------------
+
+    @staticmethod
+    def _score(side: Dict[str, Any], text: str, tokens: set) -> Tuple[float, List[str]]:
+        score, matched = 0.0, []
+        for keyword in tokens.intersection(side["keywords"]):
+            score += side["keywords"][keyword]
+            matched.append(keyword)
+        for name, pattern, weight in side["patterns"] + side["phrases"]:
+            if pattern.search(text):
+                score += weight
+                matched.append(name)
+        return score, matched
+
+    def classify(self, question: str) -> Dict[str, Any]:
+        """
+        Decide the context need for ``question``.
+
+        Returns the label (internal/external/both/none), the matching
+        evaluation phrase, the confidence, whether it clears the threshold,
+        per-side probabilities and the rules that fired.
+        """
+        start = time.perf_counter()
+        self._maybe_reload()
+        rules = self._rules
+        text = question or ""
+        tokens = set(tokenize(text))
+
+        probabilities, matched = {}, {}
+        for side in ("internal", "external"):
+            score, hits = self._score(rules[side], text, tokens)
+            probabilities[side] = 1.0 / (1.0 + math.exp(-(score - rules[side]["bias"])))
+            matched[side] = sorted(hits)
+        none_score, matched["none"] = self._score(rules["none"], text, tokens)
+
+        needs_internal = probabilities["internal"] >= 0.5
+        needs_external = probabilities["external"] >= 0.5
+        confidence = min(abs(2 * p - 1) for p in probabilities.values())
+        if needs_internal and needs_external:
+            label = "both"
+        elif needs_internal:
+            label = "internal"
+        elif needs_external:
+            label = "external"
+        elif none_score >= rules["none_threshold"]:
+            label = "none"
+        else:
+            # Nothing points either way; guessing here is what the LLM is for
+            label, confidence = "both", 0.0
+
+        return {
+            "label": label,
+            "evaluation": EVALUATIONS[label],
+            "confidence": round(confidence, 3),
+            "confident": confidence >= self.min_confidence,
+            "probabilities": {side: round(p, 3) for side, p in probabilities.items()},
+            "matched": matched,
+            "rules_version": rules["version"],
+            "elapsed_us": round((time.perf_counter() - start) * 1e6, 1),
+        }
+
+    # -- decision log ------------------------------------------------------
+
+    def record(self, question: str, decision: Dict[str, Any], llm_evaluation: Optional[str] = None):
+        """
+        Count a decision and append it to the decision log.
+
+        ``llm_evaluation`` is the LLM's answer when the classifier was not
+        confident; logging both side by side is what the rules get tuned from.
+        """
+        entry = {
+            "ts": time.time(),
+            "question": question,
+            "label": decision["label"],
+            "confidence": decision["confidence"],
+            "probabilities": decision["probabilities"],
+            "matched": decision["matched"],
+            "rules_version": decision["rules_version"],
+            "source": "rules" if llm_evaluation is None else "llm",
+        }
+        with self._lock:
+            self._counts["decisions"] += 1
+            if llm_evaluation is None:
+                self._counts["fast_path"] += 1
+            else:
+                self._counts["fallbacks"] += 1
+                entry["llm_label"] = label_from_evaluation(llm_evaluation)
+                self._counts["agreed" if entry["llm_label"] == decision["label"] else "disagreed"] += 1
+            if self.log_path:
+                try:
+                    directory = os.path.dirname(self.log_path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not write context decision log: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        counts["fast_path_rate"] = round(counts["fast_path"] / counts["decisions"], 3) if counts["decisions"] else 0.0
+        counts["rules_version"] = self._rules.get("version")
+        counts["min_confidence"] = self.min_confidence
+        return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Classify questions, or replay a decision log against the current rules")
+    parser.add_argument("questions", nargs="*", help="Questions to classify")
+    parser.add_argument("--rules", default=DEFAULT_RULES_PATH)
+    parser.add_argument("--replay", metavar="DECISION_LOG",
+                        help="Score the rules against the LLM labels recorded on fallbacks")
+    args = parser.parse_args()
+
+    classifier = ContextClassifier(args.rules)
+    for question in args.questions:
+        d = classifier.classify(question)
+        print(f"{d['label']:9} {d['confidence']:.2f} {'fast' if d['confident'] else 'llm ':5} {question}")
+        print(f"          {d['probabilities']} {d['matched']}")
+
+    if args.replay:
+        total = confident = agreed = agreed_confident = 0
+        with open(args.replay, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if "llm_label" not in entry:
+                    continue
+                d = classifier.classify(entry["question"])
+                hit = d["label"] == entry["llm_label"]
+                total += 1
+                agreed += hit
+                if d["confident"]:
+                    confident += 1
+                    agreed_confident += hit
+                elif not hit:
+                    continue
+                if not hit:
+                    print(f"✗ rules={d['label']} llm={entry['llm_label']} ({d['confidence']:.2f}) {entry['question']}")
+        if total:
+            print(f"{total} labelled questions: {agreed / total:.0%} agree with the LLM; "
+                  f"{confident / total:.0%} would take the fast path, "
+                  f"{agreed_confident / max(confident, 1):.0%} of those correctly")
+        else:
+            print("No LLM-labelled decisions in the log yet")
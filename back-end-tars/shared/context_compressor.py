@@ -0,0 +1,134 @@
+"""
+Query-focused compression of the contexts Agent 3 feeds its final prompt.
+
+Agent 1 answers and Agent 2 search summaries arrive as unbounded text and
+went into ``prompts/combiNASHUN.txt`` whole. ``compress_contexts`` splits each
+context into passages (paragraphs, with long ones cut into sentence windows),
+drops near-duplicates across all contexts, scores the rest against the query
+with TF-IDF and keeps the best passages that fit a token budget. Kept passages
+stay in their original order inside each context so the text still reads
+naturally, and the report says how much was dropped and why.
+"""
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from shared.dedupe import DEFAULT_MAX_DISTANCE, dedupe_texts
+from shared.text_utils import estimate_tokens, split_sentences
+from shared.tfidf import TfidfVectorizer, cosine_matrix, mmr_select
+
+# Paragraphs shorter than this are headings or labels and stick to the next one
+MIN_PASSAGE_TOKENS = 8
+# Weight of query relevance against the passage's position in its context
+RELEVANCE_WEIGHT = 0.8
+
+
+def split_passages(text: str, max_tokens: int = 120) -> List[str]:
+    """Paragraphs of ``text``, with paragraphs over ``max_tokens`` split into sentence windows"""
+    paragraphs = [p.strip() for p in (text or "").replace("\r\n", "\n").split("\n\n") if p.strip()]
+    passages: List[str] = []
+    carry = ""
+    for paragraph in paragraphs:
+        paragraph = f"{carry}\n{paragraph}" if carry else paragraph
+        carry = ""
+        if estimate_tokens(paragraph) < MIN_PASSAGE_TOKENS:
+            carry = paragraph
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            passages.append(paragraph)
+            continue
+        window: List[str] = []
+        for sentence in split_sentences(paragraph):
+            if window and estimate_tokens(" ".join(window + [sentence])) > max_tokens:
+                passages.append(" ".join(window))
+                window = []
+            window.append(sentence)
+        if window:
+            passages.append(" ".join(window))
+    if carry:
+        passages.append(carry)
+    return passages
+
+
+def compress_contexts(contexts: Dict[str, str], query: str, token_budget: int = 1500,
+                      max_passage_tokens: int = 120, max_distance: int = DEFAULT_MAX_DISTANCE,
+                      max_overlap: float = 0.8) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """
+    Fit ``contexts`` (name -> text) into ``token_budget`` estimated tokens.
+
+    Returns the compressed contexts under the same names and a report with
+    token and passage counts before and after. Every non-empty context keeps
+    at least its best passage, so one long context cannot crowd out another.
+    """
+    passages: List[Tuple[str, int, str]] = []  # (context name, position, text)
+    for name, text in contexts.items():
+        for position, passage in enumerate(split_passages(text, max_passage_tokens)):
+            passages.append((name, position, passage))
+
+    original_tokens = sum(estimate_tokens(text or "") for text in contexts.values())
+    report: Dict[str, Any] = {
+        "budget": token_budget,
+        "original_tokens": original_tokens,
+        "passages": len(passages),
+        "duplicates": 0,
+    }
+    if not passages:
+        report.update({"kept_tokens": 0, "kept_passages": 0, "dropped_tokens": original_tokens, "ratio": 0.0})
+        return {name: "" for name in contexts}, report
+
+    unique = dedupe_texts([p[2] for p in passages], max_distance) if max_distance >= 0 else list(range(len(passages)))
+    report["duplicates"] = len(passages) - len(unique)
+    candidates = [passages[i] for i in unique]
+
+    # Relevance to the query blended with position: the opening of an answer usually carries it
+    prior = np.array([1.0 / (1 + position) for _, position, _ in candidates], dtype=np.float32)
+    vectorizer = TfidfVectorizer()
+    matrix = vectorizer.fit_transform([text for _, _, text in candidates] + [query or ""])
+    relevance = matrix[:-1] @ matrix[-1]
+    if relevance.max() > 0:
+        scores = RELEVANCE_WEIGHT * relevance / relevance.max() + (1 - RELEVANCE_WEIGHT) * prior
+    else:
+        scores = prior
+    order = mmr_select(scores, cosine_matrix(matrix[:-1]), len(candidates), max_overlap=max_overlap)
+    report["duplicates"] += len(candidates) - len(order)
+
+    # Each context's best passage first, then the rest in pick order while they fit
+    first_of_context = {}
+    for i in order:
+        first_of_context.setdefault(candidates[i][0], i)
+    ordered = list(first_of_context.values()) + [i for i in order if i not in first_of_context.values()]
+
+    kept, used = set(), 0
+    for i in ordered:
+        cost = estimate_tokens(candidates[i][2])
+        if used + cost <= token_budget or i in first_of_context.values():
+            kept.add(i)
+            used += cost
+
+    compressed, per_context = {}, {}
+    for name, text in contexts.items():
+        chosen = sorted((candidates[i] for i in kept if candidates[i][0] == name), key=lambda p: p[1])
+        compressed[name] = "\n\n".join(p[2] for p in chosen)
+        per_context[name] = {
+            "original_tokens": estimate_tokens(text or ""),
+            "kept_tokens": estimate_tokens(compressed[name]),
+            "passages": sum(1 for p in passages if p[0] == name),
+            "kept_passages": len(chosen),
+        }
+
+    kept_tokens = sum(estimate_tokens(text) for text in compressed.values())
+    report.update({
+        "kept_tokens": kept_tokens,
+        "kept_passages": len(kept),
+        "dropped_tokens": max(0, original_tokens - kept_tokens),
+        "ratio": round(kept_tokens / original_tokens, 3) if original_tokens else 1.0,
+        "contexts": per_context,
+    })
+    return compressed, report
+
+
+def describe(report: Dict[str, Any]) -> str:
+    """One-line summary of a compression report for the logs"""
+    return (f"{report['original_tokens']} → {report['kept_tokens']} tokens "
+            f"(kept {report['kept_passages']} of {report['passages']} passages, "
+            f"{report['duplicates']} duplicates, budget {report['budget']})")
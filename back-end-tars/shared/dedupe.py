@@ -0,0 +1,157 @@
+"""
+Near-duplicate detection with 64-bit SimHash.
+
+Syndicated copies of an article differ in URL, byline or a trailing
+sentence but share most of their wording, so their SimHash signatures are
+within a few bits of each other. ``SimHashIndex`` splits every signature
+into ``max_distance + 1`` bands; by the pigeonhole principle two signatures
+within ``max_distance`` bits agree exactly on at least one band, so a lookup
+only compares against the handful of entries sharing a band value.
+"""
+import hashlib
+import re
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from shared.search_orchestrator import canonical_url, result_url
+from shared.text_utils import content_tokens
+
+BITS = 64
+# Texts shorter than this make unstable signatures; compare them exactly instead
+MIN_SIMHASH_TOKENS = 6
+# Copies that differ by a dateline or a trailing credit land within ~4 bits;
+# paraphrases of the same story and unrelated texts are 20+ bits apart
+DEFAULT_MAX_DISTANCE = 6
+_BIT_WEIGHTS = np.uint64(1) << np.arange(BITS, dtype=np.uint64)
+# URLs differ between syndicated copies by definition; they must not vote
+_URL = re.compile(r"https?://\S+|\bsource:\s*", re.IGNORECASE)
+
+
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word unigrams and bigrams, ignoring URLs"""
+    tokens = content_tokens(_URL.sub(" ", text or ""))
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not features:
+        return 0
+    hashes = np.array([_hash64(f) for f in features], dtype=np.uint64)
+    # One row per feature, one column per bit: +1 where the bit is set, -1 otherwise
+    bits = ((hashes[:, None] >> np.arange(BITS, dtype=np.uint64)) & np.uint64(1)).astype(np.int32)
+    votes = (2 * bits - 1).sum(axis=0)
+    return int(_BIT_WEIGHTS[votes > 0].sum())
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class SimHashIndex:
+    """Banded SimHash index answering "is there a stored signature within k bits?" """
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = BITS // self.bands
+        self._signatures: Dict[Any, int] = {}
+        self._tables: List[Dict[int, List[Any]]] = [defaultdict(list) for _ in range(self.bands)]
+
+    def _band_values(self, signature: int) -> List[int]:
+        mask = (1 << self.band_bits) - 1
+        return [(signature >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def add(self, key: Any, signature: int):
+        self._signatures[key] = signature
+        for table, value in zip(self._tables, self._band_values(signature)):
+            table[value].append(key)
+
+    def find(self, signature: int) -> Optional[Any]:
+        """Return the key of a stored near-duplicate, or None"""
+        seen = set()
+        for table, value in zip(self._tables, self._band_values(signature)):
+            for key in table.get(value, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                if hamming(signature, self._signatures[key]) <= self.max_distance:
+                    return key
+        return None
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+
+def dedupe_texts(texts: Sequence[str], max_distance: int = DEFAULT_MAX_DISTANCE) -> List[int]:
+    """Indices of the texts to keep; later near-duplicates of an earlier text are dropped"""
+    index = SimHashIndex(max_distance)
+    exact = set()
+    keep = []
+    for i, text in enumerate(texts):
+        normalized = " ".join(content_tokens(_URL.sub(" ", text or "")))
+        if normalized in exact:
+            continue
+        if len(normalized.split()) >= MIN_SIMHASH_TOKENS:
+            signature = simhash(text)
+            if index.find(signature) is not None:
+                continue
+            index.add(i, signature)
+        exact.add(normalized)
+        keep.append(i)
+    return keep
+
+
+def _result_text(result: Dict[str, Any]) -> str:
+    parts = [result.get("title"), result.get("description") or result.get("snippet"), result.get("content")]
+    return " ".join(p for p in parts if isinstance(p, str))
+
+
+def dedupe_results(results: List[Dict[str, Any]], max_distance: int = DEFAULT_MAX_DISTANCE,
+                   text: Callable[[Dict[str, Any]], str] = _result_text) -> List[Dict[str, Any]]:
+    """
+    Collapse search results that are near-duplicates of a higher ranked one.
+
+    The first (best ranked) copy is kept; the providers and URLs of the
+    dropped copies are folded into it as ``providers`` and ``duplicates``.
+    """
+    index = SimHashIndex(max_distance)
+    by_url: Dict[str, int] = {}
+    exact: Dict[str, int] = {}
+    kept: List[Dict[str, Any]] = []
+
+    for result in results:
+        url = canonical_url(result_url(result))
+        body = text(result)
+        normalized = " ".join(content_tokens(_URL.sub(" ", body)))
+        signature = simhash(body) if len(normalized.split()) >= MIN_SIMHASH_TOKENS else None
+
+        match = by_url.get(url) if url else None
+        if match is None and normalized:
+            match = exact.get(normalized)
+        if match is None and signature is not None:
+            match = index.find(signature)
+
+        if match is None:
+            kept.append(dict(result))
+            position = len(kept) - 1
+            if url:
+                by_url[url] = position
+            if normalized:
+                exact[normalized] = position
+            if signature is not None:
+                index.add(position, signature)
+            continue
+
+        original = kept[match]
+        providers = list(original.get("providers") or ([original["provider"]] if original.get("provider") else []))
+        for p in result.get("providers") or [result.get("provider")]:
+            if p and p not in providers:
+                providers.append(p)
+        if providers:
+            original["providers"] = providers
+        if url and url != canonical_url(result_url(original)):
+            original.setdefault("duplicates", []).append(result_url(result))
+    return kept
@@ -0,0 +1,69 @@
+"""
+Parsing and validation of Agent 3's combined question formulation.
+
+``prompts/formulate_combined.txt`` asks for the internal questions (for
+Agent 1) and the web search queries (for Agent 2) in one JSON object, in
+place of the separate formulate_internal / formulate_search runs. Models
+wrap JSON in code fences, add a sentence before it or return odd shapes, so
+``parse_formulation`` extracts and checks the object and returns None when
+it is unusable; callers then fall back to the two separate prompts.
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+MAX_INTERNAL_QUESTIONS = 3
+MAX_SEARCH_QUERIES = 2
+# Search queries are meant to be 3-10 words; anything far longer is prose, not a query
+MAX_SEARCH_QUERY_WORDS = 16
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def _clean_list(value: Any, limit: int) -> List[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return []
+    items = []
+    for item in value:
+        if isinstance(item, str):
+            text = " ".join(item.split()).strip().strip('"')
+            if text and text not in items:
+                items.append(text)
+    return items[:limit]
+
+
+def parse_formulation(reply: str) -> Optional[Dict[str, List[str]]]:
+    """
+    Validated {"internal_questions": [...], "search_queries": [...]} from an
+    LLM reply, or None if either list is missing, empty or malformed.
+    """
+    text = _FENCE.sub("", (reply or "").strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    internal = _clean_list(data.get("internal_questions"), MAX_INTERNAL_QUESTIONS)
+    search = [q for q in _clean_list(data.get("search_queries"), MAX_SEARCH_QUERIES)
+              if len(q.split()) <= MAX_SEARCH_QUERY_WORDS]
+    if not internal or not search:
+        return None
+    return {"internal_questions": internal, "search_queries": search}
+
+
+def numbered(questions: List[str]) -> str:
+    """Questions as the numbered plain-text list formulate_internal.txt produces"""
+    return "\n".join(f"{i}. {q}" for i, q in enumerate(questions, 1))
+
+
+def numbered_answers(questions: List[str], answers: List[str]) -> str:
+    """Separately answered questions merged, in order, into one numbered context"""
+    return "\n\n".join(f"{i}. {q}\n{a.strip()}" for i, (q, a) in enumerate(zip(questions, answers), 1))
+
@@ -0,0 +1,191 @@
+"""
+Local search-query builder for Agent 3's external context chain.
+
+Turning the user's question into a web search query used to take a full LLM
+run (``prompts/formulate_search.txt``), yet what that prompt asks for - the
+key concepts, minus filler and company-specific wording, in 3-10 words - is
+mostly keyphrase extraction. ``SearchQueryBuilder`` does it locally in the
+RAKE style, with a couple of YAKE-like word features:
+
+    candidates   runs of words between stopwords (general plus the
+                 question-scaffolding and company words in
+                 ``DOMAIN_STOPWORDS``) and punctuation
+    word score   co-occurrence degree / frequency (RAKE), boosted for
+                 acronyms, proper nouns and numbers, which carry most of a
+                 search query's precision
+    query        the best phrases that fit ``max_words``, in question order,
+                 plus the current year when the question asks for recent
+                 information
+
+Confidence is how much of the question's keyphrase weight the query kept,
+discounted for very short queries and for follow-ups that lean on earlier
+context ("what about that?"). Callers use the query when it clears
+``min_confidence`` and fall back to the LLM formulation otherwise;
+``stats()`` counts how often each path is taken.
+"""
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+from shared.text_utils import STOPWORDS
+
+# Question scaffolding and company-specific words that never belong in a web search
+DOMAIN_STOPWORDS = frozenset("""
+company company's organisation organization org firm internal ours ourselves
+currently need needs needed want wants like know explain describe recommend
+suggest think help ways way possible also regarding related based within
+across using use make provide e g etc maybe really exactly kind sort
+something anything everything thing things
+""".split())
+
+# Words that mark a request for recent information
+FRESHNESS_WORDS = frozenset("latest current recent recently now today upcoming new newest".split())
+
+# References to earlier conversation; the question alone does not say what it is about
+DEICTIC_WORDS = frozenset("this that these those it its they them above previous former latter".split())
+
+MAX_PHRASE_WORDS = 4
+
+_WORD = re.compile(r"[A-Za-z0-9]+(?:['\-&][A-Za-z0-9]+)*|[^\sA-Za-z0-9]")
+_YEAR = re.compile(r"^(19|20)\d\d$")
+
+
+def _is_stopword(word: str) -> bool:
+    lower = word.lower()
+    return lower in STOPWORDS or lower in DOMAIN_STOPWORDS
+
+
+def _candidates(question: str) -> List[List[tuple]]:
+    """Phrases as lists of (word, position); stopwords and punctuation end a phrase"""
+    phrases, current = [], []
+    for position, token in enumerate(_WORD.findall(question or "")):
+        if not token[0].isalnum() or _is_stopword(token):
+            if current:
+                phrases.append(current)
+            current = []
+            continue
+        current.append((token, position))
+        if len(current) == MAX_PHRASE_WORDS:
+            phrases.append(current)
+            current = []
+    if current:
+        phrases.append(current)
+    return phrases
+
+
+def _boost(word: str, sentence_start: bool) -> float:
+    """Acronyms, proper nouns and numbers are the most specific terms of a query"""
+    if word.isupper() and len(word) > 1:
+        return 2.0
+    if any(c.isdigit() for c in word):
+        return 1.5
+    if word[0].isupper() and not sentence_start:
+        return 1.5
+    return 1.0
+
+
+class SearchQueryBuilder:
+    """RAKE-style keyphrase search queries with a confidence for the LLM fallback"""
+
+    def __init__(self, min_confidence: float = 0.5, max_words: int = 8):
+        self.min_confidence = min_confidence
+        self.max_words = max_words
+        self._lock = threading.Lock()
+        self._counts = {"built": 0, "local": 0, "llm": 0, "elapsed_us": 0}
+
+    def build(self, question: str) -> Dict[str, Any]:
+        """
+        {"query", "keyphrases", "confidence", "confident", "elapsed_us"} for
+        ``question``; ``confident`` says whether the query can replace the
+        LLM formulation.
+        """
+        start = time.perf_counter()
+        phrases = _candidates(question)
+
+        # RAKE word scores: degree (length of the phrases a word occurs in) over frequency
+        frequency, degree = {}, {}
+        for phrase in phrases:
+            for word, _ in phrase:
+                key = word.lower()
+                frequency[key] = frequency.get(key, 0) + 1
+                degree[key] = degree.get(key, 0) + len(phrase)
+
+        first_position = 0
+        scored, seen = [], set()
+        for phrase in phrases:
+            text = " ".join(word for word, _ in phrase)
+            key = text.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            score = sum(degree[w.lower()] / frequency[w.lower()] * _boost(w, p == first_position)
+                        for w, p in phrase)
+            scored.append((score, phrase[0][1], text, len(phrase)))
+        total = sum(s[0] for s in scored)
+
+        # Best phrases first until the word budget is spent, then back in question order
+        selected, words = [], 0
+        for score, position, text, length in sorted(scored, key=lambda s: (-s[0], s[1])):
+            if words + length <= self.max_words:
+                selected.append((position, text, score))
+                words += length
+        selected.sort()
+        keyphrases = [text for _, text, _ in selected]
+        query = " ".join(keyphrases)
+
+        tokens = {t.lower() for t in _WORD.findall(question or "")}
+        if query and tokens & FRESHNESS_WORDS and not any(_YEAR.match(t) for t in tokens):
+            query = f"{query} {datetime.now().year}"
+
+        confidence = 0.0
+        if total:
+            confidence = sum(score for _, _, score in selected) / total
+            confidence *= min(1.0, words / 3)
+            if tokens & DEICTIC_WORDS:
+                confidence *= 0.6
+        confident = bool(query) and confidence >= self.min_confidence
+
+        elapsed_us = int((time.perf_counter() - start) * 1_000_000)
+        with self._lock:
+            self._counts["built"] += 1
+            self._counts["local" if confident else "llm"] += 1
+            self._counts["elapsed_us"] += elapsed_us
+        return {
+            "query": query,
+            "keyphrases": keyphrases,
+            "confidence": round(confidence, 3),
+            "confident": confident,
+            "elapsed_us": elapsed_us,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """How often the local query was used versus the LLM formulation"""
+        with self._lock:
+            counts = dict(self._counts)
+        elapsed_us = counts.pop("elapsed_us")
+        built = counts["built"]
+        counts["local_rate"] = round(counts["local"] / built, 3) if built else 0.0
+        counts["mean_us"] = round(elapsed_us / built, 1) if built else 0.0
+        counts["min_confidence"] = self.min_confidence
+        return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from shared.search_bench import load_queries
+
+    parser = argparse.ArgumentParser(description="Build search queries locally and show which would need the LLM")
+    parser.add_argument("questions", nargs="*", help="Questions to turn into search queries")
+    parser.add_argument("--file", metavar="QUERY_FILE", help="One question per line")
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    args = parser.parse_args()
+
+    builder = SearchQueryBuilder(min_confidence=args.min_confidence)
+    for question in args.questions + (load_queries(args.file) if args.file else []):
+        r = builder.build(question)
+        print(f"{'local' if r['confident'] else 'llm  '} {r['confidence']:.2f} {r['elapsed_us']:>5}µs  "
+              f"{question}\n                        -> {r['query']}")
+    print(builder.stats())
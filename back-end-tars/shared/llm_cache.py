@@ -0,0 +1,201 @@
+"""
+Content-addressed cache of LLM completions, shared by all agents.
+
+The same formulation prompt, the same Agent 1 question or the same branch
+brief is often sent to Azure again a few requests later. Completions are
+keyed by a hash of (agent id, instructions version, prompt text), so a reply
+is reused only for the exact prompt sent to the same agent configuration:
+
+    memory   LRU of the most recent completions
+    sqlite   optional persistent tier (``shared.sqlite_cache``) that
+             survives restarts and is shared by processes on one host
+
+Each prompt kind ("formulation", "knowledge", "branches", ...) has its own
+TTL. A reply also depends on the prompt templates and
+``shared/departments.json``; their contents are fingerprinted and the whole
+cache is dropped when the fingerprint changes, whether while running (checked
+every ``check_interval`` seconds) or between runs (the fingerprint is kept
+in the persistent tier). Hits and misses are counted per agent.
+"""
+import glob
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from shared.sqlite_cache import SqliteCache
+
+logger = logging.getLogger("tars.llm_cache")
+
+# Seconds a completion stays valid, by prompt kind
+DEFAULT_KIND_TTLS = {
+    "formulation": 6 * 3600,
+    "evaluation": 6 * 3600,
+    "knowledge": 3600,
+    "questions": 3600,
+    "branches": 3600,
+    "answer": 1800,
+}
+DEFAULT_WATCH = ["prompts/*.txt", "shared/departments.json"]
+
+_FINGERPRINT_KEY = "__dependencies__"
+
+
+def instructions_version(agent: Any) -> str:
+    """Short hash of an Azure agent's instructions and model; changes when the agent is reconfigured"""
+    text = f"{getattr(agent, 'model', '') or ''}\n{getattr(agent, 'instructions', '') or ''}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def completion_key(agent_id: str, version: str, prompt: str) -> str:
+    digest = hashlib.sha256()
+    for part in (agent_id or "", version or "", prompt or ""):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """LRU of completions with an optional SQLite tier and per-agent counters"""
+
+    def __init__(self, max_entries: int = 1000, path: Optional[str] = None,
+                 ttls: Optional[Dict[str, float]] = None, default_ttl: float = 1800,
+                 watch: Optional[List[str]] = None, check_interval: float = 2.0,
+                 max_persistent_entries: int = 20000):
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_KIND_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.watch = list(DEFAULT_WATCH if watch is None else watch)
+        self.check_interval = check_interval
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._agents: Dict[str, Dict[str, int]] = {}
+        self.invalidations = 0
+
+        self.store = SqliteCache(path, max_entries=max_persistent_entries, table="llm_completions") if path else None
+        self._fingerprint = self._dependencies()
+        self._checked = time.monotonic()
+        if self.store is not None and self.store.get(_FINGERPRINT_KEY) != self._fingerprint:
+            # Templates or departments changed since these completions were stored
+            self.store.clear()
+            self.store.set(_FINGERPRINT_KEY, self._fingerprint, ttl=10 * 365 * 86400)
+
+    def _dependencies(self) -> str:
+        """Fingerprint of the watched files' contents"""
+        digest = hashlib.sha256()
+        for pattern in self.watch:
+            for path in sorted(glob.glob(pattern)):
+                try:
+                    with open(path, "rb") as f:
+                        digest.update(path.encode("utf-8") + b"\x00" + f.read())
+                except OSError:
+                    continue
+        return digest.hexdigest()[:16]
+
+    def check_dependencies(self, force: bool = False) -> bool:
+        """Drop everything if a watched file changed; returns whether it did"""
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return False
+        self._checked = now
+        fingerprint = self._dependencies()
+        if fingerprint == self._fingerprint:
+            return False
+        self._fingerprint = fingerprint
+        self.invalidate("prompt templates or departments changed")
+        return True
+
+    def invalidate(self, reason: str = "requested"):
+        """Drop every cached completion, in memory and on disk"""
+        with self._lock:
+            dropped = len(self._memory)
+            self._memory.clear()
+            self.invalidations += 1
+        if self.store is not None:
+            self.store.clear()
+            self.store.set(_FINGERPRINT_KEY, self._fingerprint, ttl=10 * 365 * 86400)
+        logger.info(f"🧹 LLM completion cache cleared ({reason}; {dropped} in memory)")
+
+    def ttl(self, kind: str) -> float:
+        return self.ttls.get(kind, self.default_ttl)
+
+    def _count(self, agent: str, outcome: str):
+        counts = self._agents.setdefault(agent, {"hits": 0, "memory_hits": 0, "disk_hits": 0,
+                                                 "misses": 0, "stored": 0})
+        counts[outcome] += 1
+
+    def get(self, agent: str, agent_id: str, version: str, prompt: str) -> Optional[Any]:
+        """The cached completion for this agent configuration and prompt, or None"""
+        self.check_dependencies()
+        key = completion_key(agent_id, version, prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] >= now:
+                self._memory.move_to_end(key)
+                self._count(agent, "hits")
+                self._count(agent, "memory_hits")
+                return entry[1]
+            if entry is not None:
+                del self._memory[key]
+
+        stored = self.store.get(key) if self.store is not None else None
+        with self._lock:
+            if stored is None:
+                self._count(agent, "misses")
+                return None
+            self._count(agent, "hits")
+            self._count(agent, "disk_hits")
+            self._remember(key, stored["value"], stored["expires_at"])
+        return stored["value"]
+
+    def set(self, agent: str, agent_id: str, version: str, prompt: str, value: Any, kind: str = ""):
+        """Cache a JSON-serialisable completion for the TTL of its prompt kind"""
+        key = completion_key(agent_id, version, prompt)
+        ttl = self.ttl(kind)
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._count(agent, "stored")
+        if self.store is not None:
+            self.store.set(key, {"value": value, "expires_at": expires_at}, ttl)
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            agents = {name: dict(counts) for name, counts in self._agents.items()}
+            entries = len(self._memory)
+        for counts in agents.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = round(counts["hits"] / lookups, 3) if lookups else 0.0
+        return {
+            "entries": entries,
+            "invalidations": self.invalidations,
+            "fingerprint": self._fingerprint,
+            "agents": agents,
+            "persistent": self.store.stats() if self.store is not None else {},
+        }
+
+
+_cache: Optional[LLMCache] = None
+
+
+def configure_llm_cache(**options) -> LLMCache:
+    """Create the process-wide completion cache; agents find it with ``get_llm_cache()``"""
+    global _cache
+    _cache = LLMCache(**options)
+    logger.info(f"💾 LLM completion cache ready (memory {_cache.max_entries}, "
+                f"disk {'off' if _cache.store is None else _cache.store.path})")
+    return _cache
+
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """The process-wide completion cache, or None when caching is off"""
+    return _cache
@@ -0,0 +1,314 @@
+"""
+Offline BM25 search over a directory of documents.
+
+The index lives in a directory and is built from immutable segments. Every
+``add_documents`` call writes one new segment:
+
+    seg_<n>.lex.json   term -> [first posting, number of postings]
+    seg_<n>.post       (doc id, term frequency) pairs as little-endian int32,
+                       grouped by term and memory-mapped at query time
+
+``docs.json`` holds per-document metadata (source path, title, mtime, a text
+excerpt for snippets) and ``meta.json`` the segment list. Re-indexing a changed
+file tombstones its old document id and adds a new one; ``compact`` rewrites
+all live postings into a single segment. Queries score every query term's
+postings with NumPy, so a few thousand documents answer in milliseconds.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from shared.text_utils import content_tokens, split_sentences
+
+logger = logging.getLogger("tars.search")
+
+POSTING = np.dtype([("doc", "<i4"), ("tf", "<i4")])
+INDEXED_EXTENSIONS = (".html", ".htm", ".md", ".markdown", ".txt")
+EXCERPT_CHARS = 2000
+
+# BM25 parameters (Robertson/Zaragoza defaults)
+K1 = 1.5
+B = 0.75
+
+
+def read_document(path: str) -> Tuple[str, str]:
+    """Return (title, plain text) for an HTML, markdown or text file"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        raw = f.read()
+    if path.lower().endswith((".html", ".htm")):
+        from bs4 import BeautifulSoup
+        from shared.page_fetch import extract_main_text
+        title_tag = BeautifulSoup(raw, "html.parser").title
+        text = extract_main_text(raw, max_chars=len(raw))
+        title = title_tag.get_text(strip=True) if title_tag else ""
+    else:
+        text = raw
+        heading = re.search(r"^\s*#+\s*(.+)$", raw, re.MULTILINE)
+        title = heading.group(1).strip() if heading else ""
+    if not title:
+        first_line = next((line.strip() for line in text.splitlines() if line.strip()), "")
+        title = first_line[:120] or os.path.basename(path)
+    return title, text
+
+
+class LocalIndex:
+    """Segmented on-disk inverted index with BM25 ranking"""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._meta = self._load_json("meta.json", {"segments": [], "next_doc": 0, "next_segment": 0})
+        self._docs: Dict[str, Dict[str, Any]] = self._load_json("docs.json", {})
+        self._by_source = {d["source"]: int(doc_id) for doc_id, d in self._docs.items() if not d.get("deleted")}
+        self._reload()
+
+    # -- persistence -------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load_json(self, name: str, default: Any) -> Any:
+        try:
+            with open(self._file(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    def _save_json(self, name: str, value: Any):
+        # Write then rename so a crash never leaves a half-written file behind
+        tmp = self._file(name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp, self._file(name))
+
+    def _reload(self):
+        """Map the current segments and rebuild the document length table"""
+        segments = []
+        for name in self._meta["segments"]:
+            with open(self._file(f"{name}.lex.json"), "r", encoding="utf-8") as f:
+                lexicon = json.load(f)
+            postings_path = self._file(f"{name}.post")
+            if os.path.getsize(postings_path):
+                postings = np.memmap(postings_path, dtype=POSTING, mode="r")
+            else:
+                postings = np.zeros(0, dtype=POSTING)
+            segments.append((lexicon, postings))
+
+        size = self._meta["next_doc"]
+        lengths = np.zeros(size, dtype=np.float32)
+        live = np.zeros(size, dtype=bool)
+        for doc_id, doc in self._docs.items():
+            lengths[int(doc_id)] = doc["length"]
+            live[int(doc_id)] = not doc.get("deleted")
+        # Swapped in one assignment so concurrent queries see a consistent view
+        avgdl = float(lengths[live].mean()) if live.any() else 0.0
+        self._view = (segments, lengths, live, avgdl)
+
+    def _write_segment(self, postings: Dict[str, List[Tuple[int, int]]]) -> str:
+        name = f"seg_{self._meta['next_segment']}"
+        self._meta["next_segment"] += 1
+        lexicon = {}
+        rows = []
+        for term in sorted(postings):
+            lexicon[term] = [len(rows), len(postings[term])]
+            rows.extend(postings[term])
+        np.array(rows, dtype=POSTING).tofile(self._file(f"{name}.post"))
+        with open(self._file(f"{name}.lex.json"), "w", encoding="utf-8") as f:
+            json.dump(lexicon, f)
+        return name
+
+    # -- indexing ----------------------------------------------------------
+
+    def add_documents(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """
+        Index documents given as dicts with ``source``, ``text`` and optional
+        ``title``, ``url`` and ``mtime``. A document whose source is already
+        indexed replaces the old copy. Returns the number of documents added.
+        """
+        with self._lock:
+            postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+            added = 0
+            for document in documents:
+                source = document["source"]
+                old = self._by_source.pop(source, None)
+                if old is not None:
+                    self._docs[str(old)]["deleted"] = True
+
+                doc_id = self._meta["next_doc"]
+                self._meta["next_doc"] += 1
+                tokens = content_tokens(document.get("text", ""))
+                for term, tf in Counter(tokens).items():
+                    postings[term].append((doc_id, tf))
+                self._docs[str(doc_id)] = {
+                    "source": source,
+                    "title": document.get("title") or os.path.basename(source),
+                    "url": document.get("url") or f"file://{os.path.abspath(source)}",
+                    "mtime": document.get("mtime", 0),
+                    "length": len(tokens),
+                    "excerpt": document.get("text", "")[:EXCERPT_CHARS],
+                }
+                self._by_source[source] = doc_id
+                added += 1
+
+            if added:
+                self._meta["segments"].append(self._write_segment(postings))
+                self._save_json("docs.json", self._docs)
+                self._save_json("meta.json", self._meta)
+                self._reload()
+            return added
+
+    def index_directory(self, root: str, extensions: Tuple[str, ...] = INDEXED_EXTENSIONS) -> int:
+        """Add new and modified files under ``root``; unchanged files are skipped"""
+        documents = []
+        for directory, _, files in os.walk(root):
+            for filename in sorted(files):
+                if not filename.lower().endswith(extensions):
+                    continue
+                source = os.path.join(directory, filename)
+                mtime = os.path.getmtime(source)
+                existing = self._by_source.get(source)
+                if existing is not None and self._docs[str(existing)]["mtime"] >= mtime:
+                    continue
+                try:
+                    title, text = read_document(source)
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not read {source}: {e}")
+                    continue
+                documents.append({"source": source, "title": title, "text": text, "mtime": mtime})
+        added = self.add_documents(documents)
+        logger.info(f"📚 Indexed {added} new or changed documents from {root}")
+        return added
+
+    def compact(self):
+        """Merge all segments into one and drop postings of deleted documents"""
+        with self._lock:
+            segments, _, live, _ = self._view
+            if len(segments) <= 1 and live.all():
+                return
+            merged: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+            for lexicon, postings in segments:
+                for term, (start, count) in lexicon.items():
+                    rows = postings[start:start + count]
+                    rows = rows[live[rows["doc"]]]
+                    merged[term].extend(zip(rows["doc"].tolist(), rows["tf"].tolist()))
+            old_segments = self._meta["segments"]
+            self._meta["segments"] = [self._write_segment({t: p for t, p in merged.items() if p})]
+            self._docs = {doc_id: d for doc_id, d in self._docs.items() if not d.get("deleted")}
+            self._save_json("docs.json", self._docs)
+            self._save_json("meta.json", self._meta)
+            self._reload()
+            for name in old_segments:
+                for suffix in (".lex.json", ".post"):
+                    try:
+                        os.remove(self._file(name + suffix))
+                    except OSError:
+                        pass
+
+    # -- querying ----------------------------------------------------------
+
+    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Top ``k`` documents by BM25, shaped like provider search results"""
+        terms = set(content_tokens(query))
+        segments, lengths, live, avgdl = self._view
+        n_live = int(live.sum())
+        if not terms or not n_live:
+            return []
+
+        # Collect postings per term across segments, then score term by term
+        per_term: Dict[str, List[np.ndarray]] = defaultdict(list)
+        for lexicon, postings in segments:
+            for term in terms:
+                entry = lexicon.get(term)
+                if entry:
+                    per_term[term].append(postings[entry[0]:entry[0] + entry[1]])
+
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        norm = K1 * (1 - B + B * lengths / max(avgdl, 1e-9))
+        for term, chunks in per_term.items():
+            rows = np.concatenate(chunks)
+            rows = rows[live[rows["doc"]]]
+            if not rows.size:
+                continue
+            idf = math.log(1 + (n_live - rows.size + 0.5) / (rows.size + 0.5))
+            tf = rows["tf"].astype(np.float32)
+            scores[rows["doc"]] += idf * tf * (K1 + 1) / (tf + norm[rows["doc"]])
+
+        hits = np.flatnonzero(scores > 0)
+        if not hits.size:
+            return []
+        top = hits[np.argsort(-scores[hits])[:k]]
+        return [self._result(int(doc_id), float(scores[doc_id]), terms) for doc_id in top]
+
+    async def search_async(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """Provider-interface entry point for the search orchestrator"""
+        return await asyncio.to_thread(self.search, query, k)
+
+    def _result(self, doc_id: int, score: float, terms: set) -> Dict[str, Any]:
+        doc = self._docs[str(doc_id)]
+        # The excerpt sentence sharing most terms with the query makes the snippet
+        sentences = split_sentences(doc["excerpt"]) or [doc["excerpt"]]
+        snippet = max(sentences, key=lambda s: len(terms.intersection(content_tokens(s))))
+        return {
+            "title": doc["title"],
+            "url": doc["url"],
+            "description": snippet[:300],
+            "score": round(score, 3),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        segments, _, live, avgdl = self._view
+        return {
+            "documents": int(live.sum()),
+            "deleted": len(self._docs) - int(live.sum()),
+            "segments": len(segments),
+            "postings": int(sum(p.size for _, p in segments)),
+            "avg_doc_length": round(avgdl, 1),
+        }
+
+    def __len__(self) -> int:
+        return int(self._view[2].sum())
+
+
+_indexes: Dict[str, LocalIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def open_index(path: str, docs_dir: Optional[str] = None) -> LocalIndex:
+    """Process-wide LocalIndex for ``path``, refreshed from ``docs_dir`` on first open"""
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = LocalIndex(path)
+            if docs_dir:
+                index.index_directory(docs_dir)
+        return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the local BM25 search index")
+    parser.add_argument("index", help="Index directory")
+    parser.add_argument("--add", metavar="DOCS_DIR", help="Index new and modified files in this directory")
+    parser.add_argument("--compact", action="store_true", help="Merge segments and drop deleted documents")
+    parser.add_argument("--query", help="Run a query against the index")
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    index = LocalIndex(args.index)
+    if args.add:
+        print(f"📚 Added {index.index_directory(args.add)} documents", flush=True)
+    if args.compact:
+        index.compact()
+    if args.query:
+        for hit in index.search(args.query, args.k):
+            print(f"{hit['score']:8.3f}  {hit['title']}  ({hit['url']})", flush=True)
+    print(json.dumps(index.stats()), flush=True)
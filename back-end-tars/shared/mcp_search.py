@@ -0,0 +1,207 @@
+"""
+Brave and Firecrawl web search through MCP stdio sidecars.
+
+``MCPSearch`` owns the sidecar sessions for one process. Importing this
+module has no side effects: the MCP config file is read, the background loop
+started and each sidecar spawned on the first search that needs it. The
+standalone Agent 2 (``agents/agent2_global_intel/search.py``) and the
+FastAPI Agent 2 each build their own instance from their own configuration.
+
+Sessions live on a ``BackgroundLoop`` so that every caller, whichever loop
+or thread it runs on, shares them. The async entry points hop onto that
+loop, and sync callers block on it with ``run``.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from shared.async_utils import BackgroundLoop
+
+try:
+    import anyio
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    # The stdio pipe or the sidecar process is gone; every call on the session would fail
+    TRANSPORT_ERRORS = (OSError, EOFError, anyio.ClosedResourceError,
+                        anyio.BrokenResourceError, anyio.EndOfStream)
+except ImportError:  # the MCP providers are optional
+    ClientSession = StdioServerParameters = stdio_client = None
+    TRANSPORT_ERRORS = (OSError, EOFError)
+
+logger = logging.getLogger("tars.mcp_search")
+
+
+class MCPServer:
+    """A long-lived MCP stdio session, started lazily on the loop of its first call"""
+
+    def __init__(self, name: str, config: Dict[str, Any], env: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.config = config
+        self.env = env or {}
+        self.session = None
+        self._task = None
+        self._ready = None
+        self._closed = None
+        self._error = None
+        self._start_lock = None
+
+    async def _serve(self):
+        # stdio_client uses anyio task groups, so the contexts must be
+        # entered and exited by the same task: keep them open in this one
+        sp = StdioServerParameters(
+            command=self.config['command'],
+            args=self.config['args'],
+            env={**self.config.get('env', {}), **os.environ, **self.env},
+        )
+        logger.info(f"Spawning {self.name} sidecar: {sp.command} {' '.join(sp.args)}")
+        try:
+            async with stdio_client(sp) as (r, w):
+                async with ClientSession(r, w) as session:
+                    await session.initialize()
+                    self.session = session
+                    self._ready.set()
+                    await self._closed.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def call_tool(self, tool: str, arguments: dict):
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if self.session is None:
+                self._ready, self._closed, self._error = asyncio.Event(), asyncio.Event(), None
+                self._task = asyncio.get_running_loop().create_task(self._serve())
+                await self._ready.wait()
+                if self.session is None:
+                    raise RuntimeError(f"{self.name} MCP server failed to start: {self._error}")
+            session = self.session
+        try:
+            result = await session.call_tool(tool, arguments=arguments)
+        except Exception as e:
+            # Only a dead transport or sidecar takes the shared session down (the next
+            # call respawns it); a tool or JSON-RPC error concerns this call alone
+            if isinstance(e, TRANSPORT_ERRORS) or (self._task is not None and self._task.done()):
+                await self._drop(session)
+            raise
+        if getattr(result, "isError", False):
+            text = " ".join(getattr(f, "text", "") for f in result.content or []).strip()
+            raise RuntimeError(f"{self.name} tool {tool} failed: {text or 'no details'}")
+        return result
+
+    async def _drop(self, session):
+        """Close the sidecar, unless it was already replaced since ``session`` failed"""
+        async with self._start_lock:
+            if self.session is session or self.session is None:
+                await self.close()
+
+    async def close(self):
+        if self._closed is not None:
+            self._closed.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def parse_result_blocks(resp: Any, description_field: str) -> List[Dict[str, str]]:
+    """
+    Results from the "Title: / Description: / URL:" blocks that both
+    sidecars return, one blank-line separated block per result.
+    """
+    pieces = []
+    for frame in getattr(resp, 'content', None) or []:
+        if hasattr(frame, 'text'):
+            pieces.append(getattr(frame.text, "value", frame.text))
+    raw = "\n".join(pieces).strip()
+    if not raw:
+        return []
+
+    results = []
+    for block in re.split(r"\n\s*\n", raw):
+        title = description = url = ""
+        for line in block.splitlines():
+            if line.startswith("Title:"):
+                title = line[len("Title:"):].strip()
+            elif line.startswith("Description:"):
+                description = line[len("Description:"):].strip()
+            elif line.startswith("URL:"):
+                url = line[len("URL:"):].strip()
+        # only include if any field is non-empty
+        if title or description or url:
+            results.append({"title": title, description_field: description, "url": url})
+    return results
+
+
+class MCPSearch:
+    """Brave and Firecrawl search over lazily started MCP sidecars"""
+
+    BRAVE = 'brave-search'
+    FIRECRAWL = 'firecrawl-mcp'
+
+    def __init__(self, config_path: str = "MCP.json", env: Optional[Dict[str, str]] = None,
+                 background: Optional[BackgroundLoop] = None):
+        self.config_path = config_path
+        # Extra environment for the sidecar processes only, never for this process
+        self.env = env or {}
+        self.background = background or BackgroundLoop("mcp-search")
+        self._config = None
+        self._servers: Dict[str, MCPServer] = {}
+
+    def available(self) -> bool:
+        """Whether the mcp package is installed and the config file exists"""
+        return ClientSession is not None and os.path.isfile(self.config_path)
+
+    def _server(self, name: str) -> MCPServer:
+        if name not in self._servers:
+            if self._config is None:
+                with open(self.config_path, "r") as f:
+                    self._config = json.load(f).get('mcpServers', {})
+            self._servers[name] = MCPServer(name, self._config[name], self.env)
+        return self._servers[name]
+
+    async def _brave_call(self, query: str, count: int) -> List[Dict[str, str]]:
+        resp = await self._server(self.BRAVE).call_tool(
+            'brave_web_search', arguments={'query': query, 'count': count}
+        )
+        return parse_result_blocks(resp, "description")
+
+    async def _firecrawl_call(self, query: str, limit: int, lang: str, country: str) -> List[Dict[str, str]]:
+        resp = await self._server(self.FIRECRAWL).call_tool(
+            'firecrawl_search', arguments={'query': query, 'limit': limit, 'lang': lang, 'country': country}
+        )
+        logger.debug(f"Firecrawl raw frames: {resp.content}")
+        # optional: Firecrawl does not give a date field yet
+        return [{**r, "published_date": ""} for r in parse_result_blocks(resp, "snippet")]
+
+    async def brave(self, query: str, count: int = 3) -> List[Dict[str, str]]:
+        """Async entry point for Brave; awaitable from any event loop"""
+        return await self.background.wrap(self._brave_call(query, count))
+
+    async def firecrawl(self, query: str, limit: int = 3, lang: str = 'en',
+                        country: str = 'us') -> List[Dict[str, str]]:
+        """Async entry point for Firecrawl; awaitable from any event loop"""
+        return await self.background.wrap(self._firecrawl_call(query, limit, lang, country))
+
+    def run_brave(self, query: str, count: int = 3, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        """Sync Brave search for callers without an event loop"""
+        return self.background.run(self._brave_call(query, count), timeout=timeout)
+
+    def run_firecrawl(self, query: str, limit: int = 3, lang: str = 'en', country: str = 'us',
+                      timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        """Sync Firecrawl search for callers without an event loop"""
+        return self.background.run(self._firecrawl_call(query, limit, lang, country), timeout=timeout)
+
+    async def close(self):
+        """Stop the sidecars; must run on the background loop"""
+        await asyncio.gather(*(s.close() for s in self._servers.values()), return_exceptions=True)
+
+    async def aclose(self):
+        """Stop the sidecars from any event loop"""
+        if self._servers and self.background.is_running:
+            await self.background.wrap(self.close())
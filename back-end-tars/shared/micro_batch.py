@@ -0,0 +1,95 @@
+"""
+Micro-batching of concurrent async calls.
+
+Callers ``submit`` single items; the batcher holds them for at most
+``window`` seconds (or until ``max_batch`` are waiting), hands the whole
+batch to one ``handler(items) -> results`` call and resolves every caller
+with its own result. Under load this turns many small requests made within
+the same fraction of a second into one; with a single caller it only adds
+the window as latency, which is why it is opt-in.
+
+``stats()`` reports the window, the batch-size distribution and, per
+caller, how long items waited for their batch to be dispatched.
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+class MicroBatcher:
+    """Collects submitted items for a short window and processes them together"""
+
+    def __init__(self, handler: Callable[[List[Any]], Awaitable[List[Any]]],
+                 window: float = 0.1, max_batch: int = 8):
+        self.handler = handler
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._pending: List[tuple] = []
+        self._timer = None
+        self._sizes: Counter = Counter()
+        self._callers: Dict[str, Dict[str, float]] = {}
+
+    async def submit(self, item: Any, caller: str = "") -> Any:
+        """Queue ``item`` for the next batch and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, caller, time.perf_counter(), future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[tuple]):
+        dispatched = time.perf_counter()
+        self._sizes[len(batch)] += 1
+        for _, caller, queued, _ in batch:
+            waited = (dispatched - queued) * 1000
+            counts = self._callers.setdefault(caller or "unknown", {"requests": 0, "wait_ms": 0.0, "max_wait_ms": 0.0})
+            counts["requests"] += 1
+            counts["wait_ms"] += waited
+            counts["max_wait_ms"] = max(counts["max_wait_ms"], waited)
+
+        futures = [future for _, _, _, future in batch]
+        try:
+            results = await self.handler([item for item, _, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch handler returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            # A caller that gave up (timeout, cancellation) no longer has a waiting future
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = sum(self._sizes.values())
+        items = sum(size * count for size, count in self._sizes.items())
+        callers = {}
+        for caller, counts in self._callers.items():
+            callers[caller] = {
+                "requests": counts["requests"],
+                "mean_wait_ms": round(counts["wait_ms"] / counts["requests"], 1),
+                "max_wait_ms": round(counts["max_wait_ms"], 1),
+            }
+        return {
+            "window_ms": round(self.window * 1000),
+            "max_batch": self.max_batch,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": round(items / batches, 2) if batches else 0.0,
+            "batch_sizes": dict(sorted(self._sizes.items())),
+            "callers": callers,
+        }
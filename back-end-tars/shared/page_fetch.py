@@ -0,0 +1,161 @@
+"""
+Optional enrichment stage for search results.
+
+Fetches the top N result URLs concurrently, streams at most ``max_bytes`` of
+each page and extracts the main text with BeautifulSoup. Extracted text is
+cached by URL; stale entries are revalidated with the page's ETag so an
+unchanged page costs a 304 instead of a full download. The whole stage runs
+under a hard deadline and any page that is not ready by then is skipped.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from shared.search_orchestrator import result_url
+
+logger = logging.getLogger("tars.search")
+
+# Elements that never carry article text
+NOISE_TAGS = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe"]
+TEXT_TYPES = ("text/html", "text/plain", "application/xhtml+xml")
+
+
+def extract_main_text(html: str, max_chars: int = 4000) -> str:
+    """Extract readable body text from an HTML page"""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(NOISE_TAGS):
+        tag.decompose()
+
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    blocks = []
+    for node in root.find_all(["h1", "h2", "h3", "p", "li"]):
+        text = re.sub(r"\s+", " ", node.get_text(" ", strip=True))
+        # Short fragments are usually menus, buttons or captions
+        if len(text) >= 40 or node.name.startswith("h"):
+            blocks.append(text)
+    if not blocks:
+        blocks = [re.sub(r"\s+", " ", root.get_text(" ", strip=True))]
+
+    text = "\n".join(b for b in blocks if b)
+    return text[:max_chars]
+
+
+class PageFetcher:
+    """Concurrent, size-capped page fetcher with an ETag-aware text cache"""
+
+    def __init__(self, top_n: int = 3, max_bytes: int = 500_000, max_chars: int = 4000,
+                 pool_size: int = 10, per_host: int = 2, page_timeout: float = 5.0,
+                 deadline: float = 4.0, cache_size: int = 500, cache_ttl: float = 3600):
+        self.top_n = top_n
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.page_timeout = page_timeout
+        self.deadline = deadline
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # url -> (etag, text, fetched_at)
+        self._cache: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop = None
+        self._stats = {"fetched": 0, "cache_hits": 0, "revalidated": 0, "skipped": 0,
+                       "errors": 0, "timeouts": 0, "bytes": 0}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host,
+                                               ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.page_timeout),
+                headers={"User-Agent": "Mozilla/5.0 (compatible; TARS-Agent2/1.0)"}
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def enrich(self, results: List[Dict[str, Any]], deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Attach extracted page text as ``content`` to the top results that finish in time"""
+        deadline = self.deadline if deadline is None else deadline
+        targets = [(i, result_url(r)) for i, r in enumerate(results[:self.top_n]) if result_url(r)]
+        if not targets:
+            return results
+
+        start = time.perf_counter()
+        tasks = {asyncio.ensure_future(self._fetch_text(url)): i for i, url in targets}
+        done, pending = await asyncio.wait(set(tasks), timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            self._stats["timeouts"] += len(pending)
+
+        enriched = list(results)
+        for task in done:
+            text = task.result()
+            if text:
+                i = tasks[task]
+                enriched[i] = {**enriched[i], "content": text}
+        logger.info(f"📰 Enriched {sum(1 for t in done if t.result())}/{len(targets)} pages "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return enriched
+
+    async def _fetch_text(self, url: str) -> str:
+        cached = self._cache.get(url)
+        if cached and time.time() - cached[2] < self.cache_ttl:
+            self._cache.move_to_end(url)
+            self._stats["cache_hits"] += 1
+            return cached[1]
+
+        headers = {"If-None-Match": cached[0]} if cached and cached[0] else {}
+        try:
+            async with self._get_session().get(url, headers=headers) as response:
+                if response.status == 304 and cached:
+                    self._stats["revalidated"] += 1
+                    self._remember(url, cached[0], cached[1])
+                    return cached[1]
+                content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+                if response.status != 200 or (content_type and content_type not in TEXT_TYPES):
+                    self._stats["skipped"] += 1
+                    return ""
+
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(16384):
+                    body.extend(chunk)
+                    if len(body) >= self.max_bytes:
+                        break
+                self._stats["bytes"] += len(body)
+                html = bytes(body[:self.max_bytes]).decode(response.charset or "utf-8", errors="replace")
+                etag = response.headers.get("ETag", "")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"⚠️ Failed to fetch {url}: {e}")
+            return ""
+
+        # Parsing is CPU-bound; keep it off the event loop
+        text = await asyncio.to_thread(extract_main_text, html, self.max_chars)
+        self._stats["fetched"] += 1
+        self._remember(url, etag, text)
+        return text
+
+    def _remember(self, url: str, etag: str, text: str):
+        self._cache[url] = (etag, text, time.time())
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "cached_pages": len(self._cache)}
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
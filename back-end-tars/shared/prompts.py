@@ -0,0 +1,151 @@
+"""
+In-memory registry of the prompt templates in ``prompts/``.
+
+Every template is read once at startup, checked against the placeholders its
+callers fill in, and pre-split into literal text and placeholder slots, so
+rendering is a join over a list instead of a file read plus ``str.format``.
+A template missing a placeholder (or using one no caller provides) fails at
+``load_prompts()`` rather than in the middle of a request.
+
+Placeholders are ``{identifier}``. Any other brace is literal text, so
+templates can show JSON examples without doubling their braces. Edited files
+are picked up on their next use after their mtime changes; an edit that fails
+validation is logged and the previous version keeps being served.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+logger = logging.getLogger("tars.prompts")
+
+PROMPTS_DIR = "prompts"
+# How often (seconds) a template's mtime is checked for hot reload
+RELOAD_CHECK_INTERVAL = 2.0
+
+# Template name -> placeholders its callers fill in
+TEMPLATES: Dict[str, Set[str]] = {
+    "evaluation": {"question", "initial_answer"},
+    "formulate_internal": {"original_question"},
+    "formulate_search": {"original_question"},
+    "formulate_combined": {"original_question"},
+    "agent1_batch": {"questions"},
+    "combiNASHUN": {"question", "internal_context", "global_context", "initial_answer"},
+    "agent4_doc_inventory": {"action"},
+    "agent4_branches": {"brief", "facts"},
+    "agent5_parse_input": {"raw_input"},
+}
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+class PromptTemplate:
+    """A template split into alternating literal text and placeholder names"""
+
+    def __init__(self, name: str, text: str, mtime: float):
+        self.name = name
+        self.text = text
+        self.mtime = mtime
+        # Even indices are literal text, odd indices placeholder names
+        self._parts: List[str] = _PLACEHOLDER.split(text)
+        self.placeholders: Set[str] = set(self._parts[1::2])
+
+    def render(self, **values) -> str:
+        parts = list(self._parts)
+        for i in range(1, len(parts), 2):
+            try:
+                parts[i] = str(values[parts[i]])
+            except KeyError:
+                raise KeyError(f"Prompt '{self.name}' needs a value for '{parts[i]}'") from None
+        return "".join(parts)
+
+
+class PromptRegistry:
+    """Validated templates served from memory, reloaded when their file changes"""
+
+    def __init__(self, directory: str = PROMPTS_DIR, templates: Optional[Dict[str, Set[str]]] = None):
+        self.directory = directory
+        self.expected = dict(TEMPLATES if templates is None else templates)
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.txt")
+
+    def _read(self, name: str) -> PromptTemplate:
+        path = self._path(name)
+        mtime = os.path.getmtime(path)
+        with open(path, "r", encoding="utf-8") as f:
+            template = PromptTemplate(name, f.read(), mtime)
+        expected = self.expected.get(name)
+        if expected is not None and template.placeholders != expected:
+            missing = ", ".join(sorted(expected - template.placeholders)) or "-"
+            unknown = ", ".join(sorted(template.placeholders - expected)) or "-"
+            raise ValueError(f"Prompt template {path} has the wrong placeholders "
+                             f"(missing: {missing}; unknown: {unknown})")
+        return template
+
+    def load(self) -> "PromptRegistry":
+        """Read and validate every expected template; raises on the first problem"""
+        errors = []
+        for name in self.expected:
+            try:
+                self._templates[name] = self._read(name)
+                self._checked[name] = time.monotonic()
+            except (OSError, ValueError) as e:
+                errors.append(str(e))
+        if errors:
+            raise ValueError("Invalid prompt templates:\n" + "\n".join(errors))
+        logger.info(f"📝 Loaded {len(self._templates)} prompt templates from {self.directory}")
+        return self
+
+    def get(self, name: str) -> PromptTemplate:
+        name = _template_name(name)
+        template = self._templates.get(name)
+        now = time.monotonic()
+        if template is not None and now - self._checked.get(name, 0) < RELOAD_CHECK_INTERVAL:
+            return template
+        with self._lock:
+            self._checked[name] = now
+            try:
+                if template is None or os.path.getmtime(self._path(name)) != template.mtime:
+                    template = self._templates[name] = self._read(name)
+                    self.reloads += 1
+                    logger.info(f"📝 Reloaded prompt template '{name}'")
+            except (OSError, ValueError) as e:
+                if template is None:
+                    raise
+                logger.warning(f"⚠️ Keeping the previous '{name}' prompt: {e}")
+        return template
+
+    def render(self, name: str, **values) -> str:
+        return self.get(name).render(**values)
+
+
+def _template_name(name_or_path: str) -> str:
+    """"combiNASHUN", "combiNASHUN.txt" and "prompts/combiNASHUN.txt" all name the same template"""
+    name = os.path.basename(name_or_path)
+    return name[:-4] if name.endswith(".txt") else name
+
+
+_registry: Optional[PromptRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def load_prompts(directory: str = PROMPTS_DIR) -> PromptRegistry:
+    """Load and validate the process-wide registry; call at startup so bad templates fail fast"""
+    global _registry
+    with _registry_lock:
+        if _registry is None or _registry.directory != directory:
+            _registry = PromptRegistry(directory).load()
+        return _registry
+
+
+def render_prompt(name: str, **values) -> str:
+    """Render a template from the process-wide registry"""
+    registry = _registry or load_prompts()
+    return registry.render(name, **values)
@@ -0,0 +1,127 @@
+"""
+Token-bucket rate limiting for outbound provider calls.
+
+Buckets are process-wide (see ``get_limiter``), so every orchestrator,
+coroutine and thread calling the same provider draws from the same budget.
+A caller that finds the bucket empty reserves the next free slot and waits
+for it; if that slot lies beyond the caller's deadline, or too many callers
+are already queued, the reservation is refused and the caller can move on
+to another provider instead of collecting a 429.
+"""
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, int]]:
+    """Parse "brave=1/1,search1api=5/10" (requests per second / burst) into a map"""
+    limits = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        name, value = part.split("=", 1)
+        rate, _, burst = value.partition("/")
+        limits[name.strip()] = (float(rate), int(burst) if burst else max(1, int(float(rate))))
+    return limits
+
+
+class TokenBucket:
+    """Thread- and coroutine-safe token bucket with a bounded wait queue"""
+
+    def __init__(self, rate: float, burst: int = 1, max_queue: int = 20, max_wait: float = 5.0):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._stats = {"granted": 0, "waited": 0, "rejected": 0, "total_wait": 0.0}
+
+    def _reserve(self, timeout: Optional[float]) -> Optional[float]:
+        """Take a token now or book a future one; return the wait, or None if refused"""
+        limit = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Tokens go negative while callers are queued; the deficit is the queue length
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > 0 and (wait > limit or self._queued >= self.max_queue):
+                self._stats["rejected"] += 1
+                return None
+            self._tokens -= 1
+            self._stats["granted"] += 1
+            if wait > 0:
+                self._queued += 1
+                self._stats["waited"] += 1
+                self._stats["total_wait"] += wait
+            return wait
+
+    def _dequeue(self):
+        with self._lock:
+            self._queued -= 1
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a token is available; False if it would take longer than ``timeout``"""
+        wait = self._reserve(timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                self._dequeue()
+        return True
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """Async variant of ``acquire``; waits without blocking the event loop"""
+        wait = self._reserve(timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                # A cancelled waiter does not hand its slot back; the bucket
+                # simply refills a little later, which errs on the safe side
+                self._dequeue()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waited = max(self._stats["waited"], 1)
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "queued": self._queued,
+                "granted": self._stats["granted"],
+                "waited": self._stats["waited"],
+                "rejected": self._stats["rejected"],
+                "avg_wait": round(self._stats["total_wait"] / waited, 3),
+            }
+
+
+_registry: Dict[str, TokenBucket] = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(name: str, rate: float, burst: int = 1, max_queue: int = 20,
+                max_wait: float = 5.0) -> TokenBucket:
+    """Return the process-wide bucket for ``name``, creating it on first use"""
+    with _registry_lock:
+        bucket = _registry.get(name)
+        if bucket is None:
+            bucket = _registry[name] = TokenBucket(rate, burst, max_queue, max_wait)
+        return bucket
+
+
+def build_limiters(limits: Dict[str, Tuple[float, int]], max_queue: int = 20,
+                   max_wait: float = 5.0) -> Dict[str, TokenBucket]:
+    """Shared buckets for every provider in a parsed ``parse_rate_limits`` map"""
+    return {name: get_limiter(name, rate, burst, max_queue, max_wait)
+            for name, (rate, burst) in limits.items()}
@@ -0,0 +1,102 @@
+"""
+Token-aware packing of search results before summarization.
+
+Providers return anything from three tidy snippets to a whole response body
+with raw page content. ``pack_results`` projects each result to the fields a
+summarizer needs (title, url, description), ranks them by relevance to the
+query and trims their text so the packed set fits a token budget, estimated
+locally at ~4 characters per token.
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+
+from shared.search_orchestrator import result_url
+from shared.text_utils import estimate_tokens
+from shared.tfidf import TfidfVectorizer
+
+# Keys providers use for the result list when they return a whole body
+RESULT_LIST_KEYS = ("results", "web", "data", "items", "organic")
+# Never trim a result's text below this, or it stops being useful
+MIN_TEXT_TOKENS = 24
+
+
+def coerce_results(data: Any) -> List[Dict[str, Any]]:
+    """Pull the list of result dicts out of whatever a provider returned"""
+    if isinstance(data, dict):
+        for key in RESULT_LIST_KEYS:
+            if key in data:
+                return coerce_results(data[key])
+        return [data] if result_url(data) or data.get("title") else []
+    if isinstance(data, list):
+        return [r for r in data if isinstance(r, dict)]
+    return []
+
+
+def result_text(result: Dict[str, Any]) -> str:
+    """Best available body text: extracted page content, then the provider snippet"""
+    for key in ("content", "description", "snippet", "markdown", "text"):
+        value = result.get(key)
+        if isinstance(value, str) and value.strip():
+            return " ".join(value.split())
+    return ""
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly ``max_tokens``, preferring a sentence, then a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max(0, max_tokens * 4)]
+    sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end > len(cut) // 2:
+        return cut[:sentence_end + 1]
+    return cut.rsplit(" ", 1)[0] + "…"
+
+
+def pack_results(results: Any, query: str = "", token_budget: int = 1500,
+                 max_results: int = 8, relevance_weight: float = 0.7) -> List[Dict[str, Any]]:
+    """
+    Project, rank and trim results to fit ``token_budget``.
+
+    Ranking blends TF-IDF similarity to the query with the provider's own
+    order, so an on-topic result can move up without a strong provider
+    ranking being thrown away. The budget is shared evenly; text a result
+    does not need is handed on to the results below it.
+    """
+    projected = []
+    for rank, result in enumerate(coerce_results(results)):
+        title = " ".join(str(result.get("title") or "").split())
+        text = result_text(result)
+        if title or text:
+            projected.append({"title": title, "url": result_url(result), "description": text, "_rank": rank})
+    if not projected:
+        return []
+
+    prior = np.array([1.0 / (1 + p["_rank"]) for p in projected], dtype=np.float32)
+    scores = prior
+    if query:
+        vectorizer = TfidfVectorizer()
+        matrix = vectorizer.fit_transform([f"{p['title']} {p['description']}" for p in projected] + [query])
+        relevance = matrix[:-1] @ matrix[-1]
+        if relevance.max() > 0:
+            scores = relevance_weight * relevance / relevance.max() + (1 - relevance_weight) * prior
+    order = np.argsort(-scores, kind="stable")[:max_results]
+
+    packed = []
+    remaining = token_budget
+    for position, i in enumerate(order):
+        item = projected[int(i)]
+        overhead = estimate_tokens(item["title"]) + estimate_tokens(item["url"]) + 4
+        share = remaining // (len(order) - position) - overhead
+        if share < MIN_TEXT_TOKENS and packed:
+            break
+        description = truncate_to_tokens(item["description"], max(share, MIN_TEXT_TOKENS))
+        packed.append({"title": item["title"], "url": item["url"], "description": description})
+        remaining -= overhead + estimate_tokens(description)
+    return packed
+
+
+def packed_tokens(packed: List[Dict[str, Any]]) -> int:
+    """Estimated tokens of a packed result set"""
+    return sum(estimate_tokens(r["title"]) + estimate_tokens(r["url"]) + estimate_tokens(r["description"]) + 4
+               for r in packed)
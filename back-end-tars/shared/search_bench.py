@@ -0,0 +1,150 @@
+"""
+Latency benchmark for search providers.
+
+Replays a list of queries against one or more synchronous provider callables
+(``provider(query) -> list``) with a thread pool and reports latency
+percentiles, error rate and result counts per provider. The first call to
+each provider is timed on its own as the "cold" call, since it pays for MCP
+sidecar start-up, TLS handshakes and DNS; everything after it is "warm".
+
+Providers can be recorded to a JSON fixture file and replayed from it
+offline, so the benchmark harness itself can be exercised without network.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from shared.search_orchestrator import percentile
+from shared.text_utils import cache_key
+
+SyncProvider = Callable[[str], Any]
+
+
+def load_queries(path: str) -> List[str]:
+    """One query per line; blank lines and lines starting with # are skipped"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+class FixtureStore:
+    """Recorded provider responses keyed by provider and normalized query"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.data: Dict[str, Dict[str, Any]] = json.load(f)
+        except FileNotFoundError:
+            self.data = {}
+
+    def recorder(self, name: str, provider: SyncProvider) -> SyncProvider:
+        """Wrap a live provider so every response is stored in the fixture"""
+        def record(query: str):
+            start = time.perf_counter()
+            results = provider(query)
+            entry = {"results": results, "latency": round(time.perf_counter() - start, 4)}
+            with self._lock:
+                self.data.setdefault(name, {})[cache_key(query)] = entry
+            return results
+        return record
+
+    def replayer(self, name: str, simulate_latency: bool = False) -> SyncProvider:
+        """Provider stand-in answering from the fixture, optionally sleeping for the recorded latency"""
+        recorded = self.data.get(name, {})
+
+        def replay(query: str):
+            entry = recorded.get(cache_key(query))
+            if entry is None:
+                raise KeyError(f"No recorded {name} response for '{query}'")
+            if simulate_latency:
+                time.sleep(entry.get("latency", 0))
+            return entry["results"]
+        return replay
+
+    def providers(self) -> List[str]:
+        return list(self.data)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+
+
+def _timed_call(provider: SyncProvider, query: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        results = provider(query)
+        count = len(results) if isinstance(results, list) else int(bool(results))
+        error = None
+    except Exception as e:
+        count, error = 0, f"{type(e).__name__}: {e}"
+    return {"latency": time.perf_counter() - start, "count": count, "error": error}
+
+
+def run_benchmark(providers: Dict[str, SyncProvider], queries: List[str], concurrency: int = 4,
+                  repeat: int = 1, cold_start: bool = True,
+                  progress: Optional[Callable[[str], None]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Benchmark each provider in turn and return a per-provider report.
+
+    With ``cold_start`` the first query is sent alone and reported as the
+    cold call; the remaining ``queries * repeat`` calls run ``concurrency``
+    at a time and make up the warm statistics.
+    """
+    report = {}
+    for name, provider in providers.items():
+        workload = list(queries) * max(1, repeat)
+        cold = None
+        if cold_start and workload:
+            cold = _timed_call(provider, workload.pop(0))
+            if progress:
+                progress(f"{name}: cold call {cold['latency']:.2f}s")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            calls = list(pool.map(lambda q: _timed_call(provider, q), workload))
+        wall = time.perf_counter() - start
+
+        latencies = [c["latency"] for c in calls if not c["error"]]
+        errors = [c["error"] for c in calls if c["error"]]
+        report[name] = {
+            "calls": len(calls) + (1 if cold else 0),
+            "cold_latency": round(cold["latency"], 3) if cold else None,
+            "cold_error": cold["error"] if cold else None,
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "error_rate": round(len(errors) / len(calls), 3) if calls else 0.0,
+            "avg_results": round(sum(c["count"] for c in calls) / len(calls), 2) if calls else 0.0,
+            "empty_rate": round(sum(1 for c in calls if not c["error"] and not c["count"]) / len(calls), 3)
+            if calls else 0.0,
+            "throughput": round(len(calls) / wall, 2) if wall > 0 else 0.0,
+            "errors": sorted(set(errors))[:5],
+        }
+        if progress:
+            progress(f"{name}: {len(calls)} warm calls in {wall:.2f}s")
+    return report
+
+
+def format_report(report: Dict[str, Dict[str, Any]]) -> str:
+    """Fixed-width table of a ``run_benchmark`` report"""
+    header = f"{'provider':<14}{'calls':>6}{'cold s':>8}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}" \
+             f"{'err%':>7}{'empty%':>8}{'results':>9}{'req/s':>8}"
+    lines = [header, "-" * len(header)]
+    for name, r in report.items():
+        cold = f"{r['cold_latency']:.3f}" if r["cold_latency"] is not None else "-"
+        lines.append(
+            f"{name:<14}{r['calls']:>6}{cold:>8}{r['p50']:>8.3f}{r['p95']:>8.3f}{r['p99']:>8.3f}"
+            f"{r['error_rate'] * 100:>7.1f}{r['empty_rate'] * 100:>8.1f}{r['avg_results']:>9.2f}{r['throughput']:>8.2f}"
+        )
+        for error in r["errors"]:
+            lines.append(f"    ! {error}")
+    return "\n".join(lines)
@@ -0,0 +1,66 @@
+"""
+Disk-backed cache for search results.
+
+Keys are the normalized query (see ``shared.text_utils.cache_key``) plus
+the search mode, so reformulations that differ only in case, whitespace,
+punctuation or a "search for" prefix hit the same entry. A query with no
+word in it has an empty key and is never cached. Each entry lives for the
+shortest TTL among the providers that contributed to it.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from shared.sqlite_cache import SqliteCache
+from shared.text_utils import cache_key
+
+logger = logging.getLogger("tars.search")
+
+
+def parse_ttls(spec: str) -> Dict[str, float]:
+    """Parse "brave=1800,firecrawl=3600" into a provider -> seconds map"""
+    ttls = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            name, seconds = part.split("=", 1)
+            ttls[name.strip()] = float(seconds)
+    return ttls
+
+
+class SearchCache:
+    """Normalized-query cache in front of the search providers"""
+
+    def __init__(self, path: str, default_ttl: float = 3600,
+                 provider_ttls: Optional[Dict[str, float]] = None, max_entries: int = 5000):
+        self.default_ttl = default_ttl
+        self.provider_ttls = provider_ttls or {}
+        self.store = SqliteCache(path, max_entries=max_entries, table="search_results")
+
+    @staticmethod
+    def key(query: str, mode: str = "") -> Optional[str]:
+        """The entry key, or None when the query normalizes to nothing"""
+        normalized = cache_key(query)
+        return f"{mode}:{normalized}" if normalized else None
+
+    def get(self, query: str, mode: str = "") -> Optional[List[Dict[str, Any]]]:
+        key = self.key(query, mode)
+        if key is None:
+            return None
+        results = self.store.get(key)
+        if results is not None:
+            logger.info(f"💾 Search cache hit for '{query}' (hit rate {self.store.hit_rate:.0%})")
+        return results
+
+    def set(self, query: str, results: List[Dict[str, Any]], mode: str = ""):
+        """Cache a non-empty result set using the strictest contributing provider TTL"""
+        key = self.key(query, mode)
+        if not results or key is None:
+            return
+        providers = set()
+        for r in results:
+            providers.update(r.get("providers") or [r.get("provider")])
+        ttl = min((self.provider_ttls.get(p, self.default_ttl) for p in providers if p),
+                  default=self.default_ttl)
+        self.store.set(key, results, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.store.stats()
@@ -0,0 +1,383 @@
+"""
+Concurrent fan-out across search providers.
+
+Every provider is an async callable ``provider(query) -> list[dict]``. The
+orchestrator starts all of them at once and either returns the first
+non-empty result set ("race") or waits until a deadline and merges whatever
+came back ("merge"), deduplicating on a canonical URL and ranking with
+reciprocal rank fusion. The "adaptive" mode calls one provider at a time,
+picked by ``AdaptiveSelector`` from rolling latency and yield statistics,
+and only moves on to the next one if the pick fails or comes back empty.
+
+Providers may have a rate limiter (``shared.rate_limit.TokenBucket``). A
+provider whose next slot would arrive after the search deadline is skipped
+for that query rather than called into a 429.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger("tars.search")
+
+Provider = Callable[[str], Awaitable[List[Dict[str, Any]]]]
+
+SEARCH_MODES = ("race", "merge", "adaptive")
+
+# Query parameters that only identify the referrer, not the page
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "ref", "ref_src", "igshid", "mc_cid", "mc_eid"}
+
+# Reciprocal rank fusion constant (Cormack et al.)
+RRF_K = 60
+
+# Shortest per-provider budget in adaptive mode, however fast its p95 is
+ADAPTIVE_MIN_ATTEMPT = 2.0
+
+
+def result_url(result: Dict[str, Any]) -> str:
+    """Return the URL of a result regardless of the provider's field name"""
+    return (result.get("url") or result.get("link") or "").strip()
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL so syndicated/tracked variants of the same page compare equal"""
+    if not url:
+        return ""
+    parts = urlsplit(url if "://" in url else f"https://{url}")
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https", host, path, query, ""))
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of a small sample"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+class ProviderStats:
+    """Running latency and yield counters for a single provider"""
+
+    def __init__(self, name: str, window: int = 50):
+        self.name = name
+        # Most recent (latency, outcome) pairs; outcome is ok/empty/error/timeout/throttled
+        self.recent = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.empty = 0
+        self.cancelled = 0
+        self.throttled = 0
+        self.results = 0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+        self.last_error = ""
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, count: int = 0, error: Optional[str] = None):
+        with self._lock:
+            self.calls += 1
+            self.total_latency += latency
+            self.last_latency = latency
+            if error:
+                self.errors += 1
+                self.last_error = error
+            elif count == 0:
+                self.empty += 1
+            self.results += count
+            self.recent.append((latency, "error" if error else "ok" if count else "empty"))
+
+    def record_cancelled(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def record_throttled(self):
+        with self._lock:
+            self.throttled += 1
+            self.recent.append((0.0, "throttled"))
+
+    def record_timeout(self, latency: float):
+        with self._lock:
+            self.recent.append((latency, "timeout"))
+
+    def window(self) -> Dict[str, Any]:
+        """Latency percentiles and failure rates over the recent window"""
+        with self._lock:
+            recent = list(self.recent)
+        latencies = [lat for lat, outcome in recent if outcome in ("ok", "empty", "timeout")]
+        n = len(recent)
+
+        def rate(*outcomes):
+            return round(sum(1 for _, o in recent if o in outcomes) / n, 3) if n else 0.0
+
+        return {
+            "samples": n,
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "empty_rate": rate("empty"),
+            "error_rate": rate("error", "timeout"),
+            "throttle_rate": rate("throttled"),
+            "failure_rate": rate("empty", "error", "timeout", "throttled"),
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        window = self.window()
+        with self._lock:
+            completed = max(self.calls, 1)
+            return {
+                "window": window,
+                "calls": self.calls,
+                "errors": self.errors,
+                "empty": self.empty,
+                "cancelled": self.cancelled,
+                "throttled": self.throttled,
+                "avg_latency": round(self.total_latency / completed, 3),
+                "last_latency": round(self.last_latency, 3),
+                "avg_yield": round(self.results / completed, 2),
+                "last_error": self.last_error,
+            }
+
+
+def merge_results(batches: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge result lists from several providers.
+
+    Results pointing at the same canonical URL are collapsed into one entry
+    (the first copy seen wins) and ranked by reciprocal rank fusion, so a page
+    returned near the top by several providers outranks a one-off hit.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+
+    for provider, results in batches.items():
+        for rank, result in enumerate(results):
+            key = canonical_url(result_url(result)) or result.get("title", "").strip().lower()
+            if not key:
+                continue
+            if key not in merged:
+                merged[key] = {**result, "providers": []}
+                scores[key] = 0.0
+            if provider not in merged[key]["providers"]:
+                merged[key]["providers"].append(provider)
+            scores[key] += 1.0 / (RRF_K + rank + 1)
+
+    ordered = sorted(merged, key=lambda k: scores[k], reverse=True)
+    return [merged[k] for k in ordered]
+
+
+class AdaptiveSelector:
+    """
+    Epsilon-greedy provider ranking.
+
+    Providers with too few recent samples are tried first so every provider
+    gets measured. After that the fastest provider (by rolling p50 latency)
+    whose recent failure rate is acceptable is preferred, and with
+    probability ``epsilon`` another provider is promoted instead so the
+    statistics of the slower ones keep up with reality.
+    """
+
+    def __init__(self, epsilon: float = 0.1, min_samples: int = 3,
+                 max_failure_rate: float = 0.5, history: int = 50):
+        self.epsilon = epsilon
+        self.min_samples = min_samples
+        self.max_failure_rate = max_failure_rate
+        self.decisions = deque(maxlen=history)
+        self._random = random.Random()
+
+    def rank(self, windows: Dict[str, Dict[str, Any]]) -> Tuple[List[str], str]:
+        """Order provider names by preference; returns (order, reason)"""
+        names = list(windows)
+        cold = [n for n in names if windows[n]["samples"] < self.min_samples]
+        healthy = [n for n in names if n not in cold and windows[n]["failure_rate"] <= self.max_failure_rate]
+        unhealthy = [n for n in names if n not in cold and n not in healthy]
+        healthy.sort(key=lambda n: windows[n]["p50"])
+        unhealthy.sort(key=lambda n: (windows[n]["failure_rate"], windows[n]["p50"]))
+
+        if cold:
+            first = self._random.choice(cold)
+            rest = [n for n in cold if n != first]
+            return [first] + healthy + rest + unhealthy, "cold-start"
+        order = healthy + unhealthy
+        if len(order) > 1 and self._random.random() < self.epsilon:
+            explored = self._random.choice(order[1:])
+            return [explored] + [n for n in order if n != explored], "explore"
+        return order, "exploit" if healthy else "all-degraded"
+
+    def record(self, decision: Dict[str, Any]):
+        self.decisions.append(decision)
+
+
+class SearchOrchestrator:
+    """Queries all configured providers concurrently"""
+
+    def __init__(self, providers: Dict[str, Provider], mode: str = "race", deadline: float = 20.0,
+                 limiters: Optional[Dict[str, Any]] = None, selector: Optional[AdaptiveSelector] = None):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+        self.providers = dict(providers)
+        self.mode = mode
+        self.deadline = deadline
+        self.limiters = {name: l for name, l in (limiters or {}).items() if name in self.providers}
+        self.selector = selector or AdaptiveSelector()
+        self._stats = {name: ProviderStats(name) for name in self.providers}
+
+    async def search(self, query: str, mode: Optional[str] = None,
+                     deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Run the query against every provider and combine the answers"""
+        mode = mode or self.mode
+        deadline = self.deadline if deadline is None else deadline
+        if not self.providers:
+            logger.warning("No search providers configured")
+            return []
+        if mode == "adaptive":
+            return await self._adaptive(query, deadline)
+
+        tasks = {
+            asyncio.ensure_future(self._call(name, provider, query, deadline)): name
+            for name, provider in self.providers.items()
+        }
+        logger.info(f"🔍 Fan-out ({mode}) to {', '.join(tasks.values())} for: {query}")
+
+        if mode == "race":
+            return await self._race(tasks, deadline)
+        return await self._merge(tasks, deadline)
+
+    async def _call(self, name: str, provider: Provider, query: str,
+                    deadline: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Call one provider, tagging its results and recording latency/yield"""
+        limiter = self.limiters.get(name)
+        if limiter is not None:
+            try:
+                allowed = await limiter.acquire_async(timeout=deadline)
+            except asyncio.CancelledError:
+                self._stats[name].record_cancelled()
+                raise
+            if not allowed:
+                self._stats[name].record_throttled()
+                logger.warning(f"🚦 {name} rate limit would exceed the deadline, skipping")
+                return []
+
+        start = time.perf_counter()
+        try:
+            results = await provider(query) or []
+        except asyncio.CancelledError:
+            self._stats[name].record_cancelled()
+            raise
+        except Exception as e:
+            self._stats[name].record(time.perf_counter() - start, error=str(e))
+            logger.error(f"❌ {name} error: {e}")
+            return []
+
+        if not isinstance(results, list):
+            results = [results]
+        results = [{**r, "provider": name} for r in results if isinstance(r, dict)]
+        latency = time.perf_counter() - start
+        self._stats[name].record(latency, count=len(results))
+        logger.info(f"✅ {name} returned {len(results)} items in {latency:.2f}s")
+        return results
+
+    async def _race(self, tasks: Dict[asyncio.Future, str], deadline: float) -> List[Dict[str, Any]]:
+        """Return the first non-empty result set, cancelling the slower providers"""
+        pending = set(tasks)
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + deadline
+        try:
+            while pending:
+                remaining = stop_at - loop.time()
+                if remaining <= 0:
+                    logger.warning(f"⏱️ Race deadline of {deadline}s reached")
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results = task.result()
+                    if results:
+                        logger.info(f"🏁 {tasks[task]} won the race")
+                        return results
+            return []
+        finally:
+            await self._cancel(pending)
+
+    async def _merge(self, tasks: Dict[asyncio.Future, str], deadline: float) -> List[Dict[str, Any]]:
+        """Wait up to the deadline, then dedupe and rank everything that arrived"""
+        done, pending = await asyncio.wait(set(tasks), timeout=deadline)
+        if pending:
+            logger.warning(f"⏱️ Merge deadline of {deadline}s reached, dropping "
+                           f"{', '.join(tasks[t] for t in pending)}")
+        await self._cancel(pending)
+
+        # Keep provider order stable so ties are broken by configuration order
+        batches = {tasks[t]: t.result() for t in tasks if t in done}
+        return merge_results(batches)
+
+    async def _adaptive(self, query: str, deadline: float) -> List[Dict[str, Any]]:
+        """Call providers one at a time in the selector's order until one yields results"""
+        windows = {name: self._stats[name].window() for name in self.providers}
+        order, reason = self.selector.rank(windows)
+        logger.info(f"🎯 Adaptive order ({reason}): {', '.join(order)} for: {query}")
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        attempts = []
+        results: List[Dict[str, Any]] = []
+        for i, name in enumerate(order):
+            remaining = deadline - (loop.time() - start)
+            if remaining <= 0:
+                logger.warning(f"⏱️ Adaptive deadline of {deadline}s reached")
+                break
+            # A provider gets a few times its usual p95, and never more than half
+            # of what is left while others are still waiting as a fallback
+            p95 = windows[name]["p95"]
+            budget = max(ADAPTIVE_MIN_ATTEMPT, 3 * p95) if p95 else remaining
+            budget = min(budget, remaining if i == len(order) - 1 else remaining / 2)
+            attempt_start = loop.time()
+            try:
+                results = await asyncio.wait_for(self._call(name, self.providers[name], query, budget), budget)
+            except asyncio.TimeoutError:
+                self._stats[name].record_timeout(loop.time() - attempt_start)
+                logger.warning(f"⏱️ {name} gave no answer within {budget:.1f}s, trying the next provider")
+                results = []
+            attempts.append(name)
+            if results:
+                break
+
+        self.selector.record({
+            "time": time.time(),
+            "query": query[:100],
+            "order": order,
+            "reason": reason,
+            "attempts": attempts,
+            "served_by": attempts[-1] if results else None,
+            "latency": round(loop.time() - start, 3),
+        })
+        return results
+
+    @staticmethod
+    async def _cancel(pending):
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def decisions(self) -> List[Dict[str, Any]]:
+        """Recent adaptive routing decisions, newest last"""
+        return list(self.selector.decisions)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider latency, yield and rate limiter counters"""
+        stats = {name: s.as_dict() for name, s in self._stats.items()}
+        for name, limiter in self.limiters.items():
+            stats[name]["rate_limit"] = limiter.stats()
+        return stats
@@ -0,0 +1,137 @@
+"""
+Per-session reuse of gathered context for follow-up questions.
+
+Within one conversation (an optimization session id, or the Agent 3 chat),
+follow-ups usually stay on the topic whose internal and external context was
+just retrieved. ``SessionContextStore`` keeps the last few gathered contexts
+and answers per session, bounded in sessions, entries and age, and
+``find`` decides whether a new question can reuse one of them instead of
+re-running the Agent 1 and Agent 2 chains. Two signals count, both measured
+against the earlier question only (a long context covers almost any words):
+
+    similarity   TF-IDF cosine between the new and an earlier question
+    coverage     share of the new question's content words that already
+                 appear in the earlier question
+
+Each chain's context is stored on its own and only when that chain
+succeeded; a reused entry returns None for a chain it has no context for,
+and the caller runs that chain again.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+from shared.text_utils import content_tokens
+from shared.tfidf import TfidfVectorizer
+
+# A follow-up needs at least this many content words before coverage alone can justify reuse
+MIN_COVERAGE_TOKENS = 2
+
+
+class SessionContextStore:
+    """Bounded, thread-safe store of gathered contexts keyed by session id"""
+
+    def __init__(self, max_sessions: int = 256, max_entries: int = 5, ttl: float = 1800,
+                 min_similarity: float = 0.35, min_coverage: float = 0.8):
+        self.max_sessions = max_sessions
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        self.min_coverage = min_coverage
+        self._sessions: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "misses": 0, "stored": 0}
+
+    def _entries(self, session_id: str) -> list:
+        """Live entries of a session, newest first; also marks the session recently used"""
+        entries = self._sessions.get(session_id)
+        if entries is None:
+            return []
+        cutoff = time.time() - self.ttl
+        while entries and entries[0]["ts"] < cutoff:
+            entries.popleft()
+        if not entries:
+            del self._sessions[session_id]
+            return []
+        self._sessions.move_to_end(session_id)
+        return list(reversed(entries))
+
+    def find(self, session_id: Optional[str], query: str) -> Optional[Dict[str, Any]]:
+        """
+        The stored entry whose question fits ``query`` best, with its
+        ``similarity`` and ``coverage``, or None when nothing is close enough.
+        ``internal_context`` or ``external_context`` is None when that chain
+        has no stored context.
+        """
+        if not session_id:
+            return None
+        with self._lock:
+            entries = self._entries(session_id)
+        if not entries:
+            with self._lock:
+                self._counts["misses"] += 1
+            return None
+
+        matrix = TfidfVectorizer().fit_transform([e["query"] for e in entries] + [query])
+        similarities = matrix[:-1] @ matrix[-1]
+        terms = set(content_tokens(query))
+
+        best = None
+        for entry, similarity in zip(entries, similarities.tolist()):
+            coverage = len(terms & entry["vocabulary"]) / len(terms) if terms else 0.0
+            reusable = similarity >= self.min_similarity or (
+                len(terms) >= MIN_COVERAGE_TOKENS and coverage >= self.min_coverage)
+            score = max(similarity, coverage)
+            if reusable and (best is None or score > best[0]):
+                best = (score, entry, similarity, coverage)
+
+        with self._lock:
+            self._counts["hits" if best else "misses"] += 1
+        if best is None:
+            return None
+        _, entry, similarity, coverage = best
+        return {
+            "query": entry["query"],
+            "internal_context": entry["internal_context"],
+            "external_context": entry["external_context"],
+            "answer": entry["answer"],
+            "similarity": round(similarity, 3),
+            "coverage": round(coverage, 3),
+            "age": round(time.time() - entry["ts"], 1),
+        }
+
+    def put(self, session_id: Optional[str], query: str, internal_context: Optional[str] = None,
+            external_context: Optional[str] = None, answer: str = ""):
+        """
+        Remember what was gathered for ``query``. Pass None (or "") for a chain
+        that was not run or failed; nothing is kept when neither chain succeeded.
+        """
+        internal_context, external_context = internal_context or None, external_context or None
+        if not session_id or not (internal_context or external_context):
+            return
+        entry = {
+            "query": query,
+            "internal_context": internal_context,
+            "external_context": external_context,
+            "answer": answer,
+            "vocabulary": set(content_tokens(query)),
+            "ts": time.time(),
+        }
+        with self._lock:
+            entries = self._sessions.get(session_id)
+            if entries is None:
+                entries = self._sessions[session_id] = deque(maxlen=self.max_entries)
+            entries.append(entry)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            self._counts["stored"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            counts["sessions"] = len(self._sessions)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / lookups, 3) if lookups else 0.0
+        return counts
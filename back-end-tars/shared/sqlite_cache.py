@@ -0,0 +1,134 @@
+"""
+Persistent key/value cache on top of SQLite.
+
+Values are stored as JSON with an absolute expiry time. When the table grows
+past ``max_entries`` the least recently used rows are evicted. Safe to share
+between threads; every connection goes through a single lock.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class SqliteCache:
+    """JSON values with per-entry TTL, LRU eviction and hit/miss counters"""
+
+    def __init__(self, path: str, max_entries: int = 5000, table: str = "cache"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name '{table}'")
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table}(accessed_at)")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss or expired entry"""
+        return self._read(key, count=True)
+
+    def peek(self, key: str) -> Optional[Any]:
+        """Like ``get`` (the entry still counts as used), but not counted as a hit or miss"""
+        return self._read(key, count=False)
+
+    def _read(self, key: str, count: bool) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += count
+                return None
+            if row[1] < now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self.expired += 1
+                self.misses += count
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += count
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        """Store a JSON-serialisable value for ``ttl`` seconds"""
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now + ttl, now)
+            )
+            self._evict()
+
+    def items(self) -> List[Tuple[str, Any]]:
+        """Every live (key, value) pair, most recently used last; does not count as lookups"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE expires_at >= ? ORDER BY accessed_at ASC",
+                (time.time(),)
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def _evict(self):
+        """Drop expired rows, then the least recently used ones beyond max_entries"""
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+        count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hit_rate, 3),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,95 @@
+"""
+Small text helpers shared by the caches, rankers and summarizers.
+"""
+import re
+from typing import FrozenSet, List
+
+# Common English function words plus filler that shows up in formulated queries
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just let me more most my myself no
+nor not now of off on once only or other our ours ourselves out over own please
+same she should so some such than that the their theirs them themselves then
+there these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your yours yourself
+yourselves tell show find give get search information info latest current
+""".split())
+
+# Stopwords that still change what is asked: negation, comparison, order and
+# the kind of answer wanted. Questions that differ in these are not duplicates
+# however similar the rest of their words are.
+QUALIFIERS = frozenset("""
+not no nor never without against before after above below under over more less
+most least higher lower why how when where which who latest current
+""".split())
+
+_SEARCH_PREFIX = re.compile(r'^(search(?: for)?\s+)', re.IGNORECASE)
+# Letters and digits of any script; hyphens and apostrophes join words, and
+# trailing "+" / "#" stay on ("c++", "c#", "f#")
+_TOKEN = re.compile(r"[^\W_]+(?:['\-][^\W_]+)*[+#]*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded word tokens, keeping hyphenated and apostrophised words whole"""
+    return _TOKEN.findall((text or "").casefold().replace("\u2019", "'"))
+
+
+def content_tokens(text: str) -> List[str]:
+    """Tokens with stopwords removed"""
+    return [t for t in tokenize(text) if t not in STOPWORDS]
+
+
+def qualifiers(text: str) -> FrozenSet[str]:
+    """The ``QUALIFIERS`` words in ``text`` (with "n't" read as "not")"""
+    return frozenset(
+        "not" if t.endswith("n't") else t for t in tokenize(text) if t in QUALIFIERS or t.endswith("n't")
+    )
+
+
+def normalize_query(query: str) -> str:
+    """
+    Content words of a search query or question, for ranking and similarity.
+
+    Strips the "search for" prefix, case, punctuation, whitespace and
+    stopwords, so "Search for the latest AI trends" and "ai  trends?" match.
+    Lossy (negations and comparisons are dropped); use ``cache_key`` for keys.
+    """
+    q = _SEARCH_PREFIX.sub("", (query or "").strip())
+    tokens = content_tokens(q)
+    # A query made only of stopwords still needs a stable key
+    return " ".join(tokens) if tokens else " ".join(tokenize(q))
+
+
+def cache_key(query: str) -> str:
+    """
+    Lossless canonical form of a search query or question used as a cache key.
+
+    Strips the "search for" prefix, case, punctuation and extra whitespace and
+    nothing else, so "Search for the latest AI trends" and "the latest AI
+    trends?" match while "not compliant" and "compliant" stay apart. Unlike
+    ``normalize_query`` no word is dropped, since stopwords such as "not",
+    "before" or "why" change what is being asked; words in any script and the
+    "+" / "#" of "C++" or "C#" are kept. Empty only for a query with no word
+    at all, which callers must not cache.
+    """
+    return " ".join(tokenize(_SEARCH_PREFIX.sub("", (query or "").strip())))
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English prose)"""
+    return (len(text or "") + 3) // 4
+
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+(?=[A-Z0-9"\'(\[])')
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split prose into sentences; line breaks always end a sentence"""
+    sentences = []
+    for line in (text or "").splitlines():
+        line = line.strip(" \t-*•")
+        if line:
+            sentences.extend(s.strip() for s in _SENTENCE_END.split(line) if s.strip())
+    return sentences
@@ -0,0 +1,73 @@
+"""
+Minimal TF-IDF vectorizer on NumPy.
+
+Fitting builds a vocabulary and IDF weights from a small corpus (sentences
+or passages of one request), transforming yields an L2-normalised dense
+matrix, so cosine similarity is a plain matrix product.
+"""
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from shared.text_utils import content_tokens
+
+
+class TfidfVectorizer:
+    """Sublinear TF, smoothed IDF, L2-normalised rows"""
+
+    def __init__(self):
+        self.vocab: Dict[str, int] = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+
+    def fit(self, docs: Sequence[str]) -> "TfidfVectorizer":
+        tokenized = [set(content_tokens(d)) for d in docs]
+        df = Counter(t for tokens in tokenized for t in tokens)
+        self.vocab = {term: i for i, term in enumerate(sorted(df))}
+        n = len(docs)
+        counts = np.array([df[t] for t in sorted(df)], dtype=np.float32)
+        self.idf = np.log((1 + n) / (1 + counts)) + 1.0
+        return self
+
+    def transform(self, docs: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(docs), len(self.vocab)), dtype=np.float32)
+        for row, doc in enumerate(docs):
+            for term, tf in Counter(content_tokens(doc)).items():
+                col = self.vocab.get(term)
+                if col is not None:
+                    matrix[row, col] = 1.0 + np.log(tf)
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def fit_transform(self, docs: Sequence[str]) -> np.ndarray:
+        return self.fit(docs).transform(docs)
+
+
+def cosine_matrix(matrix: np.ndarray) -> np.ndarray:
+    """Pairwise cosine similarity of L2-normalised rows"""
+    return matrix @ matrix.T
+
+
+def mmr_select(scores: np.ndarray, similarity: np.ndarray, k: int,
+               diversity: float = 0.3, max_overlap: float = 0.8) -> List[int]:
+    """
+    Maximal marginal relevance: greedily pick high-scoring items that are not
+    near-duplicates of items already picked. Returns indices in pick order.
+    """
+    selected: List[int] = []
+    candidates = list(np.argsort(-scores))
+    while candidates and len(selected) < k:
+        if selected:
+            overlap = similarity[np.ix_(candidates, selected)].max(axis=1)
+            marginal = (1 - diversity) * scores[candidates] - diversity * overlap
+            best = int(np.argmax(marginal))
+            if overlap[best] >= max_overlap:
+                # Everything left is redundant with what we already have
+                candidates.pop(best)
+                continue
+        else:
+            best = 0
+        selected.append(int(candidates.pop(best)))
+    return selected
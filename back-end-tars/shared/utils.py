@@ -1,7 +1,18 @@
 import os
+import time
+from typing import Optional
+
 from azure.ai.projects import AIProjectClient
 from azure.identity import DefaultAzureCredential
 
+from shared.llm_cache import get_llm_cache, instructions_version
+from shared.prompts import render_prompt
+
+# Agent id -> (instructions version, looked up at) for the completion cache. Re-read after
+# INSTRUCTIONS_VERSION_TTL seconds so edited instructions stop matching the old completions
+_instruction_versions = {}
+INSTRUCTIONS_VERSION_TTL = float(os.getenv("INSTRUCTIONS_VERSION_TTL", "60"))
+
 
 def extract_latest_assistant_message(messages: list) -> str:
     """Return the latest assistant text."""
@@ -13,19 +24,48 @@ def extract_latest_assistant_message(messages: list) -> str:
     return ""
 
 
+def _instructions_version(project_client: AIProjectClient, agent_id: str) -> Optional[str]:
+    """The agent's instructions version, or None when it cannot be looked up (skip the cache then)"""
+    known = _instruction_versions.get(agent_id)
+    if known is not None and time.time() - known[1] < INSTRUCTIONS_VERSION_TTL:
+        return known[0]
+    try:
+        version = instructions_version(project_client.agents.get_agent(agent_id))
+    except Exception:
+        # Not remembered: the next call tries again rather than keying on a guess
+        return None
+    _instruction_versions[agent_id] = (version, time.time())
+    return version
+
+
 def formulate_from_template(
     project_client: AIProjectClient,
     agent_id: str,
     prompt_path: str,
+    cache_kind: str = "formulation",
     **fmt_args
 ) -> str:
     """
-    Read template, format it with fmt_args, send as USER message,
-    and return assistant's reply text.
+    Render a registered template with fmt_args, send as USER message,
+    and return assistant's reply text. Replies go through the shared
+    completion cache when one is configured and the agent can be looked up.
     """
-    with open(prompt_path, "r", encoding="utf-8") as f:
-        template = f.read()
-    prompt = template.format(**fmt_args)
+    prompt = render_prompt(prompt_path, **fmt_args)
+    cache = get_llm_cache()
+    version = _instructions_version(project_client, agent_id) if cache is not None else None
+    if version is not None:
+        cached = cache.get(agent_id, agent_id, version, prompt)
+        if cached is not None:
+            return cached
+        reply = _run_prompt(project_client, agent_id, prompt)
+        if reply:
+            cache.set(agent_id, agent_id, version, prompt, reply, cache_kind)
+        return reply
+    return _run_prompt(project_client, agent_id, prompt)
+
+
+def _run_prompt(project_client: AIProjectClient, agent_id: str, prompt: str) -> str:
+    """Send ``prompt`` on a new thread and return the assistant's reply text"""
 
     thread = project_client.agents.create_thread()
     project_client.agents.create_message(
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from shared.search_bench import load_queries
+from shared.tfidf import TfidfVectorizer
+
+DEFAULT_QUERIES = [
+    "How can we reduce customer service wait times?",
+    "How should our branches respond to rising hardware costs from new chip tariffs?",
+    "What is a balanced scorecard?",
+]
+
+
+async def run_mode(agent3, queries, session_mode):
+    """Run every query through Agent 3 with session mode on or off"""
+    from app.utils.config import settings
+    settings.AGENT3_SESSION_MODE = session_mode
+    rows = []
+    for query in queries:
+        before = dict(agent3.thread_stats)
+        start = time.perf_counter()
+        result = await agent3.process({"query": query}, {})
+        rows.append({
+            "query": query,
+            "seconds": round(time.perf_counter() - start, 2),
+            "threads": agent3.thread_stats["created"] - before["created"],
+            "runs": agent3.thread_stats["runs"] - before["runs"],
+            "answer": result.get("enhanced_answer", ""),
+        })
+        print(f"   {'session' if session_mode else 'per-step'}: {rows[-1]['seconds']:.1f}s, "
+              f"{rows[-1]['threads']} threads, {rows[-1]['runs']} runs - {query}", flush=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Agent 3 session mode with a thread per step (needs Azure)")
+    parser.add_argument("--queries", metavar="QUERY_FILE", help="One query per line")
+    parser.add_argument("--json", metavar="PATH", help="Write both answers per query for side-by-side review")
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries) if args.queries else DEFAULT_QUERIES
+    # Building the process manager connects every agent, so import it only here
+    from app.main import process_manager
+    agent3 = process_manager.agents["agent3"]
+
+    async def compare():
+        per_step = await run_mode(agent3, queries, False)
+        session = await run_mode(agent3, queries, True)
+        await process_manager.close()
+        return per_step, session
+
+    print(f"\n🧵 Running {len(queries)} queries per mode\n", flush=True)
+    per_step, session = asyncio.run(compare())
+
+    print(f"\n{'mode':<10}{'median s':>10}{'max s':>8}{'threads':>9}{'runs':>6}", flush=True)
+    for name, rows in (("per-step", per_step), ("session", session)):
+        seconds = [r["seconds"] for r in rows]
+        print(f"{name:<10}{statistics.median(seconds):>10.1f}{max(seconds):>8.1f}"
+              f"{sum(r['threads'] for r in rows):>9}{sum(r['runs'] for r in rows):>6}", flush=True)
+
+    # Quality proxy: how close the two answers are, and how long; the JSON has the text to read
+    print("\n📝 Answer overlap (TF-IDF cosine) and length per query", flush=True)
+    for a, b in zip(per_step, session):
+        matrix = TfidfVectorizer().fit_transform([a["answer"] or " ", b["answer"] or " "])
+        overlap = float(matrix[0] @ matrix[1])
+        print(f"   {overlap:.2f}  {len(a['answer']):>5} vs {len(b['answer']):>5} chars  {a['query']}", flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"per_step": per_step, "session": session}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Answers written to {args.json}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from shared.context_compressor import compress_contexts, describe
+from shared.summarizer import summarize_results
+from shared.text_utils import estimate_tokens
+from tests.benchsummarizer import make_results
+
+INTERNAL_PARAGRAPHS = [
+    "Branch operating costs rose 7% year on year, driven mainly by rent renewals in urban locations and overtime in customer service.",
+    "The Finance department reports that IT infrastructure spend is 18% of the operating budget, above the 14% target set last year.",
+    "Operations piloted a shared back-office for loan processing in the northern region, cutting turnaround from five days to two.",
+    "HR notes attrition of 11% among frontline staff, with exit interviews citing scheduling and workload.",
+    "Procurement renegotiated hardware contracts in Q2, but most server purchases are priced in US dollars and exposed to tariffs.",
+    "The risk committee flagged concentration in a single chip packaging supplier for branch hardware.",
+]
+
+
+def make_contexts(paragraphs):
+    """Agent 1-style internal answers and an Agent 2-style search summary"""
+    internal = []
+    for i in range(paragraphs):
+        body = " ".join(INTERNAL_PARAGRAPHS[(i + j) % len(INTERNAL_PARAGRAPHS)] for j in range(3))
+        internal.append(f"Q{i + 1}: What do our documents say about cost area {i + 1}?\nA: {body}")
+    external = summarize_results(make_results(paragraphs * 2), "semiconductor tariffs supply chain",
+                                 sentences_per_result=3, max_overview=10)
+    return "\n\n".join(internal), external
+
+
+def prompt_tokens(question, internal, external):
+    with open(os.path.join(parent_dir, "prompts", "combiNASHUN.txt"), "r", encoding="utf-8") as f:
+        template = f.read()
+    return estimate_tokens(template.format(question=question, internal_context=internal,
+                                           global_context=external, initial_answer=""))
+
+
+async def time_enhance(question, internal, external, budget, runs):
+    # Importing the agent needs the Azure SDK and credentials, so only do it when asked
+    from app.agents.agent3_consultant import ConsultantAgent
+    from app.utils.config import settings
+    settings.AGENT3_CONTEXT_TOKEN_BUDGET = budget
+    agent = ConsultantAgent(None)
+    await agent.setup_client()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await agent._generate_enhanced_response(question, "", internal, external)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure context compression before Agent 3's enhanced response")
+    parser.add_argument("--question", default="How can we reduce branch hardware costs given new chip tariffs?")
+    parser.add_argument("--paragraphs", type=int, default=12, help="Size of the synthetic contexts")
+    parser.add_argument("--internal", help="Text file with a captured internal context")
+    parser.add_argument("--external", help="Text file with a captured external context")
+    parser.add_argument("--budgets", default="500,1000,1500,3000")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--live", action="store_true", help="Also time the Azure enhance run (needs credentials)")
+    args = parser.parse_args()
+
+    internal, external = make_contexts(args.paragraphs)
+    if args.internal:
+        with open(args.internal, "r", encoding="utf-8") as f:
+            internal = f.read()
+    if args.external:
+        with open(args.external, "r", encoding="utf-8") as f:
+            external = f.read()
+
+    full = prompt_tokens(args.question, internal, external)
+    print(f"\n🧪 Contexts: internal ~{estimate_tokens(internal)} tokens, external ~{estimate_tokens(external)} tokens", flush=True)
+    print(f"   uncompressed prompt ~{full} tokens\n", flush=True)
+
+    budgets = [int(b) for b in args.budgets.split(",") if b.strip()]
+    for budget in budgets:
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            compressed, report = compress_contexts({"internal": internal, "external": external},
+                                                   args.question, token_budget=budget)
+            timings.append((time.perf_counter() - start) * 1000)
+        tokens = prompt_tokens(args.question, compressed["internal"], compressed["external"])
+        print(f"🗜️ budget {budget:>5}: prompt ~{tokens} tokens ({tokens / full:.0%} of uncompressed), "
+              f"compression median {statistics.median(timings):.2f} ms", flush=True)
+        print(f"   {describe(report)}", flush=True)
+
+    print("\n🧠 Enhance stage latency", flush=True)
+    if args.live:
+        for budget in (0, budgets[len(budgets) // 2]):
+            timings = asyncio.run(time_enhance(args.question, internal, external, budget, min(args.runs, 3)))
+            label = "uncompressed" if budget == 0 else f"budget {budget}"
+            print(f"   {label:>14}: median {statistics.median(timings):.1f} s, max {max(timings):.1f} s", flush=True)
+    else:
+        print("   not timed (pass --live with Azure credentials configured)", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# Add parent directory to Python path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+sys.path.insert(0, parent_dir)
+
+from shared.result_packer import pack_results
+from shared.summarizer import summarize_results
+from shared.text_utils import estimate_tokens
+
+SAMPLE_SENTENCES = [
+    "Global semiconductor demand rose sharply this quarter as cloud providers expanded AI data centers.",
+    "Proposed US tariffs on imported chips could raise costs for Malaysian back-end packaging firms.",
+    "Malaysia accounts for roughly a tenth of global chip assembly, testing and packaging capacity.",
+    "Manufacturers are diversifying supply chains toward Vietnam and India to reduce concentration risk.",
+    "Analysts expect supply constraints on advanced packaging to persist into next year.",
+    "Central banks in the region kept interest rates unchanged amid easing inflation.",
+    "Energy prices fell after major producers signalled higher output for the coming months.",
+    "Logistics costs on trans-Pacific routes climbed for the third consecutive week.",
+]
+
+
+def make_results(count):
+    """Synthetic search results shaped like the provider output"""
+    results = []
+    for i in range(count):
+        body = " ".join(SAMPLE_SENTENCES[(i + j) % len(SAMPLE_SENTENCES)] for j in range(5))
+        results.append({
+            "title": f"Market update {i + 1}",
+            "url": f"https://news.example.com/articles/{i + 1}",
+            "description": SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)],
+            "content": body,
+        })
+    return results
+
+
+def bench_local(results, query, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        summary = summarize_results(pack_results(results, query), query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return summary, timings
+
+
+def bench_rich(results, query, runs):
+    # Importing logic connects to Azure, so only do it when asked
+    from agents.agent2_global_intel.logic import filter_search_results
+    timings = []
+    summary = ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        summary = filter_search_results({"results": results}, query, mode="rich")
+        timings.append((time.perf_counter() - start) * 1000)
+    return summary, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare local vs LLM summarization of search results")
+    parser.add_argument("--query", default="semiconductor tariffs supply chain")
+    parser.add_argument("--results", type=int, default=10, help="Number of synthetic results")
+    parser.add_argument("--input", help="JSON file with a list of search results to use instead")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--rich", action="store_true", help="Also time the Azure LLM path (needs credentials)")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, "r", encoding="utf-8") as f:
+            results = json.load(f)
+    else:
+        results = make_results(args.results)
+
+    prompt_tokens = estimate_tokens("Analyze these search results and summarize each entry:\n"
+                                    + json.dumps({"results": results}))
+    packed_prompt_tokens = estimate_tokens("Analyze these search results and summarize each entry:\n"
+                                           + json.dumps({"results": pack_results(results, args.query)}))
+    print(f"\n🧪 Summarizing {len(results)} results, {args.runs} runs", flush=True)
+
+    summary, timings = bench_local(results, args.query, args.runs)
+    print("\n⚡ Local extractive summarizer", flush=True)
+    print(f"   median {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms", flush=True)
+    print(f"   tokens spent: 0 (output ~{estimate_tokens(summary)} tokens)", flush=True)
+
+    print("\n🧠 LLM summarizer (rich mode)", flush=True)
+    print(f"   prompt ~{packed_prompt_tokens} tokens per call "
+          f"(~{prompt_tokens} without result packing)", flush=True)
+    if args.rich:
+        rich_summary, rich_timings = bench_rich(results, args.query, min(args.runs, 3))
+        print(f"   median {statistics.median(rich_timings):.0f} ms, max {max(rich_timings):.0f} ms", flush=True)
+        print(f"   output ~{estimate_tokens(rich_summary)} tokens", flush=True)
+    else:
+        print("   not timed (pass --rich with Azure credentials configured)", flush=True)
+
+    print("\n📝 Local summary:\n", flush=True)
+    print(summary, flush=True)
+
+
+if __name__ == "__main__":
+    main()